@@ -0,0 +1,118 @@
+"""
+Benchmarks for the custom lru_cache against functools.lru_cache, and of
+its eviction policies on replayed traces.
+
+Run from this directory:
+
+    python benchmark.py [num_calls]
+"""
+import functools
+import itertools
+import random
+import sys
+import time
+
+from lru import POLICIES, lru_cache
+
+
+def make_trace(max_size, hit_ratio, num_calls, seed=0):
+    """
+    Build a list of call arguments that hits a cache of max_size entries about
+    hit_ratio of the time: after one call per hot key to warm the cache, each
+    call repeats one of the max_size hot keys with probability hit_ratio, and
+    is otherwise a key never seen before (LRU evicts some hot keys in its
+    place, so the hit ratio reached is lower)
+    """
+    rng = random.Random(seed)
+    hot = list(range(max_size))
+    fresh = max_size
+    trace = list(hot)
+    for _ in range(num_calls):
+        if rng.random() < hit_ratio:
+            trace.append(rng.choice(hot))
+        else:
+            trace.append(fresh)
+            hot[rng.randrange(max_size)] = fresh  # the new key joins the hot set
+            fresh += 1
+    return trace
+
+
+def run_trace(cached, trace):
+    """Call `cached` on every key of the trace and return the calls per second"""
+    start = time.perf_counter()
+    for key in trace:
+        cached(key)
+    return len(trace) / (time.perf_counter() - start)
+
+
+def bench_lru(num_calls=200_000):
+    """
+    Sweep max_size and hit ratio and compare calls per second of lru_cache
+    with functools.lru_cache (a C implementation) on the same trace
+    """
+    print(f"lru_cache vs functools.lru_cache: {num_calls:,} calls per run")
+    print(f"{'max_size':>9}{'target':>8}{'hit ratio':>11}{'lru calls/s':>14}{'functools calls/s':>19}{'ratio':>7}")
+    for max_size in (128, 1_024, 16_384, 65_536):
+        for hit_ratio in (0.5, 0.9, 0.99):
+            trace = make_trace(max_size, hit_ratio, num_calls)
+
+            cached = lru_cache(max_size)(lambda x: x)
+            ours = run_trace(cached, trace)
+            info = cached.cache_info
+            measured = info.hits / num_calls  # the warm-up calls all miss
+
+            reference = run_trace(functools.lru_cache(max_size, typed=True)(lambda x: x), trace)
+            print(f"{max_size:>9,}{hit_ratio:>8.2f}{measured:>11.3f}{ours:>14,.0f}{reference:>19,.0f}"
+                  f"{reference / ours:>7.1f}")
+
+
+def zipf_trace(num_keys, num_calls, alpha=0.99, seed=0):
+    """Build a trace of keys 0..num_keys-1 whose popularity follows Zipf's law with exponent alpha"""
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1 / rank ** alpha for rank in range(1, num_keys + 1)))
+    keys = list(range(num_keys))
+    rng.shuffle(keys)  # popularity unrelated to key order
+    return rng.choices(keys, cum_weights=cum_weights, k=num_calls)
+
+
+def scan_trace(num_keys, num_calls, scan_length, scan_every, seed=0):
+    """
+    Build a Zipf trace of hot keys interrupted, every scan_every calls, by a
+    sweep over scan_length keys that are never used again (a table scan, a
+    crawl of new pages)
+    """
+    trace = []
+    fresh = itertools.count(num_keys)
+    for i, key in enumerate(zipf_trace(num_keys, num_calls, seed=seed)):
+        if i % scan_every == 0:
+            trace.extend(itertools.islice(fresh, scan_length))
+        trace.append(key)
+    return trace
+
+
+def loop_trace(num_keys, num_calls):
+    """Build a trace cycling over num_keys keys in order, the worst case for LRU when the cache is smaller"""
+    return [i % num_keys for i in range(num_calls)]
+
+
+def bench_policies(num_calls=200_000, max_size=1_000):
+    """Replay synthetic traces through lru_cache with every policy and report hit ratio and calls per second"""
+    traces = {
+        "zipf": zipf_trace(100_000, num_calls),
+        "zipf + scans": scan_trace(5_000, num_calls, scan_length=2 * max_size, scan_every=10_000),
+        "loop": loop_trace(max_size * 5 // 4, num_calls),
+    }
+    print(f"Eviction policies: max_size={max_size:,}")
+    print(f"{'trace':<14}{'policy':<9}{'calls':>9}{'hit ratio':>11}{'calls/s':>11}")
+    for trace_name, trace in traces.items():
+        for policy in POLICIES:
+            cached = lru_cache(max_size, policy=policy)(lambda x: x)
+            speed = run_trace(cached, trace)
+            info = cached.cache_info
+            print(f"{trace_name:<14}{policy:<9}{len(trace):>9,}{info.hits / len(trace):>11.3f}{speed:>11,.0f}")
+
+
+if __name__ == "__main__":
+    bench_lru(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
+    print()
+    bench_policies()
@@ -1,3 +1,23 @@
+import abc
+import asyncio
+import inspect
+import itertools
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Default number of independently locked segments of a thread-safe cache
+STRIPES = 16
+
+# Fewest entries a segment is given room for: smaller caches get fewer segments, as keys
+# hashing to the same tiny segment would evict each other while the rest stands empty
+MIN_STRIPE_SIZE = 8
+
+# How many of the least recently used entries are compared when evicting for max_bytes
+EVICTION_SAMPLE = 5
+
+
 class CacheInfo:
     """
     CacheInfo object used to represent the current status of `lru_cache`
@@ -6,55 +26,683 @@ class CacheInfo:
     - misses: number of calls where the result needed to be calculated by calling the function
     - max_size: the maximum number of entries the cache can store
     - cur_size: the number of entries currently stored
+    - max_bytes: the byte budget of the stored results, or None (only shown when set)
+    - cur_bytes: the estimated bytes of the results currently stored
+    - ttl: the seconds an entry stays fresh, or None (only shown when set)
+    - expired: number of entries dropped because their time-to-live ran out
     """
 
-    def __init__(self, max_size):
+    def __init__(self, max_size, max_bytes=None, ttl=None):
         self.max_size = max_size
         self.misses = 0
         self.hits = 0
         self.cur_size = 0
+        self.max_bytes = max_bytes
+        self.cur_bytes = 0
+        self.ttl = ttl
+        self.expired = 0
 
     def __repr__(self):
-        return f"CacheInfo(hits={self.hits}, misses={self.misses}, max_size={self.max_size}, cur_size={self.cur_size})"
+        text = f"CacheInfo(hits={self.hits}, misses={self.misses}, max_size={self.max_size}, cur_size={self.cur_size}"
+        if self.max_bytes is not None:
+            text += f", max_bytes={self.max_bytes}, cur_bytes={self.cur_bytes}"
+        if self.ttl is not None:
+            text += f", ttl={self.ttl}, expired={self.expired}"
+        return text + ")"
+
+
+class CachePolicy(abc.ABC):
+    """
+    The cached results of one cache (or stripe of a cache), each with its
+    expiry time and estimated size, and the eviction policy deciding which
+    result to drop when they no longer fit
+
+    - get: return a fresh entry's value, or raise KeyError
+    - put: store a value, then evict until within max_size entries and max_bytes
+    - discard: remove an entry
+
+    Subclasses keep the keys in their own order, in O(1) per operation, by
+    implementing the abstract hooks (_record is optional):
+    - _record(key): every lookup, hit or miss
+    - _touch(key): a hit
+    - _admit(key): a newly stored entry; evict with discard while over max_size
+    - _forget(key): an entry removed by discard
+    - _victim(): the key to evict to get within max_bytes
+    """
+
+    def __init__(self, max_size, ttl=None, max_bytes=None, sizeof=sys.getsizeof, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.clock = clock
+        self.data = {}  # key -> (value, expiry time or None, size in bytes)
+        self.nbytes = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key):
+        self._record(key)
+        value, expires, _ = self.data[key]
+        if expires is not None and self.clock() >= expires:
+            self.discard(key)
+            self.expired += 1
+            raise KeyError(key)
+        self._touch(key)
+        return value
+
+    def put(self, key, value):
+        self.discard(key)  # a recursive call may have cached it meanwhile
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # would not fit even in an empty cache
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        self.data[key] = (value, expires, size)
+        self.nbytes += size
+        self._admit(key)
+        while self.max_bytes is not None and self.nbytes > self.max_bytes:
+            self.discard(self._victim())
+
+    def discard(self, key):
+        if self._pop(key):
+            self._forget(key)
+
+    def _pop(self, key):
+        """Remove an entry from data only, returning whether there was one"""
+        entry = self.data.pop(key, None)
+        if entry is None:
+            return False
+        self.nbytes -= entry[2]
+        return True
+
+    def _record(self, key):
+        pass
+
+    @abc.abstractmethod
+    def _touch(self, key):
+        ...
+
+    @abc.abstractmethod
+    def _admit(self, key):
+        ...
+
+    @abc.abstractmethod
+    def _forget(self, key):
+        ...
+
+    @abc.abstractmethod
+    def _victim(self):
+        ...
+
+
+class LRUPolicy(CachePolicy):
+    """
+    Least recently used: entries are kept in an OrderedDict in recency order,
+    least recently used first, and the first one goes when over max_size
+
+    When over max_bytes, the EVICTION_SAMPLE least recently used entries are
+    compared and an expired one goes first, otherwise the largest: recency
+    still decides which entries are candidates, but one big result is evicted
+    rather than many small ones.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.data = OrderedDict()
+
+    def get(self, key):
+        # CachePolicy.get without the hook calls, as this is the default policy
+        value, expires, _ = self.data[key]
+        if expires is not None and self.clock() >= expires:
+            self.discard(key)
+            self.expired += 1
+            raise KeyError(key)
+        self.data.move_to_end(key)
+        return value
+
+    def _touch(self, key):
+        self.data.move_to_end(key)
+
+    def _admit(self, key):
+        if len(self.data) > self.max_size:
+            # Remove the least recently used item
+            self.discard(next(iter(self.data)))
+
+    def _forget(self, key):
+        pass
+
+    def _victim(self):
+        """Return the key to evict for space: among the least recently used, an expired or the largest one"""
+        now = self.clock()
+
+        def cost(item):
+            _, (_, expires, size) = item
+            return expires is not None and now >= expires, size
+
+        return max(itertools.islice(self.data.items(), EVICTION_SAMPLE), key=cost)[0]
+
+
+class LFUPolicy(CachePolicy):
+    """
+    Least frequently used: evicts the entry with the fewest hits since it was
+    cached, the least recently used of those on a tie
+
+    Keys are grouped in buckets by hit count, each an OrderedDict in recency
+    order, and the lowest count is tracked, so every operation is O(1).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counts = {}      # key -> hits + 1
+        self.buckets = {}     # count -> OrderedDict of its keys
+        self.min_count = 0
+
+    def _touch(self, key):
+        count = self.counts[key]
+        self._unlink(key, count)
+        if count == self.min_count and count not in self.buckets:
+            self.min_count = count + 1
+        self._link(key, count + 1)
+
+    def _admit(self, key):
+        if len(self.data) > self.max_size:
+            if self.counts:
+                self.discard(self._victim())
+            else:
+                self._pop(key)  # max_size is 0
+                return
+        self._link(key, 1)
+        self.min_count = 1
+
+    def _forget(self, key):
+        self._unlink(key, self.counts[key])
+
+    def _victim(self):
+        if self.min_count not in self.buckets:
+            self.min_count = min(self.buckets)  # only after removing entries other than by eviction
+        return next(iter(self.buckets[self.min_count]))
+
+    def _link(self, key, count):
+        self.counts[key] = count
+        self.buckets.setdefault(count, OrderedDict())[key] = None
+
+    def _unlink(self, key, count):
+        del self.counts[key]
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+
+
+class ARCPolicy(CachePolicy):
+    """
+    Adaptive replacement cache (Megiddo and Modha): entries seen once (t1)
+    and entries hit again (t2) are kept in separate LRU lists, with "ghost"
+    lists of the keys recently evicted from each (b1, b2). A miss on a ghost
+    key shows which list was too small, and shifts the target size of t1
+    (p) towards it, so the cache adapts between recency and frequency and a
+    one-off scan only ever churns t1
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.t1 = OrderedDict()
+        self.t2 = OrderedDict()
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+        self.p = 0
+
+    def _touch(self, key):
+        if key in self.t1:
+            del self.t1[key]
+            self.t2[key] = None
+        else:
+            self.t2.move_to_end(key)
+
+    def _admit(self, key):
+        c = self.max_size
+        if c == 0:
+            self._pop(key)
+            return
+        t1, t2, b1, b2 = self.t1, self.t2, self.b1, self.b2
+        if key in b1:
+            self.p = min(c, self.p + max(len(b2) // len(b1), 1))
+            del b1[key]
+            self._replace(False)
+            t2[key] = None
+        elif key in b2:
+            self.p = max(0, self.p - max(len(b1) // len(b2), 1))
+            del b2[key]
+            self._replace(True)
+            t2[key] = None
+        else:
+            if len(t1) + len(b1) >= c:
+                if len(t1) < c:
+                    b1.popitem(last=False)
+                    self._replace(False)
+                else:
+                    self.discard(next(iter(t1)))
+            elif len(t1) + len(t2) + len(b1) + len(b2) >= c:
+                if len(t1) + len(t2) + len(b1) + len(b2) >= 2 * c:
+                    b2.popitem(last=False)
+                self._replace(False)
+            t1[key] = None
+
+    def _replace(self, in_b2):
+        """If the cache is full, evict the LRU entry of t1 or t2 (by the target p) into its ghost list"""
+        if len(self.t1) + len(self.t2) < self.max_size:
+            return
+        if self.t1 and (len(self.t1) > self.p or (in_b2 and len(self.t1) == self.p) or not self.t2):
+            key = self.t1.popitem(last=False)[0]
+            self.b1[key] = None
+        else:
+            key = self.t2.popitem(last=False)[0]
+            self.b2[key] = None
+        self._pop(key)
+
+    def _forget(self, key):
+        if key in self.t1:
+            del self.t1[key]
+        else:
+            del self.t2[key]
+
+    def _victim(self):
+        if self.t1 and (len(self.t1) > self.p or not self.t2):
+            return next(iter(self.t1))
+        return next(iter(self.t2))
+
+
+class _CountMinSketch:
+    """
+    Approximate access counts of recently seen keys, whatever their number,
+    in 4 rows of counters capped at 15 (like 4-bit counters); every `sample` increments
+    all counters are halved, so old popularity fades
+    """
+
+    DEPTH = 4  # rows; _indexes computes one index per row
+    HALVE = bytes(i >> 1 for i in range(256))
+
+    def __init__(self, capacity):
+        self.width = 1 << max(4, (max(capacity, 1) - 1).bit_length())
+        self.mask = self.width - 1
+        self.table = bytearray(self.DEPTH * self.width)
+        self.sample = 10 * max(capacity, 1)
+        self.additions = 0
+
+    def _indexes(self, key):
+        h = hash(key) * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF  # spread out the hashes of small ints
+        low, step, mask, width = h & 0xFFFFFFFF, (h >> 32) | 1, self.mask, self.width
+        return (low & mask, width + ((low + step) & mask),
+                2 * width + ((low + 2 * step) & mask), 3 * width + ((low + 3 * step) & mask))
+
+    def increment(self, key):
+        table = self.table
+        for i in self._indexes(key):
+            if table[i] < 15:
+                table[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample:
+            self.table = table.translate(self.HALVE)
+            self.additions //= 2
+
+    def frequency(self, key):
+        table = self.table
+        a, b, c, d = self._indexes(key)
+        return min(table[a], table[b], table[c], table[d])
+
+
+class TinyLFUPolicy(CachePolicy):
+    """
+    W-TinyLFU (Einziger, Friedman and Manes): a small LRU window (1% of
+    max_size) in front of a segmented LRU main area (80% protected, 20%
+    probation). An entry leaving the window only enters the main area if a
+    count-min sketch of recent accesses says it is used more often than the
+    main area's eviction candidate, so a scan of keys used once passes
+    through the window without displacing the frequently used entries
+    """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.window_size = max(1, self.max_size // 100)
+        self.protected_size = (self.max_size - self.window_size) * 4 // 5
+        self.window = OrderedDict()
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.sketch = _CountMinSketch(self.max_size)
 
-def lru_cache(max_size = 128):
+    def _record(self, key):
+        self.sketch.increment(key)
+
+    def _touch(self, key):
+        if key in self.window:
+            self.window.move_to_end(key)
+        elif key in self.probation:
+            # Promote to protected, demoting its least recently used entry if full
+            del self.probation[key]
+            self.protected[key] = None
+            if len(self.protected) > self.protected_size:
+                self.probation[self.protected.popitem(last=False)[0]] = None
+        else:
+            self.protected.move_to_end(key)
+
+    def _admit(self, key):
+        self.window[key] = None
+        candidate = None
+        if len(self.window) > self.window_size:
+            candidate = self.window.popitem(last=False)[0]
+            self.probation[candidate] = None
+        if len(self.data) <= self.max_size:
+            return
+        victim = self._victim()
+        if candidate is not None and victim != candidate:
+            # Keep whichever of the two is used more often
+            if self.sketch.frequency(candidate) > self.sketch.frequency(victim):
+                candidate = victim
+            self.discard(candidate)
+        else:
+            self.discard(victim)
+
+    def _forget(self, key):
+        for segment in (self.window, self.probation, self.protected):
+            if key in segment:
+                del segment[key]
+                return
+
+    def _victim(self):
+        for segment in (self.probation, self.protected, self.window):
+            if segment:
+                return next(iter(segment))
+
+
+# Eviction policies by the name lru_cache takes
+POLICIES = {"lru": LRUPolicy, "lfu": LFUPolicy, "arc": ARCPolicy, "tinylfu": TinyLFUPolicy}
+
+
+class _Stripe:
+    """
+    One segment of a thread-safe cache: its own LRU entries, lock and counters,
+    and the calls in progress for its keys
+    """
+
+    def __init__(self, entries):
+        self.lock = threading.Lock()
+        self.entries = entries
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+
+class _Call:
+    """A call in progress, whose outcome concurrent callers with the same key wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.owner = threading.get_ident()
+        self.result = None
+        self.error = None
+
+
+class _StripedCacheInfo(CacheInfo):
+    """CacheInfo of a thread-safe cache, summed over its stripes when read"""
+
+    def __init__(self, max_size, max_bytes, ttl, stripes):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._stripes = stripes
+
+    @property
+    def hits(self):
+        return sum(stripe.hits for stripe in self._stripes)
+
+    @property
+    def misses(self):
+        return sum(stripe.misses for stripe in self._stripes)
+
+    @property
+    def cur_size(self):
+        return sum(len(stripe.entries) for stripe in self._stripes)
+
+    @property
+    def cur_bytes(self):
+        return sum(stripe.entries.nbytes for stripe in self._stripes)
+
+    @property
+    def expired(self):
+        return sum(stripe.entries.expired for stripe in self._stripes)
+
+
+def _make_key(args, kwargs):
+    """
+    Build the cache key of a call: the arguments together with their types, so
+    f(3) and f(3.0) are cached separately, and keyword arguments in any order
+    """
+    if not kwargs:
+        return args, tuple(map(type, args))
+    typed_kwargs = tuple(sorted((k, type(v), v) for k, v in kwargs.items()))
+    return args, tuple(map(type, args)), typed_kwargs
+
+
+def _share(total, parts, i):
+    """Return part i of total split as evenly as possible into parts (None stays None)"""
+    return None if total is None else total // parts + (i < total % parts)
+
+
+def _fit_budget(segments, max_bytes, stored):
+    """
+    Evict from the stripes holding the most bytes until all of them together
+    fit in max_bytes, from the stripe a result was just `stored` in only once
+    the others are empty, so the new result is not the one to go. Only one
+    stripe's lock is held at a time, so threads doing this at once never deadlock
+    """
+    def priority(stripe):
+        return stripe is not stored and stripe.entries.nbytes > 0, stripe.entries.nbytes
+
+    while sum(stripe.entries.nbytes for stripe in segments) > max_bytes:
+        stripe = max(segments, key=priority)
+        with stripe.lock:
+            if stripe.entries:
+                stripe.entries.discard(stripe.entries._victim())
+
+
+def _update_info(cache_info, entries):
+    """Copy the size of the entries into the cache_info"""
+    cache_info.cur_size = len(entries)
+    cache_info.cur_bytes = entries.nbytes
+    cache_info.expired = entries.expired
+
+
+def _striped_cache(func, stripes, policy, max_size, ttl, max_bytes, sizeof):
+    """
+    Wrap func in a thread-safe LRU cache split into `stripes` segments (fewer
+    for a small max_size, so that each holds at least MIN_STRIPE_SIZE entries)
+
+    A key always lives in the segment picked by its hash, and each segment
+    has its own lock, so threads working on different segments never wait
+    for each other. Each segment evicts on its own to stay within its share
+    of max_size, while max_bytes is a budget for all of them together: after
+    a store, entries are evicted from the other segments holding the most
+    bytes until the total fits, so a result may take up to the whole budget.
+
+    The first thread to miss on a key computes it outside the lock; threads
+    missing on the same key meanwhile wait for that one call and share its
+    result or exception (counted as hits, as func is not called for them).
+    """
+    stripes = max(1, min(stripes, max_size // MIN_STRIPE_SIZE))
+    segments = [_Stripe(policy(_share(max_size, stripes, i), ttl, max_bytes, sizeof))
+                for i in range(stripes)]
+
+    def wrapped_function(*args, **kwargs):
+        key = _make_key(args, kwargs)
+        stripe = segments[hash(key) % stripes]
+
+        with stripe.lock:
+            # If the result is in the cache (Cache hit)
+            try:
+                result = stripe.entries.get(key)
+            except KeyError:
+                pass
+            else:
+                stripe.hits += 1
+                return result
+
+            # If another thread is computing it, wait for that call
+            call = stripe.in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = stripe.in_flight[key] = _Call()
+            if leader or call.owner == threading.get_ident():
+                stripe.misses += 1
+            else:
+                stripe.hits += 1
+
+        if not leader:
+            if call.owner == threading.get_ident():
+                # func calls itself with the same arguments: waiting on itself would deadlock
+                return func(*args, **kwargs)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        # Otherwise compute it (Cache miss); a failed call is not cached
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            with stripe.lock:
+                del stripe.in_flight[key]
+            call.done.set()
+            raise
+        call.result = result
+        with stripe.lock:
+            del stripe.in_flight[key]
+            stripe.entries.put(key, result)
+        call.done.set()
+        if max_bytes is not None:
+            _fit_budget(segments, max_bytes, stripe)
+        return result
+
+    wrapped_function.cache_info = _StripedCacheInfo(max_size, max_bytes, ttl, segments)
+    return wrapped_function
+
+
+def _async_cache(func, entries, cache_info):
+    """
+    Wrap the coroutine function func in an LRU cache of its awaited results
+
+    The first call missing on a key runs func as a task; calls with the same
+    key while it runs await that same task (counted as hits). The task's
+    result is cached when it finishes, while a failed or cancelled task is
+    dropped so the next call tries again. Awaiters are shielded from each
+    other: cancelling one does not cancel the task the others are waiting on.
+    """
+    in_flight = {}
+
+    def finish(key, task):
+        del in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        entries.put(key, task.result())
+        _update_info(cache_info, entries)
+
+    async def wrapped_function(*args, **kwargs):
+        key = _make_key(args, kwargs)
+
+        # If the result is in the cache (Cache hit)
+        try:
+            result = entries.get(key)
+        except KeyError:
+            pass
+        else:
+            cache_info.hits += 1
+            return result
+
+        # If it is being computed, await the same task; otherwise start one (Cache miss)
+        task = in_flight.get(key)
+        if task is None:
+            cache_info.misses += 1
+            _update_info(cache_info, entries)  # the entry may just have expired
+            task = in_flight[key] = asyncio.ensure_future(func(*args, **kwargs))
+            task.add_done_callback(lambda task: finish(key, task))
+        else:
+            cache_info.hits += 1
+        return await asyncio.shield(task)
+
+    wrapped_function.cache_info = cache_info
+    return wrapped_function
+
+
+def lru_cache(max_size = 128, thread_safe = False, stripes = STRIPES, ttl = None, max_bytes = None,
+              sizeof = sys.getsizeof, policy = "lru"):
     """
     A decorator that maintains an LRU cache that stores max_size arguments and their results
     - max_size: Maximum number of entries the cache can store
+    - thread_safe: Lock the cache so it can be called from several threads, and
+      have concurrent calls with the same arguments share a single call of the function
+    - stripes: Number of independently locked segments of a thread-safe cache
+      (each holding an equal share of max_size and evicting on its own, while max_bytes
+      applies to all of them together; 1 for exact LRU order). A cache gets at most one
+      stripe per MIN_STRIPE_SIZE entries of max_size, so one under 16 entries is not split
+    - ttl: Seconds a result stays fresh; an expired entry is a miss and is computed again
+    - max_bytes: Budget for the estimated size of the stored results; results larger
+      than the whole budget are returned but not cached
+    - sizeof: Estimates a result's size in bytes for max_bytes. sys.getsizeof counts
+      a pandas DataFrame's data but only the outer object of a list or dict, so pass
+      a deep estimator for those
+    - policy: Which entry to evict when the cache is full: "lru" (least recently used),
+      "lfu" (least frequently used), "arc" (adaptive replacement) or "tinylfu"
+      (W-TinyLFU), or a CachePolicy subclass. "arc" and "tinylfu" keep frequently
+      used entries through scans of keys used only once, which flush a pure LRU cache
+
+    Coroutine functions (async def) get a cache of their awaited results,
+    with concurrent awaiters of the same arguments sharing one task. Their
+    cache belongs to one event loop at a time, so thread_safe does not apply.
+
+    With every policy a hit, a miss and an eviction each cost O(1) however
+    large max_size is. With "lru", to fit max_bytes, the largest of the few
+    least recently used entries is evicted first (see LRUPolicy).
     """
 
+    if isinstance(policy, str):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        policy_class = POLICIES[policy]
+    else:
+        policy_class = policy
+
     def cache(func):
-        # Inner cache dict and keys list for LRU tracking
-        inner_cache = {}
-        keys = []
-        cache_info = CacheInfo(max_size)
+        is_coroutine = inspect.iscoroutinefunction(func)
+        if thread_safe and is_coroutine:
+            raise ValueError("thread_safe is not supported for coroutine functions")
+        if thread_safe:
+            return _striped_cache(func, stripes, policy_class, max_size, ttl, max_bytes, sizeof)
+
+        entries = policy_class(max_size, ttl, max_bytes, sizeof)
+        cache_info = CacheInfo(max_size, max_bytes, ttl)
+        if is_coroutine:
+            return _async_cache(func, entries, cache_info)
 
         def wrapped_function(*args, **kwargs):
-            # Create a unique key from args and kwargs
-            typed_args = tuple((type(arg), arg) for arg in args)
-            typed_kwargs = tuple(sorted((k, (type(v), v)) for k, v in kwargs.items()))
-            key = (typed_args, typed_kwargs)
-
-            # Check if the result is not in the cache (Cache miss)
-            if key not in inner_cache:
-                cache_info.misses += 1
-                keys.append(key)
-                inner_cache[key] = func(*args, **kwargs)
-                cache_info.cur_size += 1
-
-                if len(inner_cache) > max_size:
-                    # Remove the least recently used item
-                    del inner_cache[keys[0]]
-                    keys.pop(0)
-                    cache_info.cur_size -= 1
-                return inner_cache[key]
+            key = _make_key(args, kwargs)
 
             # If the result is in the cache (Cache hit)
-            keys.remove(key)
-            keys.append(key)
-            cache_info.hits += 1
-            return inner_cache[key]
+            try:
+                result = entries.get(key)
+            except KeyError:
+                pass
+            else:
+                cache_info.hits += 1
+                return result
+
+            # Otherwise compute it (Cache miss)
+            cache_info.misses += 1
+            result = func(*args, **kwargs)
+            entries.put(key, result)
+            _update_info(cache_info, entries)
+            return result
 
         wrapped_function.cache_info = cache_info
         return wrapped_function
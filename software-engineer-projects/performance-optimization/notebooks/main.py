@@ -1,4 +1,6 @@
 from lru import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import time
 
 # Basic arithmetic example
@@ -14,13 +16,37 @@ def fibonacci(n):
         return n
     return fibonacci(n - 1) + fibonacci(n - 2)
 
-# Simulated expensive function
-@lru_cache(max_size=3)
+# Simulated expensive function, safe to call from several threads
+@lru_cache(max_size=3, thread_safe=True)
 def slow_multiply(a, b):
     print(f"Computing slow_multiply({a}, {b})...")
     time.sleep(1)  # Simulate heavy computation
     return a * b
 
+# Simulated network fetch (a coroutine function): the awaited result is cached
+@lru_cache(max_size=10)
+async def fetch_page(url):
+    print(f"Fetching {url}...")
+    await asyncio.sleep(0.5)  # Simulate network latency
+    return f"<html>{url}</html>"
+
+async def fetch_pages():
+    # Three concurrent fetches of one URL share a single request
+    await asyncio.gather(*(fetch_page("https://example.com") for _ in range(3)))
+    await fetch_page("https://example.com")  # Hit (instant)
+
+# Quote that goes stale after a second
+@lru_cache(max_size=10, ttl=1.0)
+def latest_quote(ticker):
+    print(f"Fetching quote for {ticker}")
+    return {"ticker": ticker, "time": time.time()}
+
+# Large results bounded by memory rather than count (bytes objects report their size to sys.getsizeof)
+@lru_cache(max_size=100, max_bytes=3_000_000)
+def load_series(name, megabytes):
+    print(f"Loading {name} ({megabytes} MB)")
+    return bytes(megabytes * 1_000_000)
+
 # Function with keyword arguments
 @lru_cache(max_size=5)
 def greet(name="User", punctuation="."):
@@ -55,6 +81,31 @@ if __name__ == "__main__":
     slow_multiply(2, 3)  # Hit (instant)
     print(slow_multiply.cache_info, "\n")
 
+    print("=== Concurrent Slow Multiply ===")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(slow_multiply, [4] * 4, [5] * 4))  # One miss (sleeps once), three calls share it
+    print(f"4 threads in {time.perf_counter() - start:.1f}s")
+    print(slow_multiply.cache_info, "\n")
+
+    print("=== Async Fetch ===")
+    asyncio.run(fetch_pages())
+    print(fetch_page.cache_info, "\n")
+
+    print("=== Time-To-Live ===")
+    latest_quote("AAPL")  # Miss
+    latest_quote("AAPL")  # Hit
+    time.sleep(1.1)
+    latest_quote("AAPL")  # Expired, fetched again
+    print(latest_quote.cache_info, "\n")
+
+    print("=== Byte Budget ===")
+    load_series("prices", 2)  # Miss
+    load_series("volumes", 1)  # Miss
+    load_series("returns", 1)  # Miss (evicts the 2 MB prices to stay within 3 MB)
+    load_series("volumes", 1)  # Hit
+    print(load_series.cache_info, "\n")
+
     print("=== Greeting ===")
     greet(name="Alice", punctuation="!")
     greet(name="Alice", punctuation="!")
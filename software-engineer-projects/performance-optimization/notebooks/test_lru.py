@@ -1,3 +1,12 @@
+import asyncio
+import functools
+import random
+import sys
+import threading
+import time
+
+import pytest
+
 import lru
 
 
@@ -235,3 +244,373 @@ def test_lru_no_parameters():
     f()
     f()
     assert repr(f.cache_info) == "CacheInfo(hits=3, misses=1, max_size=5, cur_size=1)"
+
+
+def test_lru_cache_matches_functools():
+    # Same hits and misses as functools.lru_cache on a long random trace
+    ours = lru.lru_cache(1000)(lambda x: x)
+    reference = functools.lru_cache(1000)(lambda x: x)
+    rng = random.Random(0)
+    for _ in range(50_000):
+        x = rng.randrange(1500)
+        assert ours(x) == reference(x) == x
+    info = reference.cache_info()
+    assert (ours.cache_info.hits, ours.cache_info.misses, ours.cache_info.cur_size) == \
+        (info.hits, info.misses, info.currsize)
+
+
+def test_lru_cache_zero_size():
+    @lru.lru_cache(0)
+    def f(x):
+        return x * 2
+
+    assert f(2) == 4
+    assert f(2) == 4
+    assert repr(f.cache_info) == "CacheInfo(hits=0, misses=2, max_size=0, cur_size=0)"
+
+
+def run_threads(target, num_threads=8):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_thread_safe_cache_info_under_contention():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+    calls = []
+
+    @lru.lru_cache(50, thread_safe=True, stripes=4)
+    def f(x):
+        calls.append(x)
+        return x * 2
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(5_000):
+            x = rng.randrange(200)
+            assert f(x) == x * 2
+
+    try:
+        run_threads(worker)
+    finally:
+        sys.setswitchinterval(interval)
+    info = f.cache_info
+    assert info.hits + info.misses == 8 * 5_000
+    assert info.misses == len(calls)
+    assert info.cur_size == 50
+    assert repr(info) == f"CacheInfo(hits={info.hits}, misses={info.misses}, max_size=50, cur_size=50)"
+
+
+def test_thread_safe_single_flight():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    @lru.lru_cache(10, thread_safe=True)
+    def slow_multiply(a, b):
+        calls.append((a, b))
+        time.sleep(0.2)
+        return a * b
+
+    results = []
+
+    def worker(_):
+        barrier.wait()
+        results.append(slow_multiply(2, 3))
+
+    run_threads(worker)
+    assert results == [6] * 8
+    assert calls == [(2, 3)]
+    assert repr(slow_multiply.cache_info) == "CacheInfo(hits=7, misses=1, max_size=10, cur_size=1)"
+
+
+def test_thread_safe_errors_are_shared_but_not_cached():
+    barrier = threading.Barrier(4)
+    calls = []
+
+    @lru.lru_cache(10, thread_safe=True)
+    def fail(x):
+        calls.append(x)
+        time.sleep(0.1)
+        raise ValueError(x)
+
+    errors = []
+
+    def worker(_):
+        barrier.wait()
+        try:
+            fail(1)
+        except ValueError as error:
+            errors.append(error)
+
+    run_threads(worker, num_threads=4)
+    assert len(errors) == 4 and calls == [1]
+    assert fail.cache_info.cur_size == 0
+    try:
+        fail(1)
+    except ValueError:
+        pass
+    assert calls == [1, 1]
+
+
+def test_thread_safe_recursion():
+    @lru.lru_cache(100, thread_safe=True)
+    def fibonacci(n):
+        return n if n <= 1 else fibonacci(n - 1) + fibonacci(n - 2)
+
+    assert fibonacci(80) == 23416728348467685
+    assert fibonacci.cache_info.misses == 81
+
+
+def test_async_cache_caches_awaited_results():
+    calls = []
+
+    @lru.lru_cache(2)
+    async def fetch(url):
+        calls.append(url)
+        await asyncio.sleep(0)
+        return url.upper()
+
+    async def main():
+        assert await fetch("a") == "A"
+        assert await fetch("a") == "A"  # the result, not a spent coroutine
+        await fetch("b")
+        await fetch("c")  # evicts "a"
+        assert await fetch("a") == "A"
+
+    asyncio.run(main())
+    assert calls == ["a", "b", "c", "a"]
+    assert repr(fetch.cache_info) == "CacheInfo(hits=1, misses=4, max_size=2, cur_size=2)"
+
+
+def test_async_cache_shares_in_flight_task():
+    calls = []
+
+    @lru.lru_cache(10)
+    async def fetch(url):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return len(url)
+
+    async def main():
+        return await asyncio.gather(*(fetch("page") for _ in range(5)), fetch("other"))
+
+    assert asyncio.run(main()) == [4] * 5 + [5]
+    assert calls == ["page", "other"]
+    assert repr(fetch.cache_info) == "CacheInfo(hits=4, misses=2, max_size=10, cur_size=2)"
+
+
+def test_async_cache_does_not_cache_failures():
+    attempts = []
+
+    @lru.lru_cache(10)
+    async def flaky(x):
+        attempts.append(x)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ConnectionError("first attempt fails")
+        return x
+
+    async def main():
+        results = await asyncio.gather(flaky(1), flaky(1), return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert flaky.cache_info.cur_size == 0
+        assert await flaky(1) == 1
+        assert await flaky(1) == 1
+
+    asyncio.run(main())
+    assert attempts == [1, 1]
+
+
+def test_async_cache_survives_a_cancelled_awaiter():
+    @lru.lru_cache(10)
+    async def fetch(x):
+        await asyncio.sleep(0.05)
+        return x
+
+    async def main():
+        first = asyncio.ensure_future(fetch(1))
+        second = asyncio.ensure_future(fetch(1))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == 1
+        assert await fetch(1) == 1
+
+    asyncio.run(main())
+    assert repr(fetch.cache_info) == "CacheInfo(hits=2, misses=1, max_size=10, cur_size=1)"
+
+
+def test_lru_cache_ttl():
+    calls = []
+
+    @lru.lru_cache(10, ttl=0.05)
+    def f(x):
+        calls.append(x)
+        return x
+
+    f(1)
+    f(1)
+    assert calls == [1]
+    time.sleep(0.06)
+    f(1)  # expired, so computed again
+    f(1)
+    assert calls == [1, 1]
+    assert repr(f.cache_info) == "CacheInfo(hits=2, misses=2, max_size=10, cur_size=1, ttl=0.05, expired=1)"
+
+
+def test_lru_cache_max_bytes_evicts_large_results_first():
+    @lru.lru_cache(10, max_bytes=10, sizeof=len)
+    def f(n):
+        f._calls += 1
+        return "x" * n
+
+    f._calls = 0
+    f(6)
+    f(1)
+    f(2)
+    f(3)  # over budget: the 6-byte result goes rather than the older small ones
+    assert repr(f.cache_info) == "CacheInfo(hits=0, misses=4, max_size=10, cur_size=3, max_bytes=10, cur_bytes=6)"
+    f(1)
+    f(2)
+    f(3)
+    assert f._calls == 4
+
+    assert f(11) == "x" * 11  # larger than the whole budget: returned, not cached
+    assert f.cache_info.cur_bytes == 6 and f.cache_info.cur_size == 3
+
+
+@pytest.mark.parametrize("max_size", [1, 3, 15])
+def test_thread_safe_small_cache_keeps_distinct_keys(max_size):
+    calls = []
+
+    @lru.lru_cache(max_size, thread_safe=True)
+    def f(x):
+        calls.append(x)
+        return x
+
+    for _ in range(2):
+        for x in range(max_size):
+            f(x)
+    assert f.cache_info.cur_size == max_size
+    assert calls == list(range(max_size))
+
+
+def test_thread_safe_max_bytes():
+    @lru.lru_cache(100, thread_safe=True, stripes=4, max_bytes=400, sizeof=len)
+    def f(n):
+        return "x" * (n % 50)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(2_000):
+            f(rng.randrange(1_000))
+
+    run_threads(worker, num_threads=4)
+    info = f.cache_info
+    assert info.cur_bytes <= 400 and info.cur_size <= 100
+    assert info.hits + info.misses == 4 * 2_000
+
+
+def test_thread_safe_max_bytes_is_one_budget():
+    calls = []
+
+    @lru.lru_cache(100, thread_safe=True, max_bytes=1_000, sizeof=len)
+    def f(n):
+        calls.append(n)
+        return "x" * 300
+
+    for n in range(10):
+        assert f(n) == "x" * 300  # far more than a 16th of the budget each
+        assert f.cache_info.cur_bytes <= 1_000
+    assert f.cache_info.cur_size == 3
+    f(9)
+    assert calls == list(range(10))
+    assert f.cache_info.hits == 1
+
+
+@pytest.mark.parametrize("policy", sorted(lru.POLICIES))
+def test_policies_stay_correct_and_bounded(policy):
+    calls = []
+
+    @lru.lru_cache(50, policy=policy)
+    def f(x):
+        calls.append(x)
+        return x * 2
+
+    rng = random.Random(0)
+    for _ in range(20_000):
+        x = int(rng.paretovariate(1.0)) if rng.random() < 0.8 else rng.randrange(1_000)
+        assert f(x) == x * 2
+    info = f.cache_info
+    assert info.hits + info.misses == 20_000 and info.misses == len(calls)
+    assert info.cur_size == 50
+
+
+def test_lfu_evicts_least_frequently_used():
+    @lru.lru_cache(3, policy="lfu")
+    def f(x):
+        f._calls += 1
+        return x
+
+    f._calls = 0
+    for x in [1, 1, 1, 2, 2, 3]:
+        f(x)
+    f(4)  # evicts 3, used once (not 1, the least recently used)
+    f(1)
+    f(2)
+    assert f._calls == 4
+    f(3)
+    assert f._calls == 5
+
+
+@pytest.mark.parametrize("policy, survivors", [("lru", 0), ("arc", 50), ("tinylfu", 45)])
+def test_scan_resistance(policy, survivors):
+    @lru.lru_cache(100, policy=policy)
+    def f(x):
+        return x
+
+    hot = list(range(50))
+    for _ in range(10):
+        for x in hot:
+            f(x)
+    for x in range(1_000, 1_500):  # a scan of keys used once
+        f(x)
+    hits = f.cache_info.hits
+    for x in hot:
+        f(x)
+    # A scan flushes LRU; ARC and W-TinyLFU (whose sketch is approximate) keep the hot keys
+    assert f.cache_info.hits - hits >= survivors
+    if policy == "lru":
+        assert f.cache_info.hits == hits
+
+
+def test_custom_policy_must_implement_the_hooks():
+    class Incomplete(lru.CachePolicy):
+        def _touch(self, key):
+            pass
+
+    with pytest.raises(TypeError):
+        lru.lru_cache(2, policy=Incomplete)(lambda x: x)
+
+    class FirstInFirstOut(Incomplete):
+        def _admit(self, key):
+            if len(self.data) > self.max_size:
+                self.discard(self._victim())
+
+        def _forget(self, key):
+            pass
+
+        def _victim(self):
+            return next(iter(self.data))
+
+    f = lru.lru_cache(2, policy=FirstInFirstOut)(lambda x: x)
+    for x in (1, 2, 1, 3, 1):
+        f(x)
+    assert (f.cache_info.hits, f.cache_info.misses) == (1, 4)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        lru.lru_cache(10, policy="fifo")
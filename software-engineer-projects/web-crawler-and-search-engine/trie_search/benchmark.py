@@ -0,0 +1,515 @@
+"""
+Micro-benchmarks for the trie_search index structures.
+
+Run from this directory:
+
+    python benchmark.py [num_words]
+"""
+import fnmatch
+import itertools
+import multiprocessing
+import re
+import random
+import resource
+import string
+import sys
+import time
+import tracemalloc
+from typing import Iterator
+
+from crawler import index_pages, index_pages_parallel, iter_crawl
+from postings import memory_stats
+from search import SearchEngine
+from tokenizer import STOPWORDS, Tokenizer
+from trie import Trie, CompactTrie, RadixTrie
+from utils import extract_page, extract_page_incremental, get_links, get_text
+from visited import ScalableBloomFilter
+
+
+def random_words(count: int, seed: int = 0) -> list[str]:
+    """
+    Generate `count` distinct lowercase words with a crawl-like length
+    distribution (mostly 3-10 letters, a tail of long tokens).
+    """
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        length = min(int(rng.expovariate(1 / 6)) + 2, 30)
+        words.add(''.join(rng.choices(string.ascii_lowercase, k=length)))
+    return sorted(words)
+
+
+def measure_memory(trie_class, words: list[str]) -> tuple[object, int]:
+    """Build a trie of `words` and return it with the bytes it allocated."""
+    tracemalloc.start()
+    trie = trie_class()
+    for word in words:
+        trie[word] = True
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return trie, peak
+
+
+def measure_lookups(trie, words: list[str], repeat: int = 3) -> float:
+    """Return the best time (seconds) to look up every word once."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for word in words:
+            trie[word]
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_layouts(num_words: int) -> None:
+    """Compare memory and lookup time of Trie and CompactTrie."""
+    words = random_words(num_words)
+    print(f"Node layout: {num_words:,} words")
+    print(f"{'class':<14}{'peak MiB':>10}{'lookup s':>10}")
+    for trie_class in (Trie, CompactTrie):
+        trie, peak = measure_memory(trie_class, words)
+        elapsed = measure_lookups(trie, words)
+        print(f"{trie_class.__name__:<14}{peak / 2 ** 20:>10.1f}{elapsed:>10.3f}")
+
+
+def count_nodes(trie) -> int:
+    """Count the nodes reachable from the root of a TrieNode-based trie."""
+    count, stack = 0, [trie.root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children.values())
+    return count
+
+
+def measure_scan(trie, repeat: int = 3) -> float:
+    """Return the best time (seconds) to iterate over every entry."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in trie:
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_radix(num_words: int) -> None:
+    """Compare node count, lookup and full-scan time of Trie and RadixTrie."""
+    words = random_words(num_words)
+    print(f"Path compression: {num_words:,} words")
+    print(f"{'class':<14}{'nodes':>10}{'lookup s':>10}{'scan s':>10}")
+    for trie_class in (Trie, RadixTrie):
+        trie = trie_class()
+        for word in words:
+            trie[word] = True
+        print(f"{trie_class.__name__:<14}{count_nodes(trie):>10,}"
+              f"{measure_lookups(trie, words):>10.3f}{measure_scan(trie):>10.3f}")
+
+
+def recursive_items(trie, node, prefix: str):
+    """Reference recursive traversal (the pre-_walk implementation) for comparison."""
+    is_terminal, value = trie._entry(node)
+    if is_terminal:
+        yield prefix, value
+    for label, child in trie._edges(node):
+        yield from recursive_items(trie, child, prefix + label)
+
+
+def bench_iteration(num_keys: int = 1_000_000) -> None:
+    """Time a full scan of a large CompactTrie with both traversal engines."""
+    trie = CompactTrie()
+    for word in random_words(num_keys, seed=1):
+        trie[word] = True
+    print(f"Full iteration: {num_keys:,} keys")
+    for name, scan in (("recursive", lambda: recursive_items(trie, trie.root, '')),
+                       ("explicit stack", lambda: iter(trie))):
+        start = time.perf_counter()
+        count = sum(1 for _ in scan())
+        print(f"{name:<16}{time.perf_counter() - start:>8.2f} s  ({count:,} keys)")
+
+
+def synthetic_page(num_paragraphs: int, seed: int = 0) -> str:
+    """Build a large HTML page of text paragraphs, each with a couple of links."""
+    words = random_words(5_000, seed)
+    rng = random.Random(seed)
+    paragraphs = [
+        "<p>{}<a href=\"/page/{}\">{}</a> {} <a href=\"https://example.com/{}\">more</a></p>".format(
+            " ".join(rng.choices(words, k=40)), i, rng.choice(words),
+            " ".join(rng.choices(words, k=20)), i)
+        for i in range(num_paragraphs)
+    ]
+    return "<html><head><title>bench</title></head><body>{}</body></html>".format("\n".join(paragraphs))
+
+
+def _extract_in_child(name: str, html: str, results) -> None:
+    """Run one extraction strategy and report (seconds, peak RSS growth in bytes)."""
+    url = "https://example.com/start"
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if name == "get_text + get_links":
+        words = get_text(html).split()
+        links = get_links(html, url)
+    elif name == "extract_page":
+        words, links = extract_page(html, url)
+    else:
+        chunks = (html[i:i + 65536] for i in range(0, len(html), 65536))
+        words, links = extract_page_incremental(chunks, url)
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((elapsed, (after - before) * 1024))  # ru_maxrss is KiB on Linux
+
+
+def bench_extract(num_paragraphs: int = 50_000) -> None:
+    """
+    Compare parse time and peak memory of the two-parse, single-parse and
+    incremental page extraction. Each strategy runs in a forked child so that
+    libxml2's own allocations show up in its peak RSS.
+    """
+    html = synthetic_page(num_paragraphs)
+    print(f"Page extraction: {len(html) / 2 ** 20:.1f} MiB page")
+    print(f"{'strategy':<22}{'seconds':>10}{'peak MiB':>10}")
+    context = multiprocessing.get_context("fork")
+    for name in ("get_text + get_links", "extract_page", "incremental"):
+        results = context.Queue()
+        child = context.Process(target=_extract_in_child, args=(name, html, results))
+        child.start()
+        elapsed, peak = results.get()
+        child.join()
+        print(f"{name:<22}{elapsed:>10.3f}{peak / 2 ** 20:>10.1f}")
+
+
+def synthetic_pages(num_pages: int, words_per_page: int = 300,
+                    zipf: bool = False) -> Iterator[tuple[str, list[str]]]:
+    """
+    Generate (URL, words) pairs drawn from a shared vocabulary, like
+    iter_crawl's pages. With `zipf`, word frequencies follow Zipf's law as in
+    real text instead of being uniform.
+    """
+    vocabulary = random_words(50_000, seed=2)
+    rng = random.Random(2)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1))) \
+        if zipf else None
+    for i in range(num_pages):
+        yield f"https://example.com/{i}", rng.choices(vocabulary, cum_weights=cum_weights, k=words_per_page)
+
+
+def synthetic_crawl(num_pages: int, words_per_page: int = 300,
+                    zipf: bool = False) -> list[tuple[str, list[str]]]:
+    """Collect synthetic_pages into a list, like crawl_site's results."""
+    return list(synthetic_pages(num_pages, words_per_page, zipf))
+
+
+def _reassign_build(pages: list[tuple[str, list[str]]]) -> Trie:
+    """Reference build: get the postings, count the URL, and store them back (two traversals)."""
+    word_trie = Trie()
+    for url, words in pages:
+        for word in words:
+            postings = word_trie.get(word)
+            if postings is None:
+                postings = {}
+            postings[url] = postings.get(url, 0) + 1
+            word_trie[word] = postings
+    return word_trie
+
+
+def _serial_build(pages: list[tuple[str, list[str]]]) -> Trie:
+    """Single-process build as done by build_index."""
+    word_trie = index_pages(pages)
+    word_trie.rebuild_stats()
+    return word_trie
+
+
+def bench_build(num_pages: int = 5_000) -> None:
+    """Compare index build strategies on a synthetic crawl."""
+    pages = synthetic_crawl(num_pages)
+    processes = max(2, min(4, multiprocessing.cpu_count()))
+    print(f"Index build: {num_pages:,} pages, {sum(len(w) for _, w in pages):,} words")
+    for name, build in (("get + reassign", lambda: _reassign_build(pages)),
+                        ("setdefault", lambda: _serial_build(pages)),
+                        (f"{processes} processes", lambda: index_pages_parallel(pages, processes))):
+        start = time.perf_counter()
+        word_trie = build()
+        print(f"{name:<22}{time.perf_counter() - start:>8.2f} s  ({len(word_trie):,} keys)")
+
+
+def bench_search(num_pages: int = 5_000, num_queries: int = 200) -> None:
+    """Time boolean and ranked multi-word queries against a synthetic crawl."""
+    pages = synthetic_crawl(num_pages)
+    word_trie = index_pages(pages)
+    word_trie.rebuild_stats()
+    engine = SearchEngine(word_trie)
+    rng = random.Random(3)
+    # Draw terms by page occurrence, so common words show up as often as on a real crawl
+    terms = [rng.choice(rng.choice(pages)[1]) for _ in range(3 * num_queries)]
+    queries = {
+        "a b": [f"{terms[i]} {terms[i + 1]}" for i in range(num_queries)],
+        "a OR b OR c": [" OR ".join(terms[i:i + 3]) for i in range(num_queries)],
+        "a -b": [f"{terms[i]} -{terms[i + 1]}" for i in range(num_queries)],
+    }
+    print(f"Search: {num_pages:,} pages, {len(word_trie):,} words")
+    print(f"{'query':<14}{'boolean ms':>12}{'ranked ms':>12}")
+    for name, batch in queries.items():
+        timings = []
+        for run in (engine.boolean_search, lambda query: engine.search(query, limit=10)):
+            start = time.perf_counter()
+            for query in batch:
+                run(query)
+            timings.append((time.perf_counter() - start) / len(batch) * 1000)
+        print(f"{name:<14}{timings[0]:>12.3f}{timings[1]:>12.3f}")
+
+
+def _url_dict_build(pages: list[tuple[str, list[str]]]) -> Trie:
+    """Reference build with plain URL -> term frequency dicts as postings."""
+    word_trie = Trie()
+    for url, words in pages:
+        for word in words:
+            postings = word_trie.setdefault(word, {})
+            postings[url] = postings.get(url, 0) + 1
+    return word_trie
+
+
+def bench_postings(num_pages: int = 20_000) -> None:
+    """Compare the memory of URL-keyed dict postings and PostingLists on a Zipfian crawl."""
+    pages = synthetic_crawl(num_pages, zipf=True)
+    print(f"Postings memory: {num_pages:,} pages, {sum(len(w) for _, w in pages):,} words")
+    print(f"{'postings':<14}{'postings MiB':>14}{'build peak MiB':>16}")
+
+    tracemalloc.start()
+    url_dicts = _url_dict_build(pages)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    dict_bytes = sum(sys.getsizeof(postings) for _, postings in url_dicts)
+    print(f"{'URL dicts':<14}{dict_bytes / 2 ** 20:>14.1f}{peak / 2 ** 20:>16.1f}")
+    del url_dicts
+
+    tracemalloc.start()
+    posting_lists = index_pages(pages)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = memory_stats(posting_lists)
+    print(f"{'PostingList':<14}{stats.postings_bytes / 2 ** 20:>14.1f}{peak / 2 ** 20:>16.1f}"
+          f"   (+{stats.documents_bytes / 2 ** 20:.1f} MiB document table)")
+
+
+def backtracking_wildcard(trie, node, prefix: str, pattern: str):
+    """
+    Reference matcher that walks the trie straight from the pattern: a '*'
+    either ends or swallows one more character. Without memoization a node
+    is revisited once per way the '*'s can split the key before it.
+    """
+    if not pattern:
+        is_terminal, value = trie._entry(node)
+        if is_terminal:
+            yield prefix, value
+        return
+    char, rest = pattern[0], pattern[1:]
+    if char == '*':
+        yield from backtracking_wildcard(trie, node, prefix, rest)
+    for label, child in trie._edges(node):
+        if char in ('*', '?') or char == label:
+            yield from backtracking_wildcard(trie, child, prefix + label,
+                                             pattern if char == '*' else rest)
+
+
+def bench_wildcard(num_words: int = 200_000) -> None:
+    """Time broad wildcard patterns: automaton walk, naive backtracking and a regex over every key."""
+    trie = Trie()
+    for word in random_words(num_words):
+        trie[word] = True
+    patterns = ["*a*b*c", "*a*b*c*d*e", "*ing", "?a?e*", "a*", "*q*z*"]
+    print(f"Wildcard search: {num_words:,} words")
+    print(f"{'pattern':<14}{'matches':>9}{'automaton s':>13}{'backtrack s':>13}{'regex scan s':>14}")
+    for pattern in patterns:
+        counts, timings = [], []
+        regex = re.compile(fnmatch.translate(pattern))
+        for run in (lambda: trie.wildcard_search(pattern),
+                    lambda: backtracking_wildcard(trie, trie.root, '', pattern),
+                    lambda: ((k, v) for k, v in trie if regex.match(k))):
+            start = time.perf_counter()
+            counts.append(sum(1 for _ in run()))
+            timings.append(time.perf_counter() - start)
+        print(f"{pattern:<14}{counts[0]:>9,}" + "".join(f"{t:>13.3f}" for t in timings[:2])
+              + f"{timings[2]:>14.3f}")
+
+
+def bench_wildcard_pathological(num_words: int = 5_000) -> None:
+    """
+    Time repeated-'*' patterns on a two-letter vocabulary, where the number of
+    ways the '*'s can split a key grows combinatorially.
+    """
+    rng = random.Random(4)
+    trie = Trie()
+    while len(trie) < num_words:
+        trie[''.join(rng.choices("ab", k=rng.randint(10, 24)))] = True
+    print(f"Pathological wildcards: {num_words:,} words over 'ab'")
+    print(f"{'pattern':<14}{'matches':>9}{'automaton s':>13}{'backtrack s':>13}")
+    for pattern in ["*a*b", "*a*a*b", "*a*a*a*a*b"]:
+        counts, timings = [], []
+        for run in (lambda: trie.wildcard_search(pattern),
+                    lambda: backtracking_wildcard(trie, trie.root, '', pattern)):
+            start = time.perf_counter()
+            counts.append(sum(1 for _ in run()))
+            timings.append(time.perf_counter() - start)
+        print(f"{pattern:<14}{counts[0]:>9,}" + "".join(f"{t:>13.3f}" for t in timings))
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Edit distance between two strings by the full dynamic programming table."""
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row = row, [i]
+        for j, other in enumerate(b, 1):
+            row.append(min(previous[j - 1] + (char != other), previous[j] + 1, row[j - 1] + 1))
+    return row[-1]
+
+
+def bench_fuzzy(num_words: int = 200_000, num_queries: int = 5) -> None:
+    """Time typo lookups: the pruned trie walk against computing the distance to every key."""
+    words = random_words(num_words)
+    trie = Trie()
+    for word in words:
+        trie[word] = True
+    rng = random.Random(5)
+    queries = []
+    for word in rng.sample([w for w in words if len(w) >= 4], num_queries):
+        pos = rng.randrange(len(word))
+        queries.append(word[:pos] + rng.choice(string.ascii_lowercase) + word[pos + 1:])
+
+    start = time.perf_counter()
+    distances = [levenshtein(query, word) for query in queries for word in words]
+    brute_force = time.perf_counter() - start  # the same for any bound
+    print(f"Fuzzy search: {num_words:,} words, {num_queries} mistyped queries "
+          f"(brute force: {brute_force:.3f}s)")
+    print(f"{'distance':<10}{'matches':>9}{'trie walk s':>13}")
+    for max_distance in (1, 2, 3):
+        start = time.perf_counter()
+        matches = sum(1 for query in queries for _ in trie.fuzzy_search(query, max_distance))
+        walk = time.perf_counter() - start
+        assert matches == sum(1 for distance in distances if distance <= max_distance)
+        print(f"{max_distance:<10}{matches:>9,}{walk:>13.3f}")
+
+
+def bench_visited(num_urls: int = 1_000_000) -> None:
+    """Memory and time to record crawl-like URLs in an exact set and in a scalable Bloom filter."""
+    rng = random.Random(6)
+    urls = [f"https://example.com/{'/'.join(rng.choices(['parks', 'items', 'news', 'page'], k=3))}"
+            f"/{i}?ref={rng.randrange(1000)}" for i in range(num_urls)]
+    print(f"Visited sets: {num_urls:,} canonical URLs")
+    print(f"{'backend':<22}{'MB':>8}{'add s':>9}{'false pos':>11}")
+    for name, make, size in [
+            ("set", set, lambda urls: sys.getsizeof(urls) + sum(map(sys.getsizeof, urls))),
+            ("ScalableBloomFilter", lambda: ScalableBloomFilter(error_rate=0.001),
+             lambda bloom: bloom.nbytes())]:
+        start = time.perf_counter()
+        visited = make()
+        for url in urls:
+            visited.add(url)
+        elapsed = time.perf_counter() - start
+        false_positives = sum(f"https://example.com/unseen/{i}" in visited for i in range(100_000))
+        print(f"{name:<22}{size(visited) / 1e6:>8.1f}{elapsed:>9.2f}{false_positives / 100_000:>11.4%}")
+
+
+def bench_streaming(num_pages: int = 5_000, words_per_page: int = 300) -> None:
+    """
+    Peak memory of indexing a crawl whose pages are all collected first (as
+    crawl_site returns them) against indexing each page as it arrives (as
+    build_index does with iter_crawl).
+    """
+    def crawled_pages():
+        # Split page text the way extract_page does, so every page owns its word strings
+        for url, words in synthetic_pages(num_pages, words_per_page, zipf=True):
+            yield url, " ".join(words).split()
+
+    print(f"Crawl-to-index memory: {num_pages:,} pages x {words_per_page} words")
+    print(f"{'pipeline':<14}{'peak MB':>9}{'seconds':>9}")
+    for name, build in [("materialized", lambda: index_pages(dict(crawled_pages()).items())),
+                        ("streaming", lambda: index_pages(crawled_pages()))]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        build()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:<14}{peak / 1e6:>9.1f}{elapsed:>9.2f}")
+
+
+def synthetic_prose(num_pages: int, words_per_page: int = 300) -> list[tuple[str, list[str]]]:
+    """
+    Pages of whitespace-split prose as get_text would give: Zipf-distributed
+    words, about half of them stopwords, with capitals, plurals, possessives
+    and punctuation attached.
+    """
+    rng = random.Random(3)
+    vocabulary = sorted(STOPWORDS) + random_words(20_000, seed=3)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    pages = []
+    for i in range(num_pages):
+        words = []
+        for word in rng.choices(vocabulary, cum_weights=cum_weights, k=words_per_page):
+            roll = rng.random()
+            if roll < 0.1:
+                word = word.capitalize()
+            elif roll < 0.15:
+                word += "s"
+            elif roll < 0.17:
+                word += "'s"
+            if rng.random() < 0.12:
+                word += rng.choice(",.;:!?")
+            elif rng.random() < 0.02:
+                word = f"({word})"
+            words.append(word)
+        pages.append((f"https://example.com/{i}", words))
+    return pages
+
+
+def bench_tokenizer(start_url: str = "https://scrapple.fly.dev/parks", max_depth: int = 2,
+                    num_pages: int = 5_000) -> None:
+    """
+    Index size and build time with raw whitespace-split words against the
+    Tokenizer stage, with and without stemming. Crawls `start_url` when the
+    network allows, and falls back to synthetic prose otherwise.
+    """
+    pages = list(iter_crawl(start_url, max_depth))
+    source = f"crawl of {start_url} (depth {max_depth})"
+    if not pages:
+        pages = synthetic_prose(num_pages)
+        source = "synthetic prose (no network)"
+    tokens = sum(len(words) for _, words in pages)
+    print(f"Token normalization: {len(pages):,} pages, {tokens:,} tokens, {source}")
+    print(f"{'tokenizer':<22}{'inserts':>10}{'keys':>9}{'nodes':>10}{'seconds':>9}")
+    for name, tokenizer in [("none (raw split)", None), ("Tokenizer()", Tokenizer()),
+                            ('Tokenizer(stem="s")', Tokenizer(stem="s"))]:
+        start = time.perf_counter()
+        trie = index_pages(pages, tokenizer=tokenizer)
+        elapsed = time.perf_counter() - start
+        inserts = sum(len(postings) for _, postings in trie)  # one per distinct term per page
+        print(f"{name:<22}{inserts:>10,}{len(trie):>9,}{count_nodes(trie):>10,}{elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    num_words = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    bench_layouts(num_words)
+    print()
+    bench_radix(num_words)
+    print()
+    bench_iteration()
+    print()
+    bench_extract()
+    print()
+    bench_build()
+    print()
+    bench_search()
+    print()
+    bench_postings()
+    print()
+    bench_wildcard()
+    print()
+    bench_wildcard_pathological()
+    print()
+    bench_fuzzy()
+    print()
+    bench_visited()
+    print()
+    bench_streaming()
+    print()
+    bench_tokenizer()
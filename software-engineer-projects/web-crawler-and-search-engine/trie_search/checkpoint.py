@@ -0,0 +1,140 @@
+import json
+import os
+from typing import NamedTuple, Optional
+
+from utils import canonicalize_url
+
+# Snapshots are rewritten once the log holds at least this many pages
+SNAPSHOT_EVERY = 500
+
+_SNAPSHOT = "snapshot.json"
+_LOG = "pages.log"
+_VERSION = 1
+
+
+class CrawlState(NamedTuple):
+    """Everything crawl_site needs to carry on from where it stopped."""
+    results: dict               # URL -> words of every page fetched so far
+    visited: set                # canonical URLs ever queued (never queued twice)
+    queue: list                 # (URL as linked, depth) still to fetch, in order
+
+
+class CrawlCheckpoint:
+    """
+    Checkpoints of a running crawl in a directory, as a snapshot plus an
+    append-only log.
+
+    `snapshot.json` holds a whole CrawlState. `pages.log` holds one JSON line
+    per page fetched since: its URL, its words and the links it queued. The
+    log is flushed after every page, so a crash or Ctrl-C loses at most the
+    page being fetched; a line cut off mid-write is ignored on load.
+
+    Writing a snapshot costs as much as the whole state, so a new one is
+    only written (and the log started afresh) once the log has grown as large
+    as the last snapshot, keeping the total cost linear in the crawl size.
+    Each snapshot records how many pages it covers and each log line its
+    sequence number, so a crash between writing a snapshot and truncating the
+    log never applies a page twice.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = SNAPSHOT_EVERY):
+        """
+        Parameters:
+            directory - Directory to keep the checkpoint in (created if missing).
+            snapshot_every - Minimum number of logged pages between snapshots.
+        """
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.sequence = 0          # pages recorded since the crawl started
+        self._snapshot_pages = 0   # pages in the last snapshot
+        self._logged = 0           # pages in the log since that snapshot
+        self._log = None
+        os.makedirs(directory, exist_ok=True)
+
+    # Helper function
+    def _path(self, name: str) -> str:
+        """Return the path of a file in the checkpoint directory."""
+        return os.path.join(self.directory, name)
+
+    def load(self) -> Optional[CrawlState]:
+        """
+        Return the state saved in the directory (last snapshot plus the pages
+        logged after it), or None if there is no checkpoint.
+        """
+        try:
+            with open(self._path(_SNAPSHOT), encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return None
+        if snapshot.get("version") != _VERSION:
+            raise ValueError(f"{self.directory} holds an unsupported checkpoint version")
+
+        results = snapshot["results"]
+        visited = set(snapshot["visited"])
+        queue = [tuple(item) for item in snapshot["queue"]]
+        self.sequence = snapshot["sequence"]
+        done = set()
+        try:
+            with open(self._path(_LOG), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from a crash
+                    if record["seq"] <= self.sequence:
+                        continue  # already in the snapshot
+                    self.sequence = record["seq"]
+                    done.add(record["url"])
+                    if record["words"] is not None:
+                        results[record["url"]] = record["words"]
+                    for link, depth in record["links"]:
+                        visited.add(canonicalize_url(link))  # queued as linked, visited canonical
+                        queue.append((link, depth))
+        except FileNotFoundError:
+            pass
+        if done:
+            queue = [(url, depth) for url, depth in queue if url not in done]
+        return CrawlState(results, visited, queue)
+
+    def snapshot(self, state: CrawlState) -> None:
+        """Write `state` as the new snapshot and start an empty log after it."""
+        temporary = self._path(_SNAPSHOT + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": _VERSION, "sequence": self.sequence,
+                       "results": state.results, "visited": sorted(state.visited),
+                       "queue": state.queue}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._path(_SNAPSHOT))  # atomic: the old snapshot stays until now
+
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self._path(_LOG), "w", encoding="utf-8")
+        self._snapshot_pages = len(state.results)
+        self._logged = 0
+
+    def record(self, url: str, words: Optional[list[str]], links: list[tuple[str, int]]) -> None:
+        """
+        Append a fetched page to the log.
+
+        Parameters:
+            url - URL of the page.
+            words - Words on the page, or None if it could not be fetched.
+            links - (URL, depth) of the links it added to the queue.
+        """
+        self.sequence += 1
+        self._log.write(json.dumps({"seq": self.sequence, "url": url, "words": words,
+                                    "links": links}) + "\n")
+        self._log.flush()
+        self._logged += 1
+
+    @property
+    def snapshot_due(self) -> bool:
+        """Whether the log has grown enough to be folded into a new snapshot."""
+        return self._logged >= max(self.snapshot_every, self._snapshot_pages)
+
+    def close(self) -> None:
+        """Close the log."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
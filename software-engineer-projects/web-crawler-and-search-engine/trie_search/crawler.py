@@ -1,8 +1,89 @@
-from utils import get_links, get_text, fetch_html, FetchException
-# from collections import defaultdict
-from trie import Trie
+import asyncio
+import hashlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Iterable, Iterator, NamedTuple, Optional
 
-def crawl_site(start_url: str, max_depth: int) -> dict[str, list[str]]:
+import httpx
+
+import utils
+from utils import (allowed_url, canonicalize_url, extract_page, fetch_html_conditional,
+                   fetch_page, fetch_page_async, FetchException)
+from checkpoint import CrawlCheckpoint, CrawlState
+from postings import DocumentTable, PostingList, documents_of
+from scheduler import CrawlScheduler, RobotsCache, polite_rate
+from tokenizer import Tokenizer
+from trie import CompactTrie, Trie, character_to_key, normalize_key
+from visited import VisitedSet
+
+# Helper function
+def _crawl_pages(urls: deque, depth_map: dict[str, int], visited: VisitedSet,
+                 max_depth: int) -> Iterator[tuple[str, Optional[list[str]], list[tuple[str, int]]]]:
+    """
+    Fetch the queued `urls` breadth-first, queueing the unvisited links of
+    each page (within max_depth), and yield for every page its URL, its words
+    (None if it could not be fetched) and the (link, depth) pairs it queued.
+    `urls`, `depth_map` and `visited` are updated in place.
+
+    Links are queued and fetched as they were found, so relative links
+    resolve against the URL the page was really served from; `visited`
+    holds their canonical forms, so each page is still fetched once.
+    """
+    while urls:
+        current_url = urls.popleft()
+        current_depth = depth_map.pop(current_url)
+        words, added = None, []
+
+        try:
+            # Fetch HTML and extract text and links in one parse
+            page = fetch_page(current_url, check_seen=False)
+            words, links = extract_page(page.html, page.url)
+
+            # Process links only if within depth limits
+            if current_depth < max_depth:
+                for link in links:
+                    canonical = canonicalize_url(link)
+                    if canonical not in visited:
+                        visited.add(canonical)
+                        urls.append(link)
+                        depth_map[link] = current_depth + 1
+                        added.append((link, current_depth + 1))
+
+        except FetchException as e:
+            pass
+
+        yield current_url, words, added
+
+
+def iter_crawl(start_url: str, max_depth: int,
+               visited: Optional[VisitedSet] = None) -> Iterator[tuple[str, list[str]]]:
+    """
+    Streaming version of crawl_site: yield (URL, words on that page) for
+    each page as soon as it is fetched instead of collecting them all.
+
+    Only the frontier is kept between pages, so a caller that indexes each
+    page and drops its words (as build_index does) never holds the whole
+    crawled corpus in memory. The next page is fetched when the next pair
+    is asked for.
+
+    Parameters:
+
+        start_url - URL of page to start crawl on.
+        max_depth - Maximum link depth into site to visit.
+        visited - Set to track queued URLs in (see crawl_site).
+    """
+    if visited is None:
+        visited = set()
+    visited.add(canonicalize_url(start_url))
+    for url, words, _ in _crawl_pages(deque([start_url]), {start_url: 0}, visited, max_depth):
+        if words is not None:
+            yield canonicalize_url(url), words
+
+
+def crawl_site(start_url: str, max_depth: int, checkpoint: Optional[str] = None,
+               resume: bool = False,
+               visited: Optional[VisitedSet] = None) -> dict[str, list[str]]:
     """
     Given a starting URL, return a mapping of URLs mapped to words that appeared on that page.
 
@@ -14,45 +95,309 @@ def crawl_site(start_url: str, max_depth: int) -> dict[str, list[str]]:
         start_url - URL of page to start crawl on.
         max_depth - Maximum link depth into site to visit.
                     Links from the start page would be depth=1, links from those depth=2, and so on.
+        checkpoint - Directory to checkpoint the crawl in as it goes (see
+                     CrawlCheckpoint), so an interrupted crawl can be resumed.
+        resume - Carry on from the checkpoint in `checkpoint` if there is one,
+                 instead of starting over.
+        visited - Set to track queued URLs in (a new `set` if not given),
+                  e.g. a ScalableBloomFilter to bound memory on huge crawls.
+                  Checkpointed crawls keep an exact set.
 
     Returns:
         Dictionary mapping strings to lists of strings.
 
-        Dictionary keys: URLs of pages visited.
+        Dictionary keys: URLs of pages visited, in canonical form (see
+        canonicalize_url), so each page is fetched once however it is linked.
         Dictionary values: lists of all words that appeared on a given page.
     """
 
-    results = {}
-    visited = set()
-    depth_map = {start_url: 0}
-    urls = [start_url]
+    log = None
+    state = None
+    if checkpoint is not None:
+        if visited is not None:
+            raise ValueError("a checkpointed crawl keeps its own exact visited set")
+        log = CrawlCheckpoint(checkpoint)
+        if resume:
+            state = log.load()
+    if state is None:
+        if visited is None:
+            visited = set()
+        visited.add(canonicalize_url(start_url))
+        state = CrawlState({}, visited, [(start_url, 0)])
 
-    while urls:
-        current_url = urls.pop(0)
-        current_depth = depth_map[current_url]
+    results = state.results  # keyed by the URLs pages were fetched from
+    visited = state.visited
+    depth_map = dict(state.queue)
+    urls = deque(url for url, _ in state.queue)
+    if log is not None:
+        log.snapshot(state)
 
-        try:
-            # Fetch HTML and extract text
-            html = fetch_html(current_url)
-            words = get_text(html).split()
-            results[current_url] = words
+    try:
+        for current_url, words, added in _crawl_pages(urls, depth_map, visited, max_depth):
+            if words is not None:
+                results[current_url] = words
+            if log is not None:
+                log.record(current_url, words, added)
+                if log.snapshot_due:
+                    log.snapshot(CrawlState(results, visited,
+                                            [(url, depth_map[url]) for url in urls]))
+    finally:
+        if log is not None:
+            log.close()
 
-            # Extract and process links only if within depth limits
-            if current_depth < max_depth:
-                links = get_links(html, current_url)
-                for link in links:
-                    if link not in visited:
-                        visited.add(link)
-                        urls.append(link)
-                        depth_map[link] = current_depth + 1
+    return {canonicalize_url(url): words for url, words in results.items()}
+
+
+async def iter_crawl_async(start_url: str, max_depth: int, workers: int = 8,
+                           per_host: int = 2,
+                           client: Optional[httpx.AsyncClient] = None,
+                           rate: Optional[float] = None,
+                           robots: bool = True,
+                           visited: Optional[VisitedSet] = None,
+                           queue_size: int = 16) -> AsyncIterator[tuple[str, list[str]]]:
+    """
+    Concurrent version of iter_crawl: yield (URL, words on that page) as
+    pages are fetched by up to `workers` concurrent requests over one shared
+    `httpx.AsyncClient`, with the same max_depth and visit-once rules.
+
+    Parameters:
+
+        start_url - URL of page to start crawl on.
+        max_depth - Maximum link depth into site to visit.
+        workers - Number of pages fetched concurrently.
+        per_host - Maximum concurrent requests to any one host.
+        client - Client to fetch with (one is created and closed if not given).
+        rate - Maximum requests per second to any one host (None for no limit).
+        robots - Whether to obey each host's robots.txt: its Disallow rules
+                 and its Crawl-delay / Request-rate, which lower `rate`.
+        visited - Set to track queued URLs in (see crawl_site).
+        queue_size - Fetched pages that may wait for the consumer; once this
+                     many are waiting, workers pause until it catches up.
+
+    Pages are handed out by a CrawlScheduler: shallowest first among the
+    hosts that are free to take a request, so pages are fetched roughly in
+    breadth-first order while many hosts are crawled side by side, each
+    within its own limits. A queued page whose link is found again on a
+    shallower path takes the smaller depth; pages are never fetched past
+    max_depth.
+    Links that are not https on one of ALLOWED_DOMAINS are never queued, so
+    their hosts get no requests at all.
+    """
+    if client is None:
+        async with utils.http_pool.async_client() as client:
+            async for page in iter_crawl_async(start_url, max_depth, workers, per_host, client,
+                                               rate, robots, visited, queue_size):
+                yield page
+        return
+
+    if not allowed_url(start_url):
+        return
+    if visited is None:
+        visited = set()
+    visited.add(canonicalize_url(start_url))
+    depth_map = {canonicalize_url(start_url): 0}  # canonical URL -> depth, while queued
+    frontier = CrawlScheduler(rate, per_host=per_host)
+    frontier.add(start_url, 0)
+    robots_rules = RobotsCache()
+    user_agent = client.headers.get("User-Agent", "*")
+    in_flight = 0
+    changed = asyncio.Condition()
+    fetched = asyncio.Queue(maxsize=queue_size)
+
+    async def worker() -> None:
+        nonlocal in_flight
+        while True:
+            async with changed:
+                # Idle workers wait for a host to be free or for the crawl to end
+                while (current_url := frontier.pop()) is None:
+                    if not frontier and not in_flight:
+                        return
+                    try:
+                        await asyncio.wait_for(changed.wait(), frontier.wait_time())
+                    except asyncio.TimeoutError:
+                        pass
+                in_flight += 1
+                page_url = canonicalize_url(current_url)
+                current_depth = depth_map.pop(page_url)
+
+            try:
+                if robots:
+                    rules = robots_rules.get(current_url)
+                    if rules is None:
+                        # Spend this turn at the host on its robots.txt, then queue the page again
+                        rules = await robots_rules.fetch(current_url, client)
+                        frontier.limit_host(current_url, polite_rate(rules, user_agent, rate))
+                        frontier.add(current_url, current_depth)
+                        depth_map[page_url] = current_depth
+                        continue
+                    if not rules.can_fetch(user_agent, current_url):
+                        continue
+
+                page = await fetch_page_async(current_url, client, check_seen=False)
+                words, links = extract_page(page.html, page.url)
+
+                if current_depth < max_depth:
+                    # Links the fetch would refuse are dropped here, so no
+                    # request (not even for robots.txt) goes to their hosts
+                    for link in filter(allowed_url, links):
+                        canonical = canonicalize_url(link)
+                        if canonical not in visited:
+                            visited.add(canonical)
+                            frontier.add(link, current_depth + 1)
+                            depth_map[canonical] = current_depth + 1
+                        elif canonical in depth_map and depth_map[canonical] > current_depth + 1:
+                            depth_map[canonical] = current_depth + 1
+                async with changed:
+                    changed.notify_all()  # let idle workers at the new links before waiting below
+                await fetched.put((page_url, words))
+
+            except FetchException:
+                pass
+            finally:
+                async with changed:
+                    frontier.done(current_url)
+                    in_flight -= 1
+                    changed.notify_all()
+
+    crawling = asyncio.ensure_future(asyncio.gather(*(worker() for _ in range(workers))))
+    try:
+        while not crawling.done():
+            getting = asyncio.ensure_future(fetched.get())
+            await asyncio.wait((getting, crawling), return_when=asyncio.FIRST_COMPLETED)
+            if getting.done():
+                yield getting.result()
+            else:
+                getting.cancel()
+        while not fetched.empty():
+            yield fetched.get_nowait()
+        crawling.result()  # raise whatever stopped the workers
+    finally:
+        crawling.cancel()
+
+
+async def crawl_site_async(start_url: str, max_depth: int, workers: int = 8,
+                           per_host: int = 2,
+                           client: Optional[httpx.AsyncClient] = None,
+                           rate: Optional[float] = None,
+                           robots: bool = True,
+                           visited: Optional[VisitedSet] = None) -> dict[str, list[str]]:
+    """
+    Concurrent version of crawl_site: same arguments, same result, same
+    max_depth and visit-once rules, but up to `workers` pages are fetched
+    at a time (see iter_crawl_async for the other parameters).
+
+    Returns:
+        Dictionary mapping URLs of pages visited to lists of all words that
+        appeared on a given page.
+    """
+    return {url: words async for url, words in iter_crawl_async(
+        start_url, max_depth, workers, per_host, client, rate, robots, visited)}
 
-        except FetchException as e:
-            continue
 
-    return results
+# Helper function
+def _iterate_async(pages: AsyncIterator[tuple[str, list[str]]]) -> Iterator[tuple[str, list[str]]]:
+    """
+    Yield the items of an async iterator from synchronous code, running the
+    event loop only while the next item is awaited.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(pages.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(pages.aclose())
+        loop.close()
 
 
-def build_index(site_url: str, max_depth: int) -> Trie:
+def index_pages(pages: Iterable[tuple[str, list[str]]], trie_class: type = Trie,
+                documents: Optional[DocumentTable] = None,
+                tokenizer: Optional[Tokenizer] = None) -> Trie:
+    """
+    Build a trie of every word in `pages` mapped to its PostingList: the
+    URLs it appeared on (as document ids) and how many times it appeared there.
+
+    Parameters:
+
+        pages - (URL, list of words on that page) pairs.
+        trie_class - Trie variant to build.
+        documents - Table to intern URLs and record page lengths in; a new
+                    one if not given.
+        tokenizer - Normalization applied to each page's words before they
+                    are indexed (words are indexed as they are if not given).
+
+    Returns:
+        The trie, with compacted posting lists. Postings are grown in place,
+        so its completion stats are stale until `rebuild_stats` (or `merge`
+        into another trie) runs.
+    """
+    word_trie = trie_class()
+    if documents is None:
+        documents = DocumentTable()
+    spare = PostingList(documents)
+    for url, words in pages:
+        counts = Counter(words) if tokenizer is None else tokenizer.count(words)
+        doc_id = documents.intern(url)
+        documents.set_length(doc_id, sum(counts.values()))
+        for word, count in counts.items():
+            postings = word_trie.setdefault(word, spare)  # one traversal per word
+            if postings is spare:  # a new word took it
+                spare = PostingList(documents)
+            postings.add(doc_id, count)
+    for _, postings in word_trie:
+        postings.compact()
+    return word_trie
+
+
+def index_pages_parallel(pages: Iterable[tuple[str, list[str]]], processes: int,
+                         tokenizer: Optional[Tokenizer] = None) -> Trie:
+    """
+    Build the same trie as index_pages using `processes` worker processes.
+
+    Words are partitioned by their first character, so every shard owns a
+    disjoint set of root subtrees. Each worker indexes its shard into a
+    CompactTrie (cheap to send back), and merging the shards then visits
+    every node of the final trie only once. Document ids are assigned up
+    front, so the shards' posting lists all agree on them.
+
+    Parameters:
+
+        pages - (URL, list of words on that page) pairs.
+        processes - Number of worker processes.
+        tokenizer - Normalization applied to each page's words before they
+                    are split into shards (see index_pages).
+
+    Returns:
+        The trie, with up-to-date completion stats.
+    """
+    documents = DocumentTable()
+    shards = [[] for _ in range(processes)]
+    for url, words in pages:
+        if tokenizer is not None:
+            words = tokenizer(words)
+        documents.set_length(documents.intern(url), len(words))
+        split = [[] for _ in range(processes)]
+        for word in words:
+            split[character_to_key(word[0]) % processes].append(word)
+        for shard, shard_words in zip(shards, split):
+            if shard_words:
+                shard.append((url, shard_words))
+
+    word_trie = Trie()
+    with ProcessPoolExecutor(processes) as executor:
+        index_shard = partial(index_pages, trie_class=CompactTrie, documents=documents)
+        for shard in executor.map(index_shard, shards):
+            word_trie.merge(shard)  # shards share no keys
+    for _, postings in word_trie:
+        postings.documents = documents  # workers returned their own copies of the table
+    return word_trie
+
+
+def build_index(site_url: str, max_depth: int, workers: int = 1, processes: int = 1,
+                checkpoint: Optional[str] = None, resume: bool = False,
+                tokenizer: Optional[Tokenizer] = None) -> Trie:
     """
     Given a starting URL, build a `Trie` of all words seen mapped to
     the page(s) they appeared upon.
@@ -61,23 +406,176 @@ def build_index(site_url: str, max_depth: int) -> Trie:
 
         start_url - URL of page to start crawl on.
         max_depth - Maximum link depth into site to visit.
+        workers - Pages to fetch concurrently; above 1 the crawl runs on asyncio
+                  (see crawl_site_async).
+        processes - Processes to index with (see index_pages_parallel).
+        checkpoint - Directory to checkpoint the crawl in (see crawl_site);
+                     only used by the sequential crawl (workers=1).
+        resume - Resume the crawl from `checkpoint` instead of starting over.
+        tokenizer - Normalization applied to each page's words before they are
+                    indexed; search the index with the same one (see SearchEngine).
 
     Returns:
         `Trie` where the keys are words seen on the crawl, and the
-        value associated with each key is a set of URLs that word
-        appeared on.
+        value associated with each key is a PostingList mapping the URLs
+        that word appeared on to its term frequency on that page.
     """
-    # Initialize the Trie
-    word_trie = Trie()
-
-    # Get crawl results (URL -> list of words)
-    crawl_results = crawl_site(site_url, max_depth)
+    # Pages are indexed as they are fetched, so each page's words can be
+    # dropped as soon as they are in the trie (only a checkpointed crawl
+    # keeps them all, as part of its checkpoint)
+    if workers > 1:
+        pages = _iterate_async(iter_crawl_async(site_url, max_depth, workers=workers))
+    elif checkpoint is not None:
+        pages = crawl_site(site_url, max_depth, checkpoint, resume).items()
+    else:
+        pages = iter_crawl(site_url, max_depth)
 
     # Populate the Trie with words and their associated URLs
-    for url, words in crawl_results.items():
-        for word in words:
-            if word not in word_trie:
-                word_trie[word] = set()  # Initialize a set for the word
-            word_trie[word].add(url)  # Add the URL to the word's set
+    if processes > 1:
+        word_trie = index_pages_parallel(pages, processes, tokenizer)
+    else:
+        word_trie = index_pages(pages, tokenizer=tokenizer)
+        word_trie.rebuild_stats()
 
     return word_trie  # Return the constructed Trie
+
+
+class PageRecord(NamedTuple):
+    """What refresh_index remembers about a page between crawls."""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    words: dict        # (normalized) trie key -> times it appears on the page
+    links: tuple       # links on the page, to keep crawling past unchanged pages
+
+
+class RefreshSummary(NamedTuple):
+    """Page counts from one refresh_index call."""
+    new: int
+    changed: int
+    unchanged: int     # 304 Not Modified, or same content hash
+    removed: int       # indexed before but not reached this time
+    failed: int = 0    # indexed before but could not be fetched, so kept as it was
+
+
+def _update_postings(word_trie: Trie, documents: DocumentTable, url: str,
+                     old_words: dict, new_words: dict) -> None:
+    """
+    Remove `url` from the postings of words it lost, add it to those of words
+    it gained and update its term frequency for words whose count changed.
+    """
+    for word in old_words.keys() - new_words.keys():
+        postings = word_trie.get(word)
+        if postings is None:
+            continue
+        postings.pop(url, None)
+        if postings:
+            word_trie[word] = postings  # Re-assign so the trie's completion scores stay current
+        else:
+            del word_trie[word]
+    for word, frequency in new_words.items():
+        if word not in old_words:
+            postings = word_trie.get(word)
+            if postings is None:
+                postings = PostingList(documents)
+            postings[url] = frequency
+            word_trie[word] = postings
+        elif old_words[word] != frequency:
+            postings = word_trie[word]
+            postings[url] = frequency
+            word_trie[word] = postings  # so the trie's generation moves on too
+
+
+def refresh_index(word_trie: Trie, site_url: str, max_depth: int,
+                  pages: dict[str, PageRecord],
+                  tokenizer: Optional[Tokenizer] = None) -> RefreshSummary:
+    """
+    Bring a `Trie` built by an earlier crawl up to date by crawling again
+    with conditional GETs.
+
+    Pages send their stored ETag / Last-Modified; a 304 (or an identical
+    content hash) leaves their postings untouched, so the cost of a refresh
+    tracks how much changed. Changed pages only have the words they gained or
+    lost updated, and pages no longer reachable are removed from the index.
+    A page that was indexed before but cannot be fetched now (an error
+    status or a failed request) keeps its postings and stored links.
+    Calling it with an empty trie and record dict performs a full build.
+
+    Parameters:
+
+        word_trie - `Trie` of words to PostingLists, updated in place.
+        site_url - URL of page to start crawl on.
+        max_depth - Maximum link depth into site to visit.
+        pages - URL -> PageRecord from the previous refresh, updated in place.
+        tokenizer - Normalization the index was built with (see index_pages).
+
+    Returns:
+        RefreshSummary of what happened to the pages.
+    """
+    documents = documents_of(word_trie)
+    new = changed = unchanged = failed = 0
+    visited = {canonicalize_url(site_url)}
+    depth_map = {site_url: 0}
+    urls = deque([site_url])
+
+    while urls:
+        # Fetched (and its links resolved) as linked; recorded under its canonical URL
+        current_url = urls.popleft()
+        current_depth = depth_map.pop(current_url)
+        page_url = canonicalize_url(current_url)
+        record = pages.get(page_url)
+
+        try:
+            if record is None:
+                fetched = fetch_html_conditional(current_url, check_seen=False)
+            else:
+                fetched = fetch_html_conditional(current_url, record.etag, record.last_modified,
+                                                 check_seen=False)
+        except FetchException:
+            fetched = None
+
+        if fetched is None:
+            # Keep whatever was indexed for it before, and crawl on through
+            # its stored links so the pages behind it are not removed
+            if record is None:
+                continue
+            failed += 1
+        elif fetched.html is None:
+            pages[page_url] = record._replace(etag=fetched.etag,
+                                                 last_modified=fetched.last_modified)
+            unchanged += 1
+        else:
+            content_hash = hashlib.sha256(fetched.html.encode("utf-8")).hexdigest()
+            if record is not None and record.content_hash == content_hash:
+                pages[page_url] = record._replace(etag=fetched.etag,
+                                                     last_modified=fetched.last_modified)
+                unchanged += 1
+            else:
+                words, links = extract_page(fetched.html, fetched.url)
+                if tokenizer is not None:
+                    words = tokenizer(words)
+                words = dict(Counter(map(normalize_key, words)))
+                old_words = {} if record is None else record.words
+                _update_postings(word_trie, documents, page_url, old_words, words)
+                documents.set_length(documents.intern(page_url), sum(words.values()))
+                pages[page_url] = PageRecord(fetched.etag, fetched.last_modified,
+                                                content_hash, words, tuple(links))
+                if record is None:
+                    new += 1
+                else:
+                    changed += 1
+
+        if current_depth < max_depth:
+            for link in pages[page_url].links:
+                canonical = canonicalize_url(link)
+                if canonical not in visited:
+                    visited.add(canonical)
+                    urls.append(link)
+                    depth_map[link] = current_depth + 1
+
+    removed = [url for url in pages if url not in visited]
+    for url in removed:
+        _update_postings(word_trie, documents, url, pages.pop(url).words, {})
+        documents.remove(url)
+
+    return RefreshSummary(new, changed, unchanged, len(removed), failed)
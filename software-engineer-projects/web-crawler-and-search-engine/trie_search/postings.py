@@ -0,0 +1,296 @@
+import itertools
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from trie import Trie
+
+# Term frequencies are stored as unsigned 16-bit ints and clamped to this.
+# BM25 saturates long before it, so ranking is unaffected.
+MAX_FREQUENCY = 0xFFFF
+
+# Above this size ratio, intersect by binary-searching the larger list
+# instead of hashing the smaller one.
+_GALLOP_RATIO = 16
+
+
+class DocumentTable:
+    """
+    Maps URLs to dense integer document ids and stores each document's
+    length (number of indexed words), so posting lists hold small ints
+    instead of URL strings.
+    """
+
+    def __init__(self):
+        self._urls: list[Optional[str]] = []   # doc id -> URL, None once removed
+        self._ids: dict[str, int] = {}
+        self.lengths = array("I")
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        """Number of documents in the table."""
+        return len(self._ids)
+
+    def intern(self, url: str) -> int:
+        """Return the id of `url`, assigning the next free id if it is new."""
+        doc_id = self._ids.get(url)
+        if doc_id is None:
+            doc_id = self._ids[url] = len(self._urls)
+            self._urls.append(url)
+            self.lengths.append(0)
+        return doc_id
+
+    def doc_id(self, url: str) -> Optional[int]:
+        """Return the id of `url`, or None if it is not in the table."""
+        return self._ids.get(url)
+
+    def url(self, doc_id: int) -> str:
+        """Return the URL with the given id."""
+        return self._urls[doc_id]
+
+    def length(self, doc_id: int) -> int:
+        """Return the length of the document with the given id."""
+        return self.lengths[doc_id]
+
+    def set_length(self, doc_id: int, length: int) -> None:
+        """Record the length of the document with the given id."""
+        self.total_length += length - self.lengths[doc_id]
+        self.lengths[doc_id] = length
+
+    def remove(self, url: str) -> None:
+        """Drop `url` from the table. Its id is not reused."""
+        doc_id = self._ids.pop(url)
+        self._urls[doc_id] = None
+        self.set_length(doc_id, 0)
+
+    def doc_ids(self) -> array:
+        """Return the ids of every document in the table, in increasing order."""
+        return array("I", sorted(self._ids.values()))
+
+    def nbytes(self) -> int:
+        """Approximate bytes used by the table (URL strings included)."""
+        return (sys.getsizeof(self._urls) + sys.getsizeof(self._ids) + sys.getsizeof(self.lengths)
+                + sum(sys.getsizeof(url) for url in self._ids))
+
+
+# Packed posting list widths: (id delta typecode, frequency typecode) by header byte
+_PACKED_CODES = [(ids, freqs) for ids in "BHI" for freqs in "BH"]
+
+
+class PostingList(MutableMapping):
+    """
+    The documents a word appears in, as parallel sorted arrays of document
+    ids and term frequencies. Reads and writes as a URL -> term frequency
+    mapping through its DocumentTable.
+
+    Appending ids in increasing order (as index_pages does, page by page)
+    is amortized O(1); inserting elsewhere shifts the arrays. Once built,
+    `compact` packs the list into a single bytes object of id deltas and
+    frequencies, each at the narrowest width that fits; reads decode it at C
+    speed and the first write unpacks it again.
+    """
+    __slots__ = ("documents", "_ids", "_frequencies", "_packed")
+
+    def __init__(self, documents: DocumentTable):
+        self.documents = documents
+        self._ids = array("I")
+        self._frequencies = array("H")
+        self._packed = None
+
+    def arrays(self) -> tuple[array, array]:
+        """
+        Return (sorted document ids, term frequencies). For a compacted list
+        these are decoded copies, so callers should hold on to them rather
+        than call this (or `ids` / `frequencies`) repeatedly.
+        """
+        if self._packed is None:
+            return self._ids, self._frequencies
+        id_code, frequency_code = _PACKED_CODES[self._packed[0]]
+        deltas, frequencies = array(id_code), array(frequency_code)
+        split = 1 + len(self) * deltas.itemsize
+        data = memoryview(self._packed)
+        deltas.frombytes(data[1:split])
+        frequencies.frombytes(data[split:])
+        return array("I", itertools.accumulate(deltas)), frequencies
+
+    @property
+    def ids(self) -> array:
+        """Sorted document ids."""
+        return self.arrays()[0]
+
+    @property
+    def frequencies(self) -> array:
+        """Term frequencies, parallel to `ids`."""
+        return self.arrays()[1]
+
+    def compact(self) -> None:
+        """Pack the list into its read-only compact form (see the class docstring)."""
+        if self._packed is not None or not self._ids:
+            return
+        deltas = array("I", (b - a for a, b in zip(itertools.chain((0,), self._ids), self._ids)))
+        id_code = "B" if max(deltas) < 0x100 else "H" if max(deltas) < 0x10000 else "I"
+        frequency_code = "B" if max(self._frequencies) < 0x100 else "H"
+        self._packed = (bytes([_PACKED_CODES.index((id_code, frequency_code))])
+                        + array(id_code, deltas).tobytes()
+                        + array(frequency_code, self._frequencies).tobytes())
+        self._ids = self._frequencies = None
+
+    # Helper function
+    def _unpack(self) -> None:
+        """Switch a compacted list back to growable arrays before a write."""
+        if self._packed is not None:
+            ids, frequencies = self.arrays()
+            self._ids, self._frequencies = ids, array("H", frequencies)
+            self._packed = None
+
+    def add(self, doc_id: int, count: int = 1) -> None:
+        """Add `count` occurrences in document `doc_id`."""
+        self._unpack()
+        ids = self._ids
+        if not ids or doc_id > ids[-1]:
+            ids.append(doc_id)
+            self._frequencies.append(min(count, MAX_FREQUENCY))
+            return
+        idx = len(ids) - 1 if doc_id == ids[-1] else bisect_left(ids, doc_id)
+        if ids[idx] == doc_id:
+            self._frequencies[idx] = min(self._frequencies[idx] + count, MAX_FREQUENCY)
+        else:
+            ids.insert(idx, doc_id)
+            self._frequencies.insert(idx, min(count, MAX_FREQUENCY))
+
+    def frequency(self, doc_id: int) -> int:
+        """Return the term frequency in document `doc_id` (0 if absent)."""
+        ids, frequencies = self.arrays()
+        idx = bisect_left(ids, doc_id)
+        return frequencies[idx] if idx < len(ids) and ids[idx] == doc_id else 0
+
+    # Helper function
+    def _find(self, ids: array, url: str) -> int:
+        """Return the position of `url` in `ids`, raising KeyError if absent."""
+        doc_id = self.documents.doc_id(url)
+        if doc_id is not None:
+            idx = bisect_left(ids, doc_id)
+            if idx < len(ids) and ids[idx] == doc_id:
+                return idx
+        raise KeyError(url)
+
+    def __getitem__(self, url: str) -> int:
+        ids, frequencies = self.arrays()
+        return frequencies[self._find(ids, url)]
+
+    def __setitem__(self, url: str, frequency: int) -> None:
+        self._unpack()
+        doc_id = self.documents.intern(url)
+        idx = bisect_left(self._ids, doc_id)
+        if idx < len(self._ids) and self._ids[idx] == doc_id:
+            self._frequencies[idx] = min(frequency, MAX_FREQUENCY)
+        else:
+            self._ids.insert(idx, doc_id)
+            self._frequencies.insert(idx, min(frequency, MAX_FREQUENCY))
+
+    def __delitem__(self, url: str) -> None:
+        self._unpack()
+        idx = self._find(self._ids, url)
+        del self._ids[idx]
+        del self._frequencies[idx]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.documents.url, self.ids)
+
+    def __len__(self) -> int:
+        if self._packed is None:
+            return len(self._ids)
+        id_code, frequency_code = _PACKED_CODES[self._packed[0]]
+        width = array(id_code).itemsize + array(frequency_code).itemsize
+        return (len(self._packed) - 1) // width
+
+    def items(self) -> Iterator[tuple[str, int]]:
+        """Return an iterator of (URL, term frequency) pairs in document id order."""
+        ids, frequencies = self.arrays()
+        return zip(map(self.documents.url, ids), frequencies)
+
+    def __repr__(self) -> str:
+        return f"PostingList({dict(self.items())!r})"
+
+    def nbytes(self) -> int:
+        """Bytes used by the posting list and its arrays (or packed bytes)."""
+        if self._packed is not None:
+            return sys.getsizeof(self) + sys.getsizeof(self._packed)
+        return sys.getsizeof(self) + sys.getsizeof(self._ids) + sys.getsizeof(self._frequencies)
+
+
+def intersect(lists: Iterable[array]) -> array:
+    """
+    Intersect sorted id arrays, smallest first so the work is bounded by the
+    rarest list. Lists much longer than the running result are probed by
+    binary search instead of being scanned.
+    """
+    lists = sorted(lists, key=len)
+    if not lists:
+        return array("I")
+    result = lists[0]
+    for other in lists[1:]:
+        if not result:
+            break
+        if len(other) > _GALLOP_RATIO * len(result):
+            matches, lo = array("I"), 0
+            for doc_id in result:
+                lo = bisect_left(other, doc_id, lo)
+                if lo == len(other):
+                    break
+                if other[lo] == doc_id:
+                    matches.append(doc_id)
+            result = matches
+        else:
+            wanted = set(result)
+            result = array("I", (doc_id for doc_id in other if doc_id in wanted))
+    return array("I", result)
+
+
+def union(lists: Iterable[array]) -> array:
+    """Return the sorted union of id arrays."""
+    merged = set()
+    for ids in lists:
+        merged.update(ids)
+    return array("I", sorted(merged))
+
+
+def difference(ids: array, exclude: array) -> array:
+    """Return the ids of `ids` (sorted) that are not in `exclude`."""
+    if not ids or not exclude:
+        return ids
+    excluded = set(exclude)
+    return array("I", (doc_id for doc_id in ids if doc_id not in excluded))
+
+
+def documents_of(index: Trie) -> DocumentTable:
+    """
+    Return the DocumentTable an index's posting lists share (a new, empty
+    one for an empty index).
+    """
+    documents = getattr(index, "documents", None)  # MappedIndex keeps its own
+    if documents is not None:
+        return documents
+    for _, postings in index:
+        return postings.documents
+    return DocumentTable()
+
+
+class MemoryStats(NamedTuple):
+    """Size of an index's postings, from memory_stats."""
+    words: int
+    postings: int           # (word, document) pairs
+    postings_bytes: int     # posting list objects and their arrays
+    documents_bytes: int    # the DocumentTable, URL strings included
+
+
+def memory_stats(index: Trie) -> MemoryStats:
+    """Measure the posting lists and document table of an index built by index_pages."""
+    words = postings = postings_bytes = 0
+    for _, posting_list in index:
+        words += 1
+        postings += len(posting_list)
+        postings_bytes += posting_list.nbytes()
+    return MemoryStats(words, postings, postings_bytes, documents_of(index).nbytes())
@@ -0,0 +1,287 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+import utils
+
+# How long fetched robots.txt rules are trusted before being fetched again
+ROBOTS_TTL = 24 * 60 * 60
+
+
+def host_of(url: str) -> str:
+    """Return the host (netloc) a URL is fetched from, the unit politeness limits apply to."""
+    return urlsplit(url).netloc.lower()
+
+
+class TokenBucket:
+    """
+    Rate limiter holding up to `capacity` tokens, refilled at `rate` tokens
+    per second; every request takes one. `capacity` is how many requests may
+    go out back to back after an idle spell. A rate of None never runs out.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+
+    # Helper function
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update."""
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        if self.rate is None:
+            return 0.0
+        self._refill()
+        missing = 1 - self.tokens
+        return missing / self.rate if missing > 1e-9 else 0.0
+
+    def take(self) -> None:
+        """Use up one token."""
+        if self.rate is not None:
+            self._refill()
+            self.tokens -= 1
+
+
+def polite_rate(rules: RobotFileParser, user_agent: str,
+                rate: Optional[float] = None) -> Optional[float]:
+    """
+    Return the requests per second allowed on a site: `rate`, lowered to
+    the Crawl-delay or Request-rate its robots.txt sets for `user_agent`.
+    """
+    limits = [] if rate is None else [rate]
+    delay = rules.crawl_delay(user_agent)
+    if delay:
+        limits.append(1 / float(delay))
+    request_rate = rules.request_rate(user_agent)
+    if request_rate and request_rate.seconds:
+        limits.append(request_rate.requests / request_rate.seconds)
+    return min(limits, default=None)
+
+
+class RobotsCache:
+    """
+    robots.txt rules per site (scheme and host), fetched once and shared by
+    every request to the site for `ttl` seconds. Concurrent lookups for a
+    site that is still being fetched wait for that one request.
+
+    As RFC 9309 asks, a missing robots.txt (4xx) allows everything, while a
+    401/403, a server error or an unreachable server disallows everything.
+    """
+
+    def __init__(self, ttl: float = ROBOTS_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._rules: dict[str, tuple[float, RobotFileParser]] = {}   # site -> (expiry, rules)
+        self._pending: dict[str, asyncio.Future] = {}
+
+    # Helper function
+    def _site(self, url: str) -> str:
+        """Return the scheme://host part of `url`."""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def get(self, url: str) -> Optional[RobotFileParser]:
+        """Return the cached rules for the site of `url`, or None if they must be fetched."""
+        cached = self._rules.get(self._site(url))
+        if cached is None or cached[0] <= self._clock():
+            return None
+        return cached[1]
+
+    async def fetch(self, url: str, client: httpx.AsyncClient) -> RobotFileParser:
+        """Return the rules for the site of `url`, fetching its robots.txt unless cached."""
+        rules = self.get(url)
+        if rules is not None:
+            return rules
+        site = self._site(url)
+        pending = self._pending.get(site)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this lookup was cancelled, not the fetch it waited for
+                return await self.fetch(url, client)
+
+        self._pending[site] = pending = asyncio.get_running_loop().create_future()
+        try:
+            rules = RobotFileParser(site + "/robots.txt")
+            try:
+                response = await utils.http_pool.get_async(rules.url, client)
+            except httpx.HTTPError:
+                response = None
+            if response is None or response.status_code in (401, 403) or response.status_code >= 500:
+                rules.disallow_all = True
+            elif response.status_code >= 400:
+                rules.allow_all = True
+            else:
+                rules.parse(response.text.splitlines())
+            self._rules[site] = (self._clock() + self.ttl, rules)
+            pending.set_result(rules)
+            return rules
+        except asyncio.CancelledError:
+            pending.cancel()  # waiting lookups fetch it themselves
+            raise
+        except BaseException as error:
+            pending.set_exception(error)  # waiting lookups fail the same way
+            pending.exception()  # retrieved here, so it is not logged when nobody waited
+            raise
+        finally:
+            del self._pending[site]
+
+
+class _Host:
+    """Queued URLs and limits of one host in a CrawlScheduler."""
+    __slots__ = ("urls", "bucket", "in_flight", "ticket")
+
+    def __init__(self, bucket: TokenBucket):
+        self.urls = []        # heap of (depth, sequence number, URL)
+        self.bucket = bucket
+        self.in_flight = 0
+        self.ticket = 0       # bumped on every reschedule; older heap entries are stale
+
+
+class CrawlScheduler:
+    """
+    Crawl frontier that hands out the next URL that may be fetched politely.
+
+    Every host has its own queue, shallowest depth first (then first come),
+    a TokenBucket limiting its request rate and a cap of `per_host` requests
+    in flight. Hosts with work that may start now sit in a heap keyed by the
+    depth of their next URL; hosts waiting for a token sit in a heap keyed by
+    when it arrives. So `pop` picks the shallowest URL any host is free to
+    serve, one slow or rate-limited host never holds up the others, and no
+    host is ever scanned while it has nothing to give.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: float = 1.0, per_host: int = 2,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Parameters:
+            rate - Requests per second per host (None for no limit).
+            burst - Requests a host may get back to back after an idle spell.
+            per_host - Maximum requests in flight to any one host.
+            clock - Monotonic time source, in seconds.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.per_host = per_host
+        self._clock = clock
+        self._hosts: dict[str, _Host] = {}
+        self._ready = []      # (depth of next URL, sequence number, ticket, host name)
+        self._waiting = []    # (time its next token arrives, sequence number, ticket, host name)
+        self._sequence = itertools.count()
+        self._queued = 0
+
+    def __len__(self) -> int:
+        """Number of URLs queued (not counting ones handed out by `pop`)."""
+        return self._queued
+
+    # Helper function
+    def _host(self, name: str) -> _Host:
+        """Return the state of host `name`, creating it with the default rate."""
+        host = self._hosts.get(name)
+        if host is None:
+            host = self._hosts[name] = _Host(TokenBucket(self.rate, self.burst, self._clock))
+        return host
+
+    # Helper function
+    def _schedule(self, name: str, host: _Host) -> None:
+        """(Re)file a host under ready or waiting, or under neither if it has nothing to start."""
+        host.ticket += 1
+        if not host.urls or host.in_flight >= self.per_host:
+            return
+        wait = host.bucket.wait_time()
+        if wait:
+            heapq.heappush(self._waiting, (self._clock() + wait, next(self._sequence), host.ticket, name))
+        else:
+            heapq.heappush(self._ready, (host.urls[0][0], next(self._sequence), host.ticket, name))
+
+    # Helper function
+    def _release(self) -> None:
+        """Move hosts whose next token has arrived from waiting to ready."""
+        now = self._clock()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, _, ticket, name = heapq.heappop(self._waiting)
+            host = self._hosts[name]
+            if ticket == host.ticket:
+                heapq.heappush(self._ready, (host.urls[0][0], next(self._sequence), ticket, name))
+
+    def add(self, url: str, depth: int) -> None:
+        """Queue `url`, found at link depth `depth`."""
+        name = host_of(url)
+        host = self._host(name)
+        becomes_next = not host.urls or depth < host.urls[0][0]
+        heapq.heappush(host.urls, (depth, next(self._sequence), url))
+        self._queued += 1
+        if becomes_next:
+            self._schedule(name, host)
+
+    def pop(self) -> Optional[str]:
+        """
+        Return the next URL to fetch now, or None if every host with queued
+        URLs is waiting (see `wait_time`). Call `done` once it is fetched.
+        """
+        self._release()
+        while self._ready:
+            _, _, ticket, name = heapq.heappop(self._ready)
+            host = self._hosts[name]
+            if ticket != host.ticket:
+                continue
+            if host.bucket.wait_time():  # its rate was lowered since it was filed
+                self._schedule(name, host)
+                continue
+            host.bucket.take()
+            _, _, url = heapq.heappop(host.urls)
+            self._queued -= 1
+            host.in_flight += 1
+            self._schedule(name, host)
+            return url
+        return None
+
+    def wait_time(self) -> Optional[float]:
+        """
+        Seconds until `pop` may return a URL: 0 if one is ready, None if
+        nothing will be until a URL is added or a fetch is `done`.
+        """
+        self._release()
+        while self._ready and self._ready[0][2] != self._hosts[self._ready[0][3]].ticket:
+            heapq.heappop(self._ready)
+        if self._ready:
+            return 0.0
+        while self._waiting and self._waiting[0][2] != self._hosts[self._waiting[0][3]].ticket:
+            heapq.heappop(self._waiting)
+        if self._waiting:
+            return max(self._waiting[0][0] - self._clock(), 0.0)
+        return None
+
+    def done(self, url: str) -> None:
+        """Record that the fetch of a URL from `pop` finished, freeing its host slot."""
+        name = host_of(url)
+        host = self._hosts[name]
+        host.in_flight -= 1
+        self._schedule(name, host)
+
+    def limit_host(self, url: str, rate: Optional[float]) -> None:
+        """
+        Set the request rate of the host of `url` (e.g. from its robots.txt).
+        The request that told us the rate counts as the first one at it.
+        """
+        name = host_of(url)
+        host = self._host(name)
+        host.bucket = TokenBucket(rate, self.burst, self._clock)
+        host.bucket.take()
+        self._schedule(name, host)
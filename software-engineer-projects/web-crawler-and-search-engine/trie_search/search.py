@@ -0,0 +1,265 @@
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+from postings import difference, documents_of, intersect, union
+from tokenizer import Tokenizer
+from trie import Trie
+
+
+class Query(NamedTuple):
+    """
+    A parsed query: any one of the `groups` must match (OR). A group matches
+    a page that has all of its `required` terms and none of its `excluded`
+    terms (AND / NOT).
+    """
+    groups: list[tuple[list[str], list[str]]]   # (required, excluded) per group
+
+    @property
+    def terms(self) -> list[str]:
+        """Every required term of every group, in query order, without repeats."""
+        return list(dict.fromkeys(term for required, _ in self.groups for term in required))
+
+
+def parse_query(query: str) -> Query:
+    """
+    Parse a search query.
+
+    Words are ANDed together; `OR` starts an alternative group and has the
+    lowest precedence; `NOT word` or `-word` excludes pages containing word.
+    `AND` may be written but is implied. Operators must be upper case, so
+    "or" / "not" are searched as ordinary words.
+
+    Examples:
+        "cats dogs"            pages with both words
+        "cats OR dogs"         pages with either word
+        "cats -dogs"           pages with cats but not dogs
+        "cats NOT dogs OR fish"
+    """
+    groups = [([], [])]
+    negate = False
+    for token in query.split():
+        if token == "OR":
+            groups.append(([], []))
+        elif token == "NOT":
+            negate = True
+        elif token != "AND":
+            if token.startswith("-") and len(token) > 1:
+                negate, token = True, token[1:]
+            groups[-1][1 if negate else 0].append(token)
+            negate = False
+    return Query([group for group in groups if group[0] or group[1]])
+
+
+def document_lengths(index: Trie) -> dict[str, int]:
+    """Return URL -> number of indexed words on the page, from the index's document table."""
+    documents = documents_of(index)
+    return {documents.url(doc_id): documents.length(doc_id) for doc_id in documents.doc_ids()}
+
+
+def _frequency(ids: array, frequencies: array, doc_id: int) -> int:
+    """Return the term frequency for `doc_id` in decoded postings (0 if absent)."""
+    idx = bisect_left(ids, doc_id)
+    return frequencies[idx] if idx < len(ids) and ids[idx] == doc_id else 0
+
+
+class QueryCache:
+    """
+    Bounded cache of query results, least recently used dropped first.
+
+    Every entry is tagged with the index generation it was computed at (see
+    Trie.generation), and an entry from an older generation is a miss, so a
+    result is never served after the index has changed under it.
+    """
+
+    def __init__(self, max_size: int = 256):
+        """
+        Parameters:
+            max_size - Maximum number of results kept.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Any, tuple[int, Any]] = OrderedDict()  # key -> (generation, result)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any, generation: int) -> Optional[Any]:
+        """Return the result cached for `key` at index `generation`, or None."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != generation:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Any, generation: int, result: Any) -> None:
+        """Cache `result` for `key` at index `generation`, evicting the oldest entry if full."""
+        self._entries[key] = (generation, result)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+class SearchEngine:
+    """
+    Boolean and BM25-ranked search over an index built by build_index
+    (word -> PostingList), either in memory or a MappedIndex. Matching and
+    scoring run on integer document ids; URLs are looked up for the results.
+    """
+
+    def __init__(self, index: Trie, k1: float = 1.2, b: float = 0.75,
+                 tokenizer: Optional[Tokenizer] = None, cache_size: int = 0):
+        """
+        Parameters:
+            index - Trie of words to PostingLists.
+            k1 - BM25 term frequency saturation.
+            b - BM25 document length normalization (0 = none, 1 = full).
+            tokenizer - Normalization the index was built with, applied to
+                        query terms too (terms are looked up as typed if not given).
+            cache_size - Number of ranked results to keep in a QueryCache
+                         (0 for no cache).
+        """
+        self.index = index
+        self.documents = documents_of(index)
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.cache = QueryCache(cache_size) if cache_size > 0 else None
+
+    def parse(self, query: str) -> Query:
+        """
+        Parse `query` (see parse_query) and normalize its terms with the
+        tokenizer. Terms it drops (such as stopwords) are left out, as they
+        were when the pages were indexed.
+        """
+        parsed = parse_query(query)
+        if self.tokenizer is None:
+            return parsed
+        normalize = self.tokenizer.normalize
+        groups = []
+        for required, excluded in parsed.groups:
+            required = [term for term in map(normalize, required) if term is not None]
+            excluded = [term for term in map(normalize, excluded) if term is not None]
+            if required or excluded:
+                groups.append((required, excluded))
+        return Query(groups)
+
+    @property
+    def average_length(self) -> float:
+        """Mean document length over the index."""
+        return self.documents.total_length / max(len(self.documents), 1)
+
+    # Helper function
+    def _postings(self, term: str) -> tuple[array, array]:
+        """Return a term's (document ids, term frequencies), empty if it was never seen."""
+        try:
+            return self.index[term].arrays()
+        except KeyError:
+            return array("I"), array("H")
+
+    # Helper function
+    def _match_group(self, required: list[str], excluded: list[str],
+                     postings: dict[str, tuple[array, array]]) -> array:
+        """Return the sorted ids of documents having every required term and no excluded one."""
+        if required:
+            matches = intersect(postings[term][0] for term in required)
+        else:
+            matches = self.documents.doc_ids()  # only exclusions: start from every page
+        for term in excluded:
+            matches = difference(matches, postings[term][0])
+        return matches
+
+    # Helper function
+    def _matches(self, parsed: Query) -> tuple[array, dict[str, tuple[array, array]]]:
+        """
+        Return the ids of documents matching a parsed query and the
+        (ids, frequencies) of its terms, each decoded once.
+        """
+        postings = {}
+        for required, excluded in parsed.groups:
+            for term in required + excluded:
+                if term not in postings:
+                    postings[term] = self._postings(term)
+        groups = [self._match_group(required, excluded, postings)
+                  for required, excluded in parsed.groups]
+        return (groups[0] if len(groups) == 1 else union(groups)), postings
+
+    def suggest(self, term: str, k: int = 5) -> list[tuple[str, Any]]:
+        """
+        Return up to `k` indexed (word, PostingList) pairs a mistyped
+        (normalized) `term` may have meant: words within a small edit
+        distance (one edit for words of up to 4 letters, else two), closest
+        and most common first, then the most common completions of `term`.
+        """
+        max_distance = 1 if len(term) <= 4 else 2
+        close = sorted(self.index.fuzzy_search(term, max_distance),
+                       key=lambda match: (match[2], -len(match[1]), match[0]))
+        suggestions = dict((word, postings) for word, postings, _ in close[:k])
+        for word, postings in self.index.top_completions(term, k=k):
+            suggestions.setdefault(word, postings)
+        return list(suggestions.items())[:k]
+
+    def boolean_search(self, query: str) -> set[str]:
+        """Return the set of URLs matching `query` (see parse_query), unranked."""
+        return set(map(self.documents.url, self._matches(self.parse(query))[0]))
+
+    def search(self, query: str, limit: Optional[int] = 10) -> list[tuple[str, float]]:
+        """
+        Return up to `limit` (URL, score) pairs matching `query`, most relevant
+        first, scored with Okapi BM25 over the query's required terms. Ties are
+        broken by URL; `limit=None` returns every match. With a cache, a
+        repeated query is answered from it until the index changes.
+        """
+        parsed = self.parse(query)
+        if self.cache is None:
+            return self._rank(parsed, limit)
+        # Keyed by the normalized terms, so "Cats dogs" and "dogs the cats" share an entry
+        key = (frozenset((frozenset(required), frozenset(excluded))
+                         for required, excluded in parsed.groups), limit)
+        generation = self.index.generation
+        results = self.cache.get(key, generation)
+        if results is None:
+            results = self._rank(parsed, limit)
+            self.cache.put(key, generation, results)
+        return list(results)
+
+    # Helper function
+    def _rank(self, parsed: Query, limit: Optional[int]) -> list[tuple[str, float]]:
+        """Return the top `limit` (URL, BM25 score) pairs for a parsed query (see search)."""
+        matches, postings = self._matches(parsed)
+        if not matches:
+            return []
+
+        num_docs = len(self.documents)
+        average_length = self.average_length or 1
+        lengths = self.documents.lengths
+        scores = dict.fromkeys(matches, 0.0)
+        for term in parsed.terms:
+            ids, frequencies = postings[term]
+            idf = math.log(1 + (num_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            # Walk whichever side is smaller: the term's postings or the matches
+            if len(ids) < len(scores):
+                pairs = ((doc_id, tf) for doc_id, tf in zip(ids, frequencies) if doc_id in scores)
+            else:
+                pairs = ((doc_id, _frequency(ids, frequencies, doc_id)) for doc_id in scores)
+            for doc_id, tf in pairs:
+                if tf:
+                    norm = 1 - self.b + self.b * lengths[doc_id] / average_length
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        url = self.documents.url
+        ranked = ((url(doc_id), score) for doc_id, score in scores.items())
+        if limit is None:
+            return sorted(ranked, key=lambda item: (-item[1], item[0]))
+        return heapq.nsmallest(limit, ranked, key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,344 @@
+import mmap
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import Any, Optional
+
+from postings import DocumentTable, PostingList, documents_of
+from trie import SLOT_CHARACTERS, Trie, character_to_key, normalize_key, value_score
+
+# File layout (all integers little-endian):
+#
+#   header    magic, number of keys, number of URLs, offset of URL table, offset of root node
+#   URLs      (num_urls + 1) u64 offsets into the UTF-8 blob, num_urls u32 document lengths
+#             (words indexed from the page), then the blob; a URL's id is its position in
+#             sorted order. Every document of the index's DocumentTable is listed, those
+#             with no indexed words included
+#   nodes     written children-first; each node is a fixed record (occupied-slot bitmask,
+#             subtree count, best score, offset of its posting list or 0) followed by one
+#             u64 child offset per set bit, in slot order
+#   postings  varint length, then for each sorted URL id a varint delta from the previous
+#             id and a varint term frequency
+_MAGIC = b"TRIEIDX2"
+_HEADER = struct.Struct("<8sIIQQ")
+_NODE = struct.Struct("<IIiQ")
+_OFFSET = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+
+
+def _encode_varint(number: int, out: bytearray) -> None:
+    """Append `number` to `out` as a LEB128 varint."""
+    while number >= 0x80:
+        out.append(number & 0x7F | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _decode_varint(buf: Any, pos: int) -> tuple[int, int]:
+    """Read a LEB128 varint at `pos`, returning (number, position after it)."""
+    number = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, pos
+        shift += 7
+
+
+def _encode_postings(postings: list[tuple[int, int]]) -> bytearray:
+    """
+    Encode (URL id, term frequency) pairs, sorted by id, as a varint count
+    followed by a varint id delta and varint frequency per pair.
+    """
+    out = bytearray()
+    _encode_varint(len(postings), out)
+    previous = 0
+    for url_id, frequency in postings:
+        _encode_varint(url_id - previous, out)
+        _encode_varint(frequency, out)
+        previous = url_id
+    return out
+
+
+def _term_frequencies(value: Any) -> Mapping[str, int]:
+    """Return a stored value as URL -> term frequency (bare URL collections count once)."""
+    return value if isinstance(value, Mapping) else dict.fromkeys(value, 1)
+
+
+class _PendingNode:
+    """A node whose children are still being written."""
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.mask = 0
+        self.children = []
+        self.postings = 0
+        self.count = 0
+        self.best = -1
+
+
+def save_index(trie: Trie, path: str, documents: Optional[DocumentTable] = None) -> None:
+    """
+    Write a word -> URL -> term frequency index to `path` in the binary
+    format read by MappedIndex.
+
+    URLs are interned to integer ids and each word's URLs are stored as a
+    delta-encoded posting list, so the file is far smaller than the
+    in-memory trie. The document table is written as it is, every URL with
+    its document length, so pages with no indexed words still count towards
+    BM25's document count and average length. Works for any Trie variant
+    (keys are re-expanded one character per node).
+
+    Parameters:
+        trie - Trie whose values map URLs to term frequencies (as built by
+               build_index); plain collections of URLs are stored with a
+               frequency of 1.
+        path - File to create or overwrite.
+        documents - Document table to write; by default the one the trie's
+                    PostingLists share. Tries of plain mappings have none, so
+                    their URLs and lengths (the sum of each URL's term
+                    frequencies) are collected from the values.
+    """
+    if documents is None:
+        try:
+            documents = documents_of(trie)
+        except AttributeError:
+            pass  # plain mappings share no document table
+    if documents is not None:
+        lengths = {documents.url(doc_id): documents.length(doc_id) for doc_id in documents.doc_ids()}
+    else:
+        lengths = defaultdict(int)
+        for _, value in trie:
+            for url, frequency in _term_frequencies(value).items():
+                lengths[url] += frequency
+    urls = sorted(lengths)
+    url_ids = {url: url_id for url_id, url in enumerate(urls)}
+
+    with open(path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+
+        urls_offset = f.tell()
+        encoded = [url.encode("utf-8") for url in urls]
+        position = 0
+        for blob in encoded:
+            f.write(_OFFSET.pack(position))
+            position += len(blob)
+        f.write(_OFFSET.pack(position))
+        for url in urls:
+            f.write(_LENGTH.pack(lengths[url]))
+        for blob in encoded:
+            f.write(blob)
+
+        def close(node: _PendingNode) -> int:
+            """Write a finished node and return its offset."""
+            offset = f.tell()
+            f.write(_NODE.pack(node.mask, node.count, node.best, node.postings))
+            for child_offset in node.children:
+                f.write(_OFFSET.pack(child_offset))
+            return offset
+
+        def pop() -> None:
+            """Close the deepest open node and link it into its parent."""
+            node = stack.pop()
+            parent = stack[-1]
+            parent.mask |= 1 << node.slot
+            parent.children.append(close(node))
+            parent.count += node.count
+            parent.best = max(parent.best, node.best)
+
+        # Keys arrive in trie (pre-)order, so only the current key's path is open.
+        stack = [_PendingNode(-1)]
+        previous = ""
+        for key, value in trie:
+            key = normalize_key(key)
+            common = 0
+            while common < min(len(key), len(previous)) and key[common] == previous[common]:
+                common += 1
+            while len(stack) > common + 1:
+                pop()
+            for char in key[common:]:
+                stack.append(_PendingNode(character_to_key(char)))
+
+            node = stack[-1]
+            node.postings = f.tell()
+            f.write(_encode_postings(sorted(
+                (url_ids[url], frequency) for url, frequency in _term_frequencies(value).items())))
+            node.count += 1
+            node.best = max(node.best, value_score(value))
+            previous = key
+
+        while len(stack) > 1:
+            pop()
+        root_offset = close(stack[0])
+
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, len(trie), len(urls), urls_offset, root_offset))
+
+
+class _MappedDocuments:
+    """
+    The DocumentTable interface over a MappedIndex's URL table. Document ids
+    are positions in sorted URL order, so URLs are found by binary search.
+    """
+
+    def __init__(self, index: "MappedIndex"):
+        self._index = index
+        self.lengths = array("I")
+        self.lengths.frombytes(index._mmap[index._lengths_offset:index._blob_offset])
+        if sys.byteorder == "big":
+            self.lengths.byteswap()
+        self.total_length = sum(self.lengths)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def intern(self, url: str) -> int:
+        raise TypeError("MappedIndex is read-only")
+
+    def doc_id(self, url: str) -> Optional[int]:
+        """Return the id of `url`, or None if it is not in the table."""
+        lo, hi = 0, len(self.lengths)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._index._url(mid) < url:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self.lengths) and self._index._url(lo) == url else None
+
+    def url(self, doc_id: int) -> str:
+        """Return the URL with the given id."""
+        return self._index._url(doc_id)
+
+    def length(self, doc_id: int) -> int:
+        """Return the length of the document with the given id."""
+        return self.lengths[doc_id]
+
+    def doc_ids(self) -> array:
+        """Return the ids of every document, in increasing order."""
+        return array("I", range(len(self.lengths)))
+
+    def nbytes(self) -> int:
+        """Bytes of the URL table in the file (paged in on demand)."""
+        return self._index._blob_offset - self._index._urls_offset
+
+
+class MappedIndex(Trie):
+    """
+    Read-only index backed by a memory-mapped file written by save_index.
+
+    Nodes are byte offsets into the file and are decoded on demand, so
+    opening an index costs a file open no matter how large it is. Supports
+    the read side of Trie: lookups, iteration, wildcard_search, prefix_items
+    and top_completions. Values come back as PostingLists (URL -> term
+    frequency) over the file's own document table, `documents`.
+    """
+
+    def __init__(self, path: str):
+        """Open and memory-map the index file at `path`."""
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, self._num_urls, self._urls_offset, self.root = \
+            _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a trie index file")
+        self._lengths_offset = self._urls_offset + (self._num_urls + 1) * _OFFSET.size
+        self._blob_offset = self._lengths_offset + self._num_urls * _LENGTH.size
+        self.documents = _MappedDocuments(self)
+        self.generation = 0  # read-only, so never changes
+
+    def close(self) -> None:
+        """Release the memory map."""
+        self._mmap.close()
+
+    def __enter__(self) -> "MappedIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        raise TypeError("MappedIndex is read-only")
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("MappedIndex is read-only")
+
+    def _insert(self, key: str, path: Optional[list] = None) -> int:
+        raise TypeError("MappedIndex is read-only")
+
+    def _child(self, node: int, idx: int) -> int:
+        raise TypeError("MappedIndex is read-only")
+
+    # Helper function
+    def _url(self, url_id: int) -> str:
+        """Decode the URL with the given id."""
+        start, end = struct.unpack_from("<QQ", self._mmap, self._urls_offset + url_id * _OFFSET.size)
+        return self._mmap[self._blob_offset + start:self._blob_offset + end].decode("utf-8")
+
+    # Helper function
+    def _postings(self, offset: int) -> PostingList:
+        """Decode the posting list at `offset`."""
+        count, pos = _decode_varint(self._mmap, offset)
+        postings, url_id = PostingList(self.documents), 0
+        for _ in range(count):
+            delta, pos = _decode_varint(self._mmap, pos)
+            frequency, pos = _decode_varint(self._mmap, pos)
+            url_id += delta
+            postings.add(url_id, frequency)
+        return postings
+
+    # Helper function
+    def _traverse(self, key: str, path: Optional[list] = None) -> int:
+        """Traverse the index for a given key.
+        Returns the offset of the last node if key exists."""
+        node = self.root
+        if path is not None:
+            path.append(node)
+        for char in key:
+            edge = self._edge(node, character_to_key(char))
+            if edge is None:
+                raise KeyError(f"Key '{key}' not found.")
+            node = edge[1]
+            if path is not None:
+                path.append(node)
+        return node
+
+    def __getitem__(self, key: str) -> Any:
+        self._ensure_string_key(key)
+        postings = _NODE.unpack_from(self._mmap, self._traverse(key))[3]
+        if postings:
+            return self._postings(postings)
+        raise KeyError(f"Key '{key}' not found.")
+
+    # Helper function
+    def _entry(self, node: int) -> tuple[bool, Any]:
+        """Return (is_terminal, value) for a node."""
+        postings = _NODE.unpack_from(self._mmap, node)[3]
+        return (True, self._postings(postings)) if postings else (False, None)
+
+    # Helper function
+    def _get_stats(self, node: int) -> tuple[int, int]:
+        """Return the stored (subtree entry count, best score) of a node."""
+        _, count, best, _ = _NODE.unpack_from(self._mmap, node)
+        return count, best
+
+    # Helper function
+    def _edges(self, node: int) -> list[tuple[str, int]]:
+        """Return (label, child) for every child of a node in alphabetical order."""
+        mask = _NODE.unpack_from(self._mmap, node)[0]
+        slots = [idx for idx in range(27) if mask >> idx & 1]
+        offsets = struct.unpack_from(f"<{len(slots)}Q", self._mmap, node + _NODE.size)
+        return [(SLOT_CHARACTERS[idx], child) for idx, child in zip(slots, offsets)]
+
+    # Helper function
+    def _edge(self, node: int, idx: int) -> Optional[tuple[str, int]]:
+        """Return (label, child) for the child in slot `idx`, or None."""
+        mask = _NODE.unpack_from(self._mmap, node)[0]
+        if not mask >> idx & 1:
+            return None
+        rank = bin(mask & ((1 << idx) - 1)).count("1")
+        child = _OFFSET.unpack_from(self._mmap, node + _NODE.size + rank * _OFFSET.size)[0]
+        return SLOT_CHARACTERS[idx], child
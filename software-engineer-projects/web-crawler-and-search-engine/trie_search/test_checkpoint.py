@@ -0,0 +1,52 @@
+import pytest
+
+import checkpoint
+
+
+def test_snapshot_and_log_round_trip(tmp_path):
+    log = checkpoint.CrawlCheckpoint(tmp_path, snapshot_every=2)
+    assert log.load() is None
+    log.snapshot(checkpoint.CrawlState({}, set(), [("a", 0)]))
+    log.record("a", ["x", "y"], [("b", 1), ("c", 1)])
+    assert not log.snapshot_due
+    log.record("b", None, [])  # failed fetch: done, no words
+    assert log.snapshot_due
+    log.close()
+
+    state = checkpoint.CrawlCheckpoint(tmp_path).load()
+    assert state == checkpoint.CrawlState({"a": ["x", "y"]}, {"b", "c"}, [("c", 1)])
+
+
+def test_snapshot_grows_with_the_crawl(tmp_path):
+    log = checkpoint.CrawlCheckpoint(tmp_path, snapshot_every=1)
+    log.snapshot(checkpoint.CrawlState({str(i): [] for i in range(3)}, set(), []))
+    for i in range(2):
+        log.record(f"page{i}", [], [])
+        assert not log.snapshot_due  # not before the log is as large as the snapshot
+    log.record("page2", [], [])
+    assert log.snapshot_due
+    log.close()
+
+
+def test_torn_and_repeated_log_lines_are_ignored(tmp_path):
+    log = checkpoint.CrawlCheckpoint(tmp_path)
+    log.snapshot(checkpoint.CrawlState({}, {"b"}, [("a", 0), ("b", 1)]))
+    log.record("a", ["x"], [])
+    log.close()
+    logged = (tmp_path / "pages.log").read_text()
+
+    # Crash after the next snapshot was written but before the log was restarted
+    log = checkpoint.CrawlCheckpoint(tmp_path)
+    log.load()
+    log.snapshot(checkpoint.CrawlState({"a": ["x"]}, {"b"}, [("b", 1)]))
+    log.close()
+    (tmp_path / "pages.log").write_text(logged + '{"seq": 2, "url": "b", "wor')
+
+    state = checkpoint.CrawlCheckpoint(tmp_path).load()
+    assert state == checkpoint.CrawlState({"a": ["x"]}, {"b"}, [("b", 1)])
+
+
+def test_rejects_other_versions(tmp_path):
+    (tmp_path / "snapshot.json").write_text('{"version": 99}')
+    with pytest.raises(ValueError):
+        checkpoint.CrawlCheckpoint(tmp_path).load()
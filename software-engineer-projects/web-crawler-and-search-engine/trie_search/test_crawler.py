@@ -0,0 +1,359 @@
+import asyncio
+
+import httpx
+import pytest
+
+import crawler
+import tokenizer
+import trie
+import utils
+import visited
+
+SITE = "https://example.com"
+
+
+def site_graph(num_pages: int) -> dict[str, list[str]]:
+    """Synthetic site: page i links to pages 2i+1 and 2i+2 and back to page 0."""
+    return {
+        f"{SITE}/{i}": [f"{SITE}/{j}" for j in (2 * i + 1, 2 * i + 2, 0) if j < num_pages]
+        for i in range(num_pages)
+    }
+
+
+class StandInSite:
+    """Serves a site graph through httpx.MockTransport and records traffic."""
+
+    def __init__(self, graph: dict[str, list[str]], delay: float = 0.01):
+        self.graph = graph
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        self.requests.append(url)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        if url not in self.graph:
+            return httpx.Response(404, text="<html><body>missing</body></html>")
+        links = "".join(f' <a href="{link}">link</a>' for link in self.graph[url])
+        page = url.rsplit("/", 1)[1]
+        return httpx.Response(200, text=f"<html><body><p>page{page} words</p>{links}</body></html>")
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+
+@pytest.fixture(autouse=True)
+def fresh_seen_set(monkeypatch):
+    monkeypatch.setattr(utils, "_seen_already", set())
+
+
+def crawl(site: StandInSite, max_depth: int, **kwargs) -> dict[str, list[str]]:
+    async def run():
+        async with site.client() as client:
+            return await crawler.crawl_site_async(f"{SITE}/0", max_depth, client=client, **kwargs)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("max_depth", [0, 1, 3])
+def test_async_crawl_respects_depth(max_depth):
+    site = StandInSite(site_graph(31))
+    results = crawl(site, max_depth, workers=4)
+    expected = {f"{SITE}/{i}" for i in range(2 ** (max_depth + 1) - 1)}
+    assert set(results) == expected
+    assert results[f"{SITE}/0"] == ["page0", "words", "link", "link", "link"]
+
+
+def test_async_crawl_visits_each_page_once():
+    site = StandInSite(site_graph(63))
+    results = crawl(site, 10, workers=8, per_host=8)
+    assert len(results) == 63
+    assert sorted(site.requests) == sorted(set(site.requests))
+
+
+def test_async_crawl_limits_per_host_concurrency():
+    site = StandInSite(site_graph(63))
+    crawl(site, 10, workers=16, per_host=3)
+    assert site.max_active == 3
+
+
+def test_async_crawl_skips_disallowed_domains():
+    graph = {f"{SITE}/0": [f"{SITE}/1", "https://elsewhere.org/x", "http://example.com/2"],
+             f"{SITE}/1": []}
+    site = StandInSite(graph)
+    results = crawl(site, 2, workers=2)
+    assert set(results) == {f"{SITE}/0", f"{SITE}/1"}
+    # Not even their robots.txt is asked for
+    assert all(url.startswith(f"{SITE}/") for url in site.requests)
+
+
+class VersionedSite:
+    """Pages with ETags that answer 304 to a matching If-None-Match."""
+
+    def __init__(self, pages: dict[str, str]):
+        self.pages = pages
+        self.full_fetches = []
+        self.broken = set()  # URLs answering 503
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        self.requests.append(url)
+        if url in self.broken:
+            return httpx.Response(503, text="<p>busy busy</p>")
+        if url not in self.pages:
+            return httpx.Response(404, text="")
+        etag = f'"{hash(self.pages[url])}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        self.full_fetches.append(url)
+        return httpx.Response(200, text=self.pages[url], headers={"ETag": etag})
+
+
+@pytest.fixture
+def versioned_site(monkeypatch):
+    site = VersionedSite({
+        f"{SITE}/": f'<p>home cats</p> <a href="{SITE}/a">a</a> <a href="{SITE}/b">b</a>',
+        f"{SITE}/a": "<p>alpha cats dogs</p>",
+        f"{SITE}/b": "<p>beta dogs</p>",
+    })
+    monkeypatch.setattr(utils, "http_pool",
+                        utils.HttpPool(backoff=0, transport=httpx.MockTransport(site.handle)))
+    return site
+
+
+def test_refresh_index_only_refetches_changes(versioned_site):
+    index, pages = trie.Trie(), {}
+    summary = crawler.refresh_index(index, f"{SITE}/", 1, pages)
+    assert summary == crawler.RefreshSummary(new=3, changed=0, unchanged=0, removed=0)
+    assert index["dogs"] == {f"{SITE}/a": 1, f"{SITE}/b": 1}
+
+    versioned_site.full_fetches.clear()
+    summary = crawler.refresh_index(index, f"{SITE}/", 1, pages)
+    assert summary == crawler.RefreshSummary(new=0, changed=0, unchanged=3, removed=0)
+    assert versioned_site.full_fetches == []
+
+    versioned_site.pages[f"{SITE}/a"] = "<p>alpha alpha birds birds</p>"
+    versioned_site.pages[f"{SITE}/"] = f'<p>home cats</p> <a href="{SITE}/a">a</a>'
+    summary = crawler.refresh_index(index, f"{SITE}/", 1, pages)
+    assert summary == crawler.RefreshSummary(new=0, changed=2, unchanged=0, removed=1)
+    assert versioned_site.full_fetches == [f"{SITE}/", f"{SITE}/a"]
+    assert index["cats"] == {f"{SITE}/": 1}
+    assert index["birds"] == {f"{SITE}/a": 2}
+    assert index["alpha"] == {f"{SITE}/a": 2}
+    assert "dogs" not in index
+    assert "beta" not in index
+    assert set(pages) == {f"{SITE}/", f"{SITE}/a"}
+
+
+def test_refresh_index_keeps_pages_behind_a_failed_start_page(versioned_site):
+    index, pages = trie.Trie(), {}
+    crawler.refresh_index(index, f"{SITE}/", 1, pages)
+
+    versioned_site.broken.add(f"{SITE}/")
+    summary = crawler.refresh_index(index, f"{SITE}/", 1, pages)
+    assert summary == crawler.RefreshSummary(new=0, changed=0, unchanged=2, removed=0, failed=1)
+    assert set(pages) == {f"{SITE}/", f"{SITE}/a", f"{SITE}/b"}
+    assert index["home"] == {f"{SITE}/": 1}
+    assert index["dogs"] == {f"{SITE}/a": 1, f"{SITE}/b": 1}
+
+
+def test_refresh_index_does_not_index_server_errors(versioned_site):
+    index, pages = trie.Trie(), {}
+    crawler.refresh_index(index, f"{SITE}/", 1, pages)
+
+    versioned_site.broken.add(f"{SITE}/b")
+    versioned_site.requests.clear()
+    summary = crawler.refresh_index(index, f"{SITE}/", 1, pages)
+    assert summary == crawler.RefreshSummary(new=0, changed=0, unchanged=2, removed=0, failed=1)
+    assert versioned_site.requests.count(f"{SITE}/b") == utils.http_pool.retries + 1
+    assert "busy" not in index
+    assert index["beta"] == {f"{SITE}/b": 1}
+
+    # A new page that only ever answers 5xx is not indexed at all
+    index, pages = trie.Trie(), {}
+    summary = crawler.refresh_index(index, f"{SITE}/", 1, pages)
+    assert summary == crawler.RefreshSummary(new=2, changed=0, unchanged=0, removed=0)
+    assert "busy" not in index and "beta" not in index
+
+
+def test_parallel_build_matches_serial(versioned_site, monkeypatch):
+    serial = crawler.build_index(f"{SITE}/", 1)
+    monkeypatch.setattr(utils, "_seen_already", set())
+    parallel = crawler.build_index(f"{SITE}/", 1, processes=2)
+    assert list(parallel) == list(serial)
+    monkeypatch.setattr(utils, "_seen_already", set())
+    concurrent = crawler.build_index(f"{SITE}/", 1, workers=2)
+    assert list(concurrent) == list(serial)
+    assert serial["dogs"] == {f"{SITE}/a": 1, f"{SITE}/b": 1}
+    assert [k for k, _ in parallel.top_completions("", k=2)] == \
+        [k for k, _ in serial.top_completions("", k=2)] == ["cats", "dogs"]
+
+
+class InterruptedSite:
+    """Serves a site graph and raises KeyboardInterrupt on the `stop_after`+1-th request."""
+
+    def __init__(self, graph: dict[str, list[str]], stop_after: int):
+        self.graph = graph
+        self.stop_after = stop_after
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        self.requests.append(url)
+        if len(self.requests) == self.stop_after + 1:
+            raise KeyboardInterrupt
+        links = "".join(f' <a href="{link}">link</a>' for link in self.graph.get(url, []))
+        return httpx.Response(200, text=f"<html><body><p>words</p>{links}</body></html>")
+
+
+def test_crawl_resumes_from_checkpoint(monkeypatch, tmp_path):
+    site = InterruptedSite(site_graph(31), stop_after=10)
+    monkeypatch.setattr(utils, "http_pool", utils.HttpPool(transport=httpx.MockTransport(site.handle)))
+    with pytest.raises(KeyboardInterrupt):
+        crawler.crawl_site(f"{SITE}/0", 3, checkpoint=tmp_path)
+
+    resumed = crawler.crawl_site(f"{SITE}/0", 3, checkpoint=tmp_path, resume=True)
+    assert set(resumed) == {f"{SITE}/{i}" for i in range(15)}
+    # Only the page being fetched when the crawl stopped is fetched twice
+    assert len(site.requests) == 15 + 1
+    assert site.requests[10] == site.requests[11]
+
+    # A finished crawl resumes to the same results without fetching anything
+    assert crawler.crawl_site(f"{SITE}/0", 3, checkpoint=tmp_path, resume=True) == resumed
+    assert len(site.requests) == 16
+
+
+def test_resumed_crawl_matches_links_by_canonical_url(monkeypatch, tmp_path):
+    graph = {
+        f"{SITE}/0": [f"{SITE}/1/", f"{SITE.upper()}/2"],
+        f"{SITE}/1/": [f"{SITE}/2"],
+        f"{SITE}/2": [f"{SITE}/1"],
+    }
+    site = InterruptedSite(graph, stop_after=1)
+    monkeypatch.setattr(utils, "http_pool", utils.HttpPool(transport=httpx.MockTransport(site.handle)))
+    with pytest.raises(KeyboardInterrupt):
+        crawler.crawl_site(f"{SITE}/0", 3, checkpoint=tmp_path)
+
+    resumed = crawler.crawl_site(f"{SITE}/0", 3, checkpoint=tmp_path, resume=True)
+    assert set(resumed) == {f"{SITE}/0", f"{SITE}/1", f"{SITE}/2"}
+    # Neither /1 nor /2 is fetched again under its other spelling
+    assert site.requests == [f"{SITE}/0", f"{SITE}/1/", f"{SITE}/1/", f"{SITE}/2"]
+
+
+def test_crawl_with_bloom_filter_and_url_variants(monkeypatch):
+    graph = {
+        f"{SITE}/0": [f"{SITE}/1", f"{SITE}/1/#top", f"{SITE.upper()}/2?b=1&a=2"],
+        f"{SITE}/1": [f"{SITE}/0/", f"{SITE}/2?a=2&b=1"],
+        f"{SITE}/2?b=1&a=2": [],  # fetched as first linked
+    }
+    site = StandInSite(graph)
+    results = crawl(site, 3, visited=visited.ScalableBloomFilter(initial_capacity=10))
+    assert set(results) == {f"{SITE}/0", f"{SITE}/1", f"{SITE}/2?a=2&b=1"}
+    assert sorted(url for url in site.requests if not url.endswith("robots.txt")) == sorted(graph)
+    assert sorted(site.requests) == sorted(set(site.requests))
+
+
+def test_iter_crawl_fetches_pages_as_they_are_consumed(monkeypatch):
+    site = InterruptedSite(site_graph(7), stop_after=100)
+    monkeypatch.setattr(utils, "http_pool", utils.HttpPool(transport=httpx.MockTransport(site.handle)))
+    pages = crawler.iter_crawl(f"{SITE}/0", 2)
+    assert next(pages)[0] == f"{SITE}/0"
+    assert len(site.requests) == 1
+    assert [url for url, _ in pages] == [f"{SITE}/{i}" for i in range(1, 7)]
+    assert len(site.requests) == 7
+
+
+def test_iter_crawl_async_is_bounded_by_the_consumer():
+    site = StandInSite(site_graph(63), delay=0)
+
+    async def run():
+        async with site.client() as client:
+            pages = crawler.iter_crawl_async(f"{SITE}/0", 10, workers=4, per_host=4,
+                                             client=client, queue_size=2)
+            first = await pages.__anext__()
+            await asyncio.sleep(0.05)  # a slow consumer: workers stall on the full queue
+            stalled = len(site.requests)
+            rest = [url async for url, _ in pages]
+            return first, stalled, rest
+
+    first, stalled, rest = asyncio.run(run())
+    assert first[0] == f"{SITE}/0"
+    # robots.txt, the consumed page, 2 queued pages and one page per worker in hand
+    assert stalled <= 1 + 1 + 2 + 4
+    assert len(rest) == 62
+
+
+def test_index_pages_with_tokenizer():
+    pages = [("a", "The Cats, the Cat and a CAT's café.".split())]
+    index = crawler.index_pages(pages, tokenizer=tokenizer.Tokenizer(stem="s"))
+    assert [word for word, _ in index] == ["cafe", "cat"]
+    assert index["cat"] == {"a": 3}
+    assert index["cat"].documents.length(0) == 4
+
+
+class DirectorySite(StandInSite):
+    """A page at a trailing-slash URL whose links are relative to that directory."""
+
+    def __init__(self):
+        super().__init__({
+            f"{SITE}/parks/": ["lincoln", "grant/"],
+            f"{SITE}/parks/lincoln": [],
+            f"{SITE}/parks/grant/": ["../lincoln"],
+        }, delay=0)
+
+
+def test_links_resolve_against_the_fetched_url(monkeypatch):
+    site = DirectorySite()
+    expected = {f"{SITE}/parks", f"{SITE}/parks/lincoln", f"{SITE}/parks/grant"}
+
+    async def run():
+        async with site.client() as client:
+            return await crawler.crawl_site_async(f"{SITE}/parks/", 2, client=client)
+
+    assert set(asyncio.run(run())) == expected
+    assert "/parks/lincoln" in " ".join(site.requests)
+    assert f"{SITE}/lincoln" not in site.requests
+
+    site.requests.clear()
+    transport = httpx.MockTransport(lambda request: asyncio.run(site.handle(request)))
+    monkeypatch.setattr(utils, "http_pool", utils.HttpPool(transport=transport))
+    assert set(crawler.crawl_site(f"{SITE}/parks/", 2)) == expected
+    assert sorted(site.requests) == sorted(site.graph)
+    # The crawl deduplicated with its own visited set, not the module's
+    assert utils._seen_already == set()
+
+
+def redirecting_site(request: httpx.Request) -> httpx.Response:
+    """/parks moves permanently to /parks/, whose links are relative to that directory."""
+    url = str(request.url)
+    if url == f"{SITE}/parks":
+        return httpx.Response(301, headers={"Location": f"{SITE}/parks/"})
+    if url == f"{SITE}/parks/":
+        return httpx.Response(200, text='<p>parks</p> <a href="lincoln">Lincoln</a>')
+    if url == f"{SITE}/parks/lincoln":
+        return httpx.Response(200, text="<p>lincoln</p>")
+    if url == f"{SITE}/away":
+        return httpx.Response(302, headers={"Location": "https://elsewhere.org/"})
+    return httpx.Response(404)
+
+
+def test_crawl_follows_redirects(monkeypatch):
+    transport = httpx.MockTransport(redirecting_site)
+    monkeypatch.setattr(utils, "http_pool", utils.HttpPool(transport=transport))
+    expected = {f"{SITE}/parks": ["parks", "Lincoln"], f"{SITE}/parks/lincoln": ["lincoln"]}
+    assert crawler.crawl_site(f"{SITE}/parks", 1) == expected
+    assert crawler.build_index(f"{SITE}/parks", 1, workers=2)["lincoln"] == \
+        {f"{SITE}/parks": 1, f"{SITE}/parks/lincoln": 1}
+
+    index, pages = trie.Trie(), {}
+    summary = crawler.refresh_index(index, f"{SITE}/parks", 1, pages)
+    assert summary.new == 2 and set(pages) == set(expected)
+
+    # Redirects off the allowed domains are refused
+    with pytest.raises(utils.FetchException):
+        utils.fetch_html(f"{SITE}/away")
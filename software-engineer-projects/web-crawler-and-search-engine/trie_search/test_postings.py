@@ -0,0 +1,99 @@
+import pickle
+import random
+from array import array
+
+import pytest
+
+import crawler
+import postings
+
+
+def test_document_table():
+    documents = postings.DocumentTable()
+    assert documents.intern("a") == 0
+    assert documents.intern("b") == 1
+    assert documents.intern("a") == 0
+    documents.set_length(0, 5)
+    documents.set_length(1, 3)
+    assert documents.total_length == 8
+    documents.remove("a")
+    assert len(documents) == 1
+    assert documents.doc_id("a") is None
+    assert list(documents.doc_ids()) == [1]
+    assert documents.total_length == 3
+    assert documents.intern("c") == 2  # ids are not reused
+
+
+def test_posting_list_is_a_mapping():
+    documents = postings.DocumentTable()
+    ids = [documents.intern(url) for url in "abcd"]
+    plist = postings.PostingList(documents)
+    plist.add(ids[3])
+    plist.add(ids[0], 2)
+    plist.add(ids[3])
+    plist.add(ids[1])
+    assert list(plist.ids) == [0, 1, 3]
+    assert plist == {"a": 2, "b": 1, "d": 2}
+    assert plist.frequency(ids[2]) == 0
+
+    plist["c"] = 4
+    plist["e"] = 1  # interns a new URL
+    del plist["a"]
+    assert dict(plist.items()) == {"b": 1, "c": 4, "d": 2, "e": 1}
+    assert list(plist.ids) == [1, 2, 3, 4]
+    with pytest.raises(KeyError):
+        plist["a"]
+    with pytest.raises(KeyError):
+        del plist["zzz"]
+
+    plist.add(ids[1], 10 ** 6)
+    assert plist["b"] == postings.MAX_FREQUENCY
+
+
+@pytest.mark.parametrize("step, max_frequency", [(1, 3), (300, 3), (70000, 3), (1, 1000)])
+def test_compact_round_trip(step, max_frequency):
+    plist = postings.PostingList(postings.DocumentTable())
+    for i in range(50):
+        if i % 3:
+            plist.add(i * step, i % max_frequency + 1)
+    ids, frequencies = (array("I", a) for a in plist.arrays())
+    before = plist.nbytes()
+    plist.compact()
+    assert plist.nbytes() < before
+    assert len(plist) == len(ids)
+    assert plist.arrays() == (ids, frequencies)
+
+    plist.add(ids[-1] + 1, 2)  # writes unpack the list again
+    assert list(plist.ids) == list(ids) + [ids[-1] + 1]
+
+
+def test_set_operations_match_sets():
+    rng = random.Random(5)
+    for _ in range(200):
+        lists = [array("I", sorted(rng.sample(range(500), rng.choice([1, 5, 50, 400]))))
+                 for _ in range(rng.randint(1, 4))]
+        expected = set(lists[0]).intersection(*lists[1:])
+        assert list(postings.intersect(lists)) == sorted(expected)
+        assert list(postings.union(lists)) == sorted(set().union(*lists))
+        assert list(postings.difference(lists[0], lists[-1])) == sorted(set(lists[0]) - set(lists[-1]))
+    assert list(postings.intersect([])) == []
+
+
+def test_index_pages_uses_one_table():
+    pages = {"https://a": ["cat", "dog", "cat"], "https://b": ["dog"], "https://c": []}
+    index = crawler.index_pages(pages.items())
+    documents = postings.documents_of(index)
+    assert index["cat"].documents is index["dog"].documents is documents
+    assert index["dog"] == {"https://a": 1, "https://b": 1}
+    assert [documents.length(documents.doc_id(url)) for url in pages] == [3, 1, 0]
+
+    copy = pickle.loads(pickle.dumps(index))
+    assert copy["cat"] == {"https://a": 2}
+
+    stats = postings.memory_stats(index)
+    assert (stats.words, stats.postings) == (2, 3)
+    assert stats.postings_bytes > 0 and stats.documents_bytes > 0
+
+
+def test_documents_of_empty_index():
+    assert len(postings.documents_of(crawler.index_pages([]))) == 0
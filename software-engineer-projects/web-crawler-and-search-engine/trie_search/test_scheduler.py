@@ -0,0 +1,220 @@
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+import pytest
+
+import crawler
+import scheduler
+import utils
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = scheduler.TokenBucket(2.0, capacity=2, clock=clock)
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.now += 0.25
+    assert bucket.wait_time() == pytest.approx(0.25)
+    clock.now += 10
+    assert bucket.wait_time() == 0  # refills only up to capacity
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time() == pytest.approx(0.5)
+    assert scheduler.TokenBucket(None).wait_time() == 0
+
+
+def test_scheduler_orders_by_depth_and_rate():
+    clock = FakeClock()
+    frontier = scheduler.CrawlScheduler(rate=1.0, per_host=5, clock=clock)
+    frontier.add("https://a.test/deep", 2)
+    frontier.add("https://a.test/shallow", 1)
+    frontier.add("https://b.test/deeper", 3)
+    assert len(frontier) == 3
+
+    # Each host has one token: its shallowest page goes first, shallow hosts first
+    assert frontier.pop() == "https://a.test/shallow"
+    assert frontier.pop() == "https://b.test/deeper"
+    assert frontier.pop() is None
+    assert frontier.wait_time() == pytest.approx(1.0)
+    clock.now += 1
+    assert frontier.pop() == "https://a.test/deep"
+    assert frontier.pop() is None and not frontier
+    assert frontier.wait_time() is None
+
+
+def test_scheduler_limits_in_flight_per_host():
+    frontier = scheduler.CrawlScheduler(per_host=2, clock=FakeClock())
+    for i in range(3):
+        frontier.add(f"https://a.test/{i}", 0)
+    frontier.add("https://b.test/0", 1)
+    assert [frontier.pop() for _ in range(4)] == [
+        "https://a.test/0", "https://a.test/1", "https://b.test/0", None]
+    assert frontier.wait_time() is None  # a.test is busy until a fetch is done
+    frontier.done("https://a.test/0")
+    assert frontier.pop() == "https://a.test/2"
+
+
+def test_limit_host():
+    clock = FakeClock()
+    frontier = scheduler.CrawlScheduler(clock=clock)
+    frontier.add("https://a.test/0", 0)
+    frontier.limit_host("https://a.test/robots.txt", 0.5)
+    assert frontier.pop() is None
+    assert frontier.wait_time() == pytest.approx(2.0)
+    clock.now += 2
+    assert frontier.pop() == "https://a.test/0"
+
+
+def test_polite_rate():
+    rules = scheduler.RobotFileParser()
+    rules.parse(["User-agent: slowbot", "Crawl-delay: 4", "", "User-agent: *", "Request-rate: 3/1"])
+    assert scheduler.polite_rate(rules, "slowbot/1.0") == 0.25
+    assert scheduler.polite_rate(rules, "slowbot/1.0", rate=0.1) == 0.1
+    assert scheduler.polite_rate(rules, "python-httpx/0.27", rate=5.0) == 3.0
+    assert scheduler.polite_rate(scheduler.RobotFileParser(), "python-httpx/0.27") is None
+
+
+class StubHosts:
+    """Serves several hosts through httpx.MockTransport and records each request's time."""
+
+    def __init__(self, pages: dict[str, list[str]], robots: dict[str, str], delay: float = 0.002):
+        self.pages = pages
+        self.robots = robots
+        self.delay = delay
+        self.requests = defaultdict(list)   # host -> [(time, path)]
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests[request.url.host].append((time.monotonic(), request.url.path))
+        await asyncio.sleep(self.delay)
+        if request.url.path == "/robots.txt":
+            if request.url.host not in self.robots:
+                return httpx.Response(404)
+            return httpx.Response(200, text=self.robots[request.url.host])
+        url = str(request.url)
+        if url not in self.pages:
+            return httpx.Response(404, text="<html><body>missing</body></html>")
+        links = "".join(f' <a href="{link}">link</a>' for link in self.pages[url])
+        return httpx.Response(200, text=f"<html><body>{links}</body></html>")
+
+    def crawl(self, start_url: str, max_depth: int, **kwargs) -> dict[str, list[str]]:
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(self.handle)) as client:
+                return await crawler.crawl_site_async(start_url, max_depth, client=client, **kwargs)
+        return asyncio.run(run())
+
+    def gaps(self, host: str) -> list[float]:
+        times = [t for t, _ in self.requests[host]]
+        return [b - a for a, b in zip(times, times[1:])]
+
+
+HOSTS = ["a.test", "b.test", "c.test", "d.test"]
+
+
+def hub_site(pages_per_host: int) -> dict[str, list[str]]:
+    """A hub page linking to every page of every host."""
+    pages = {f"https://{host}/{i}": [] for host in HOSTS for i in range(pages_per_host)}
+    pages["https://a.test/hub"] = list(pages)
+    return pages
+
+
+@pytest.fixture(autouse=True)
+def stub_domains(monkeypatch):
+    monkeypatch.setattr(utils, "_seen_already", set())
+    monkeypatch.setattr(utils, "ALLOWED_DOMAINS", tuple(f"https://{host}" for host in HOSTS))
+
+
+def test_crawl_keeps_each_host_within_its_rate():
+    stub = StubHosts(hub_site(6), robots={})
+    start = time.monotonic()
+    results = stub.crawl("https://a.test/hub", 1, workers=16, per_host=4, rate=20.0)
+    elapsed = time.monotonic() - start
+
+    assert len(results) == 1 + 4 * 6
+    for host in HOSTS:
+        assert min(stub.gaps(host)) >= 1 / 20 - 0.005, host
+    # The hosts are crawled side by side: about as long as the busiest host
+    # alone (8 requests on a.test at 20/s), not as long as all of them in turn
+    assert elapsed < 0.8
+
+
+def test_crawl_obeys_robots_txt():
+    robots = {
+        "b.test": "User-agent: *\nRequest-rate: 10/1\n",
+        "c.test": "User-agent: *\nDisallow: /1\nDisallow: /2\n",
+        "d.test": "User-agent: *\nDisallow: /\n",
+    }
+    stub = StubHosts(hub_site(3), robots)
+    results = stub.crawl("https://a.test/hub", 1, workers=8, per_host=4)
+
+    assert set(results) == {"https://a.test/hub", "https://a.test/0", "https://a.test/1",
+                            "https://a.test/2", "https://b.test/0", "https://b.test/1",
+                            "https://b.test/2", "https://c.test/0"}
+    for host in HOSTS:
+        paths = [path for _, path in stub.requests[host]]
+        assert paths[0] == "/robots.txt" and paths.count("/robots.txt") == 1
+    assert [path for _, path in stub.requests["d.test"]] == ["/robots.txt"]
+    # The request rate spaces every request to b.test, its robots.txt included
+    assert len(stub.gaps("b.test")) == 3
+    assert min(stub.gaps("b.test")) >= 0.1 - 0.005
+
+
+def test_crawl_without_robots():
+    stub = StubHosts(hub_site(2), robots={"d.test": "User-agent: *\nDisallow: /\n"})
+    results = stub.crawl("https://a.test/hub", 1, robots=False)
+    assert len(results) == 1 + 4 * 2
+    assert all(path != "/robots.txt" for host in HOSTS for _, path in stub.requests[host])
+
+
+def robots_lookups(handle, cancel_first: bool = False) -> tuple[list, scheduler.RobotsCache]:
+    """Run two concurrent RobotsCache.fetch calls for one site and return their outcomes."""
+    cache = scheduler.RobotsCache()
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+            first = asyncio.ensure_future(cache.fetch("https://a.test/1", client))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(cache.fetch("https://a.test/2", client))
+            await asyncio.sleep(0.01)
+            if cancel_first:
+                first.cancel()
+            return await asyncio.wait_for(
+                asyncio.gather(first, second, return_exceptions=True), timeout=1)
+
+    return asyncio.run(run()), cache
+
+
+def test_robots_lookup_survives_a_cancelled_fetch():
+    calls = []
+
+    async def handle(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return httpx.Response(200, text="User-agent: *\nDisallow: /2\n")
+
+    (first, second), cache = robots_lookups(handle, cancel_first=True)
+    assert isinstance(first, asyncio.CancelledError)
+    assert not second.can_fetch("*", "https://a.test/2")  # fetched again by the waiting lookup
+    assert calls == ["/robots.txt", "/robots.txt"]
+    assert cache._pending == {}
+
+
+def test_robots_lookup_shares_unexpected_errors():
+    async def handle(request):
+        await asyncio.sleep(0.005)
+        raise RuntimeError("boom")
+
+    (first, second), cache = robots_lookups(handle)
+    assert isinstance(first, RuntimeError) and isinstance(second, RuntimeError)
+    assert cache._pending == {}
@@ -0,0 +1,147 @@
+import math
+
+import pytest
+
+import crawler
+import search
+import storage
+import tokenizer as tokenizer_module
+import trie
+
+PAGES = {
+    "a": "cats dogs cats cats".split(),
+    "b": "cats fish".split(),
+    "c": "dogs fish birds dogs".split(),
+    "d": "birds birds birds birds birds birds birds cats".split(),
+}
+
+
+@pytest.fixture
+def engine():
+    index = crawler.index_pages(PAGES.items())
+    index.rebuild_stats()
+    return search.SearchEngine(index)
+
+
+def test_parse_query():
+    assert search.parse_query("cats dogs").groups == [(["cats", "dogs"], [])]
+    assert search.parse_query("cats AND NOT dogs OR -fish").groups == [(["cats"], ["dogs"]), ([], ["fish"])]
+    assert search.parse_query("OR cats OR").groups == [(["cats"], [])]
+    assert search.parse_query("cats or not").groups == [(["cats", "or", "not"], [])]
+    assert search.parse_query("cats OR dogs cats").terms == ["cats", "dogs"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("cats", {"a", "b", "d"}),
+    ("cats dogs", {"a"}),
+    ("CATS fish", {"b"}),
+    ("cats OR birds", {"a", "b", "c", "d"}),
+    ("cats -dogs", {"b", "d"}),
+    ("NOT cats", {"c"}),
+    ("fish OR dogs NOT cats", {"b", "c"}),
+    ("cats unicorns", set()),
+    ("unicorns OR birds", {"c", "d"}),
+    ("", set()),
+])
+def test_boolean_search(engine, query, expected):
+    assert engine.boolean_search(query) == expected
+
+
+def test_document_lengths(engine):
+    assert search.document_lengths(engine.index) == {url: len(words) for url, words in PAGES.items()}
+    assert engine.average_length == 4.5
+
+
+def test_ranking(engine):
+    # More occurrences rank higher; d is long, so its one "cats" counts least
+    assert [url for url, _ in engine.search("cats")] == ["a", "b", "d"]
+    # Pages matching more of the terms rank higher
+    assert [url for url, _ in engine.search("fish OR birds")] == ["c", "d", "b"]
+    assert engine.search("cats", limit=2) == engine.search("cats", limit=None)[:2]
+    assert engine.search("unicorns") == []
+
+
+def test_bm25_score(engine):
+    (url, score), = engine.search("fish -birds")
+    assert url == "b"
+    idf = math.log(1 + (4 - 2 + 0.5) / (2 + 0.5))
+    assert score == pytest.approx(idf * 2.2 / (1 + 1.2 * (0.25 + 0.75 * 2 / 4.5)))
+
+
+def test_mapped_index_search(engine, tmp_path):
+    path = tmp_path / "index.bin"
+    storage.save_index(engine.index, path)
+    with storage.MappedIndex(path) as mapped:
+        mapped_engine = search.SearchEngine(mapped)
+        assert search.document_lengths(mapped) == search.document_lengths(engine.index)
+        for query in ["cats", "fish OR birds", "dogs -fish", "NOT dogs"]:
+            assert mapped_engine.search(query, limit=None) == engine.search(query, limit=None)
+
+
+def test_mapped_index_keeps_pages_without_words(tmp_path):
+    index = crawler.index_pages([*PAGES.items(), ("e", ["the", "and"])],
+                                tokenizer=tokenizer_module.Tokenizer())
+    engine = search.SearchEngine(index)
+    path = tmp_path / "index.bin"
+    storage.save_index(index, path)
+    with storage.MappedIndex(path) as mapped:
+        mapped_engine = search.SearchEngine(mapped)
+        assert len(mapped.documents) == len(engine.documents) == 5
+        assert mapped_engine.average_length == engine.average_length
+        for query in ["cats", "NOT dogs"]:
+            assert mapped_engine.search(query, limit=None) == engine.search(query, limit=None)
+        assert "e" in mapped_engine.boolean_search("NOT dogs")
+
+
+def test_suggest(engine):
+    # Close spellings first (commonest first at equal distance), then completions
+    assert [word for word, _ in engine.suggest("cts")] == ["cats"]
+    assert [word for word, _ in engine.suggest("dgs")] == ["dogs"]
+    assert [word for word, _ in engine.suggest("birsd")] == ["birds"]
+    assert [word for word, _ in engine.suggest("fis", k=1)] == ["fish"]
+    assert [word for word, _ in engine.suggest("b")] == ["birds"]
+    assert engine.suggest("unicorns") == []
+
+
+def test_search_with_tokenizer():
+    pages = {"a": "The Cats sat on the mat.".split(), "b": "A cat's toy".split()}
+    tokenizer = tokenizer_module.Tokenizer(stem="s")
+    index = crawler.index_pages(pages.items(), tokenizer=tokenizer)
+    engine = search.SearchEngine(index, tokenizer=tokenizer)
+    assert engine.parse("The CATS -toys").groups == [(["cat"], ["toy"])]
+    assert engine.boolean_search("cat") == {"a", "b"}
+    assert engine.boolean_search("Mats!") == {"a"}
+    assert engine.search("the") == []  # stopwords were never indexed
+
+
+def test_query_cache_hits_and_invalidation():
+    index = crawler.index_pages(PAGES.items())
+    engine = search.SearchEngine(index, cache_size=2)
+    first = engine.search("cats dogs")
+    assert engine.search("dogs cats cats") == first
+    assert (engine.cache.hits, engine.cache.misses) == (1, 1)
+
+    # A change to the index moves its generation on, so the cached result is not reused
+    postings = index["cats"]
+    postings["c"] = 5
+    index["cats"] = postings
+    assert engine.search("cats dogs") != first
+    assert (engine.cache.hits, engine.cache.misses) == (1, 2)
+
+    engine.search("fish")
+    engine.search("birds")  # evicts "cats dogs", the least recently used
+    assert len(engine.cache) == 2
+    engine.search("cats dogs")
+    assert engine.cache.misses == 5
+
+
+def test_trie_generation():
+    for trie_class in (trie.Trie, trie.CompactTrie, trie.RadixTrie):
+        index = trie_class()
+        index["cat"] = 1
+        generation = index.generation
+        assert index.setdefault("cat", 2) == 1 and index.generation == generation
+        del index["cat"]
+        assert index.generation > generation
+        with pytest.raises(KeyError):
+            del index["cat"]
@@ -0,0 +1,97 @@
+import pytest
+
+import search
+import storage
+import trie
+
+
+@pytest.fixture
+def index():
+    t = trie.RadixTrie()
+    pages = {
+        "https://example.com/a": ["cat", "cart", "dog", "Cat!", "cat"],
+        "https://example.com/b": ["cat", "cot", "do"],
+        "https://example.com/c": ["cat", "dog"],
+    }
+    for url, words in pages.items():
+        for word in words:
+            postings = dict(t.get(word, {}))
+            postings[url] = postings.get(url, 0) + 1
+            t[word] = postings
+    return t
+
+
+def test_round_trip(index, tmp_path):
+    path = tmp_path / "index.bin"
+    storage.save_index(index, path)
+    with storage.MappedIndex(path) as mapped:
+        assert len(mapped) == len(index)
+        assert list(mapped) == list(index)
+        assert mapped["cat"] == {"https://example.com/a": 2, "https://example.com/b": 1,
+                                 "https://example.com/c": 1}
+        assert mapped["CAT_"] == {"https://example.com/a": 1}
+        assert "ca" not in mapped
+        with pytest.raises(KeyError):
+            mapped["cow"]
+        assert list(mapped.wildcard_search("c*t")) == list(index.wildcard_search("c*t"))
+        assert list(mapped.fuzzy_search("cxt", 1)) == list(index.fuzzy_search("cxt", 1))
+        assert mapped.prefix_count("ca") == 3
+        assert [k for k, _ in mapped.top_completions("", k=2)] == ["cat", "dog"]
+        assert search.document_lengths(mapped) == {"https://example.com/a": 5, "https://example.com/b": 3,
+                                                    "https://example.com/c": 2}
+
+
+def test_url_sets_count_once(tmp_path):
+    t = trie.Trie()
+    t["cat"] = {"https://example.com/a", "https://example.com/b"}
+    path = tmp_path / "index.bin"
+    storage.save_index(t, path)
+    with storage.MappedIndex(path) as mapped:
+        assert mapped["cat"] == {"https://example.com/a": 1, "https://example.com/b": 1}
+
+
+def test_read_only(index, tmp_path):
+    path = tmp_path / "index.bin"
+    storage.save_index(index, path)
+    with storage.MappedIndex(path) as mapped:
+        with pytest.raises(TypeError):
+            mapped["new"] = {"https://example.com"}
+        with pytest.raises(TypeError):
+            del mapped["cat"]
+
+
+def test_varint_round_trip():
+    postings = [(0, 1), (1, 200), (127, 3), (128, 1), (300, 2 ** 20), (70000, 1), (2 ** 32, 5)]
+    encoded = storage._encode_postings(postings)
+    count, pos = storage._decode_varint(encoded, 0)
+    decoded, previous = [], 0
+    for _ in range(count):
+        delta, pos = storage._decode_varint(encoded, pos)
+        frequency, pos = storage._decode_varint(encoded, pos)
+        previous += delta
+        decoded.append((previous, frequency))
+    assert decoded == postings
+    assert pos == len(encoded)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "junk.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        storage.MappedIndex(path)
+
+
+@pytest.mark.parametrize("trie_class", [trie.Trie, trie.CompactTrie, trie.RadixTrie],
+                         ids=lambda cls: cls.__name__)
+def test_non_ascii_letters(trie_class, tmp_path):
+    t = trie_class()
+    t["café"] = {"https://example.com/a": 2}
+    t["straße"] = {"https://example.com/b": 1}
+    assert list(t) == [("caf_", {"https://example.com/a": 2}),
+                       ("stra_e", {"https://example.com/b": 1})]
+    assert [key for key, _ in t.wildcard_search("caf?")] == ["caf_"]
+    path = tmp_path / "index.bin"
+    storage.save_index(t, path)
+    with storage.MappedIndex(path) as mapped:
+        assert list(mapped) == list(t)
+        assert mapped["café"] == {"https://example.com/a": 2}
@@ -0,0 +1,48 @@
+import pytest
+
+import tokenizer
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("Cats", "cats"),
+    ("(cats),", "cats"),
+    ("Lincoln's", "lincoln"),
+    ("parks'.", "parks"),
+    ("e-mail", "e-mail"),
+    ("Café", "cafe"),
+    ("the", None),
+    ("THE", None),
+    ("--", None),
+    ("2024", None),
+    ("2024s", "2024s"),
+])
+def test_normalize(token, expected):
+    assert tokenizer.Tokenizer().normalize(token) == expected
+
+
+def test_options():
+    keep_all = tokenizer.Tokenizer(strip_punctuation=False, fold_case=False, stopwords=None)
+    assert keep_all(["The", "cats!", "--"]) == ["The", "cats!", "--"]
+    assert tokenizer.Tokenizer(min_length=3)(["an", "ox", "owl", "cats"]) == ["owl", "cats"]
+    assert tokenizer.Tokenizer(stem="s")(["Parks", "cities", "glass", "bus"]) == \
+        ["park", "city", "glass", "bus"]
+    assert tokenizer.Tokenizer(stem=str.upper)(["cats"]) == ["CATS"]
+
+
+def test_count_merges_variants_per_page():
+    counts = tokenizer.Tokenizer(stem="s").count("The cats, the Cat and a CAT's cats.".split())
+    assert counts == {"cat": 4}
+
+
+@pytest.mark.parametrize("word, stem", [
+    ("cities", "city"), ("boxes", "boxe"), ("parks", "park"), ("species", "specy"),
+    ("toes", "toe"), ("focus", "focus"), ("class", "class"), ("is", "is"),
+])
+def test_s_stem(word, stem):
+    assert tokenizer.s_stem(word) == stem
+
+
+@pytest.mark.skipif(tokenizer.NLTK_AVAILABLE, reason="nltk is installed")
+def test_porter_needs_nltk():
+    with pytest.raises(ImportError):
+        tokenizer.Tokenizer(stem="porter")
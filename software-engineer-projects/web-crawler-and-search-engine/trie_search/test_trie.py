@@ -0,0 +1,271 @@
+import fnmatch
+import random
+
+import pytest
+
+import trie
+
+TRIE_CLASSES = [trie.Trie, trie.CompactTrie, trie.RadixTrie]
+
+
+@pytest.fixture(params=TRIE_CLASSES, ids=lambda cls: cls.__name__)
+def trie_class(request):
+    return request.param
+
+
+def test_character_to_key():
+    assert trie.character_to_key("a") == 0
+    assert trie.character_to_key("Z") == 25
+    assert trie.character_to_key("_") == 26
+    assert trie.character_to_key("!") == 26
+    assert trie.character_to_key("é") == trie.character_to_key("ß") == 26
+
+
+def test_set_get_del(trie_class):
+    t = trie_class()
+    t["cat"] = 1
+    t["car"] = 2
+    t["Cat"] = 3
+    assert len(t) == 2
+    assert t["cat"] == 3
+    assert t["car"] == 2
+    assert "ca" not in t
+
+    del t["car"]
+    assert len(t) == 1
+    with pytest.raises(KeyError):
+        t["car"]
+    with pytest.raises(KeyError):
+        del t["car"]
+    with pytest.raises(KeyError):
+        t[5]
+
+
+def test_iteration_order(trie_class):
+    t = trie_class()
+    for word in ["dog", "do", "cat", "a_b", "ab", ""]:
+        t[word] = word
+    # '_' (slot 26) sorts after every letter
+    assert list(t) == [("", ""), ("ab", "ab"), ("a_b", "a_b"),
+                       ("cat", "cat"), ("do", "do"), ("dog", "dog")]
+
+
+def test_wildcard_search(trie_class):
+    t = trie_class()
+    for word in ["cat", "cut", "cot", "cats", "dog", "coconut", "ct"]:
+        t[word] = word
+
+    def search(pattern):
+        return [k for k, _ in t.wildcard_search(pattern)]
+
+    assert search("c?t") == ["cat", "cot", "cut"]
+    assert search("???") == ["cat", "cot", "cut", "dog"]
+    assert search("c*t") == ["cat", "coconut", "cot", "ct", "cut"]
+    assert search("c*t*") == ["cat", "cats", "coconut", "cot", "ct", "cut"]
+    assert search("*o*") == ["coconut", "cot", "dog"]
+    assert search("***") == search("*") == [k for k, _ in t]
+    assert search("[cd]o?") == ["cot", "dog"]
+    assert search("c[!ao]t") == ["cut"]
+    assert search("[a-c]*s") == ["cats"]
+    assert search("C?T") == ["cat", "cot", "cut"]
+    assert search("z*") == []
+    assert search("") == []
+    assert search("c[at") == []  # no closing ']': a literal '['
+
+
+def test_wildcard_matches_fnmatch(trie_class):
+    rng = random.Random(13)
+    words = {"".join(rng.choices("abc_", k=rng.randint(0, 8))) for _ in range(400)}
+    t = trie_class()
+    for word in words:
+        t[word] = True
+    for _ in range(200):
+        pattern = "".join(rng.choices(["a", "b", "c", "_", "?", "*", "[ab]", "[!c]", "[a-b]"],
+                                      k=rng.randint(0, 6)))
+        expected = sorted((w for w in words if fnmatch.fnmatchcase(w, pattern)),
+                          key=lambda w: w.replace("_", "{"))
+        assert [k for k, _ in t.wildcard_search(pattern)] == expected, pattern
+
+
+def levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row = row, [i]
+        for j, other in enumerate(b, 1):
+            row.append(min(previous[j - 1] + (char != other), previous[j] + 1, row[j - 1] + 1))
+    return row[-1]
+
+
+def test_fuzzy_search(trie_class):
+    t = trie_class()
+    for i, word in enumerate(["cat", "cart", "cast", "coat", "dog", "category", "at", ""]):
+        t[word] = i
+
+    assert list(t.fuzzy_search("cat", 0)) == [("cat", 0, 0)]
+    assert list(t.fuzzy_search("Cat", 1)) == [
+        ("at", 6, 1), ("cart", 1, 1), ("cast", 2, 1), ("cat", 0, 0), ("coat", 3, 1)]
+    assert [k for k, _, _ in t.fuzzy_search("cta", 2)] == ["at", "cat", "coat"]  # a swap is two edits
+    assert list(t.fuzzy_search("x", 1)) == [("", 7, 1)]
+    assert list(t.fuzzy_search("unicorn", 2)) == []
+    with pytest.raises(ValueError):
+        list(t.fuzzy_search("cat", -1))
+
+
+def test_fuzzy_search_matches_brute_force(trie_class):
+    rng = random.Random(14)
+    words = {"".join(rng.choices("abc_", k=rng.randint(0, 8))) for _ in range(400)}
+    t = trie_class()
+    for word in words:
+        t[word] = True
+    for _ in range(100):
+        query = "".join(rng.choices("abcd_", k=rng.randint(0, 8)))
+        max_distance = rng.randint(0, 3)
+        expected = sorted(((w, True, levenshtein(query, w)) for w in words
+                           if levenshtein(query, w) <= max_distance),
+                          key=lambda item: item[0].replace("_", "{"))
+        assert list(t.fuzzy_search(query, max_distance)) == expected, (query, max_distance)
+
+
+@pytest.mark.parametrize("trie_class", TRIE_CLASSES[1:], ids=lambda cls: cls.__name__)
+def test_matches_reference_trie(trie_class):
+    rng = random.Random(7)
+    words = ["".join(rng.choices("abc_", k=rng.randint(0, 6))) for _ in range(300)]
+    reference, other = trie.Trie(), trie_class()
+    for i, word in enumerate(words):
+        reference[word] = i
+        other[word] = i
+    for word in words[::3]:
+        if word in reference:
+            del reference[word]
+            del other[word]
+    assert len(other) == len(reference)
+    assert list(other) == list(reference)
+    for pattern in ["*", "a*", "*b*", "**_*", "A*c", "ab*c_a"]:
+        assert list(other.wildcard_search(pattern)) == list(reference.wildcard_search(pattern))
+
+
+def test_radix_trie_compresses_paths():
+    t = trie.RadixTrie()
+    t["internationalization"] = 1
+    assert list(t.root.children.values())[0].label == "internationalization"
+
+    t["internet"] = 2
+    (middle,) = t.root.children.values()
+    assert middle.label == "intern"
+    assert sorted(child.label for child in middle.children.values()) == ["ationalization", "et"]
+
+    del t["internet"]
+    (merged,) = t.root.children.values()
+    assert merged.label == "internationalization"
+    assert t["internationalization"] == 1
+    with pytest.raises(KeyError):
+        t["intern"]
+
+
+def test_compact_trie_keeps_non_ascii_keys_in_their_own_rows():
+    t = trie.CompactTrie()
+    t["eb"] = 1
+    t["café"] = 2
+    assert t["café"] == t["caf_"] == 2
+    assert t["eb"] == 1
+    assert list(t) == [("caf_", 2), ("eb", 1)]
+    del t["café"]
+    assert list(t) == [("eb", 1)]
+
+
+def test_iteration_is_not_recursive(trie_class):
+    t = trie_class()
+    long_key = "ab" * 5000  # deeper than the default recursion limit
+    t[long_key] = 1
+    t[long_key[:-1]] = 2
+    assert list(t) == [(long_key[:-1], 2), (long_key, 1)]
+    assert list(t.wildcard_search("?" * len(long_key))) == [(long_key, 1)]
+    assert list(t.wildcard_search("a*ab")) == [(long_key, 1)]
+    assert list(t.fuzzy_search(long_key[1:], 1)) == [(long_key, 1, 1)]
+
+
+def test_prefix_items(trie_class):
+    t = trie_class()
+    for word in ["car", "cart", "carton", "cat", "dog"]:
+        t[word] = {word}
+    assert [k for k, _ in t.prefix_items("car")] == ["car", "cart", "carton"]
+    assert [k for k, _ in t.prefix_items("ca", limit=2)] == ["car", "cart"]
+    assert [k for k, _ in t.prefix_items("cart")] == ["cart", "carton"]
+    assert list(t.prefix_items("x")) == []
+    assert t.prefix_count("car") == 3
+    assert t.prefix_count("") == 5
+    assert t.prefix_count("carto") == 1
+    assert t.prefix_count("z") == 0
+
+
+def test_top_completions_tracks_updates(trie_class):
+    rng = random.Random(3)
+    t = trie_class()
+    reference = {}
+    words = ["".join(rng.choices("abc", k=rng.randint(1, 5))) for _ in range(200)]
+    for i, word in enumerate(words):
+        if word in reference and i % 4 == 0:
+            del t[word]
+            del reference[word]
+        else:
+            urls = set(range(rng.randint(0, 20)))
+            t[word] = urls
+            reference[word] = urls
+
+        prefix = words[i // 2][:2]
+        expected = sorted((k for k in reference if k.startswith(prefix)),
+                          key=lambda k: (-len(reference[k]), k))[:5]
+        assert [k for k, _ in t.top_completions(prefix, k=5)] == expected
+        assert t.prefix_count(prefix) == sum(k.startswith(prefix) for k in reference)
+
+
+def test_setdefault(trie_class):
+    t = trie_class()
+    t.setdefault("cart", set()).add("a")
+    t.setdefault("cart", set()).add("b")
+    t.setdefault("car", set()).add("c")
+    assert t["cart"] == {"a", "b"}
+    assert t["car"] == {"c"}
+    assert len(t) == 2
+    assert [k for k, _ in t.top_completions("ca", k=2)] == ["car", "cart"]  # stale until rebuilt
+    t.rebuild_stats()
+    assert [k for k, _ in t.top_completions("ca", k=2)] == ["cart", "car"]
+
+
+def test_setdefault_traverses_once(trie_class, monkeypatch):
+    traversals = []
+    for name in ("_insert", "_traverse"):
+        original = getattr(trie_class, name)
+        monkeypatch.setattr(trie_class, name, lambda self, *args, _original=original:
+                            traversals.append(args[0]) or _original(self, *args))
+    t = trie_class()
+    generation = t.generation
+    assert t.setdefault("cart", {1, 2}) == {1, 2}
+    assert t.setdefault("car", {3}) == {3}
+    assert t.setdefault("cart", set()) == {1, 2}
+    assert traversals == ["cart", "car", "cart"]
+    assert t.generation == generation + 2
+    assert t.prefix_count("ca") == 2
+    assert [k for k, _ in t.top_completions("ca", k=2)] == ["cart", "car"]
+
+
+@pytest.mark.parametrize("other_class", TRIE_CLASSES, ids=lambda cls: cls.__name__)
+def test_merge(trie_class, other_class):
+    rng = random.Random(11)
+    left, right, reference = trie_class(), other_class(), {}
+    for t in (left, right):
+        entries = {}
+        for _ in range(150):
+            word = "".join(rng.choices("abc_", k=rng.randint(0, 6)))
+            entries[word] = t[word] = set(rng.sample(range(30), rng.randint(1, 5)))
+        for word, urls in entries.items():
+            reference[word] = reference.get(word, set()) | urls
+
+    left.merge(right, combine=lambda mine, theirs: mine | theirs)
+    assert len(left) == len(reference)
+    assert list(left) == sorted(reference.items(), key=lambda item: item[0].replace("_", "{"))
+    for prefix in ["", "a", "b_", "cab"]:
+        expected = sorted((k for k in reference if k.startswith(prefix)),
+                          key=lambda k: (-len(reference[k]), k))[:4]
+        assert [k for k, _ in left.top_completions(prefix, k=4)] == expected
+        assert left.prefix_count(prefix) == sum(k.startswith(prefix) for k in reference)
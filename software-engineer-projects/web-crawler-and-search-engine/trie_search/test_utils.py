@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+import utils
+
+
+def flaky_transport(failures: int, fail_with=None):
+    """Transport answering 503 (or raising `fail_with`) `failures` times, then 200."""
+    calls = []
+
+    def handle(request):
+        calls.append(str(request.url))
+        if len(calls) <= failures:
+            if fail_with is not None:
+                raise fail_with("boom", request=request)
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, text="<html>ok</html>")
+    return httpx.MockTransport(handle), calls
+
+
+def test_pool_retries_server_errors():
+    pool = utils.HttpPool(retries=2, backoff=0)
+    transport, calls = flaky_transport(2)
+    with httpx.Client(transport=transport) as client:
+        assert pool.get("https://example.com/", client).text == "<html>ok</html>"
+    assert len(calls) == 3
+    assert pool.stats.requests == 3
+    assert pool.stats.retries == 2
+
+
+def test_pool_gives_up_after_retries():
+    pool = utils.HttpPool(retries=1, backoff=0)
+    transport, calls = flaky_transport(5, fail_with=httpx.ConnectError)
+    with httpx.Client(transport=transport) as client:
+        with pytest.raises(httpx.ConnectError):
+            pool.get("https://example.com/", client)
+    assert len(calls) == 2
+
+
+def test_pool_async_returns_last_response():
+    pool = utils.HttpPool(retries=1, backoff=0)
+    transport, calls = flaky_transport(5)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await pool.get_async("https://example.com/", client)
+
+    assert asyncio.run(run()).status_code == 503
+    assert len(calls) == 2
+    assert repr(pool.stats).startswith("FetchStats(requests=2, retries=1, connections=0")
+
+
+PAGE = """<html><head><title>Parks list</title><base href="/parks/"></head>
+<body><p>Hello <b>wor</b>ld, visit</p><!-- not text -->
+<a href=" lincoln ">Lincoln Park</a> <a href="https://example.com/x#top">x</a>
+<a name="anchor">no href</a><script>var y = 1;</script></body></html>"""
+
+
+def test_extract_page_matches_separate_parses():
+    url = "https://example.com/index.html"
+    words, links = utils.extract_page(PAGE, url)
+    assert words == utils.get_text(PAGE).split()
+    assert links == utils.get_links(PAGE, url)
+    assert links == ["https://example.com/parks/lincoln", "https://example.com/x#top"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 10_000])
+def test_extract_page_incremental_matches(chunk_size):
+    url = "https://example.com/index.html"
+    chunks = [PAGE[i:i + chunk_size] for i in range(0, len(PAGE), chunk_size)]
+    assert utils.extract_page_incremental(chunks, url) == utils.extract_page(PAGE, url)
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://example.com", "https://example.com/"),
+    ("HTTPS://Example.COM:443/Parks/#top", "https://example.com/Parks"),
+    ("https://example.com/parks/?b=2&a=1&", "https://example.com/parks?a=1&b=2"),
+    ("https://example.com:8443/a%2fb", "https://example.com:8443/a%2Fb"),
+    ("https://user:pw@example.com/x", "https://example.com/x"),
+])
+def test_canonicalize_url(url, expected):
+    assert utils.canonicalize_url(url) == expected
+
+
+def test_trivially_different_urls_are_fetched_once(monkeypatch):
+    monkeypatch.setattr(utils, "_seen_already", set())
+    monkeypatch.setattr(utils, "http_pool", utils.HttpPool(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text="<p>ok</p>"))))
+    assert utils.fetch_html("https://example.com/parks/#top") == "<p>ok</p>"
+    with pytest.raises(utils.FetchException):
+        utils.fetch_html("https://EXAMPLE.com/parks")
@@ -0,0 +1,39 @@
+import pytest
+
+import visited
+
+
+@pytest.mark.parametrize("make", [lambda: visited.BloomFilter(2_000, 0.01),
+                                  lambda: visited.ScalableBloomFilter(100, 0.01)],
+                         ids=["BloomFilter", "ScalableBloomFilter"])
+def test_no_false_negatives_and_bounded_false_positives(make):
+    urls = make()
+    added = [f"https://example.com/page/{i}" for i in range(2_000)]
+    for url in added:
+        urls.add(url)
+    assert all(url in urls for url in added)
+    assert len(urls) > 1_950  # false positives while adding are not counted
+    false_positives = sum(f"https://example.com/other/{i}" in urls for i in range(20_000))
+    assert false_positives / 20_000 < 0.02
+
+    urls.clear()
+    assert len(urls) == 0 and added[0] not in urls
+
+
+def test_scalable_bloom_filter_grows():
+    urls = visited.ScalableBloomFilter(initial_capacity=1_000, error_rate=0.001)
+    first_size = urls.nbytes()
+    for i in range(10_000):
+        urls.add(f"https://example.com/{i}")
+    assert len(urls.filters) == 4  # 1k + 2k + 4k + 8k
+    assert urls.nbytes() < 10_000 * 4  # a few bytes per URL, however long the URLs
+    assert urls.nbytes() > first_size
+
+
+def test_rejects_bad_parameters():
+    with pytest.raises(ValueError):
+        visited.BloomFilter(0)
+    with pytest.raises(ValueError):
+        visited.BloomFilter(100, error_rate=1.5)
+    with pytest.raises(ValueError):
+        visited.ScalableBloomFilter(tightening=1)
@@ -0,0 +1,129 @@
+import importlib.util
+import re
+import unicodedata
+from collections import Counter
+from typing import Callable, Iterable, Optional
+
+# nltk's Porter stemmer is used for stem="porter" when nltk is installed
+NLTK_AVAILABLE = importlib.util.find_spec("nltk") is not None
+
+# Common English function words, which appear on nearly every page and so
+# carry no weight in ranking but make up a large share of the postings
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its
+itself just me more most my myself no nor not now of off on once only or other our ours
+ourselves out over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up very was we were
+what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+# Distinct raw tokens whose normalized form is remembered (the memo is
+# emptied when it fills, e.g. on a crawl full of numbers and IDs)
+_CACHE_SIZE = 1 << 20
+
+# Leading / trailing characters that are not letters or digits, and a possessive 's
+_EDGE_PUNCTUATION = re.compile(r"^[\W_]+|(?:['\u2019][sS])?[\W_]*$")
+
+
+def s_stem(word: str) -> str:
+    """
+    Harman's "S" stemmer: conflate English plurals with their singular
+    (cities -> city, boxes -> boxe, parks -> park) and nothing else. Light and
+    predictable, so a query rarely matches a word it should not.
+    """
+    if len(word) > 3 and word.endswith("ies") and not word.endswith(("eies", "aies")):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("es") and not word.endswith(("aes", "ees", "oes")):
+        return word[:-1]
+    if len(word) > 2 and word.endswith("s") and not word.endswith(("us", "ss")):
+        return word[:-1]
+    return word
+
+
+def porter_stem() -> Callable[[str], str]:
+    """Return nltk's Porter stemmer (needs the optional `nltk` package)."""
+    if not NLTK_AVAILABLE:
+        raise ImportError("stem='porter' needs the nltk package")
+    from nltk.stem.porter import PorterStemmer
+    return PorterStemmer().stem
+
+
+class Tokenizer:
+    """
+    Token normalization run on each page's words before they are indexed,
+    and on query terms before they are looked up, so both agree.
+
+    A token is, in order: stripped of leading and trailing punctuation and
+    of a possessive 's (tokens with no letters left are dropped, since the
+    trie would store them as runs of '_'), case-folded with accents removed,
+    dropped if it is a stopword or shorter than `min_length`, then stemmed. Normalizing is
+    memoized per distinct raw token, and `count` returns one entry per
+    distinct term on the page, so the index does one insert per term rather
+    than per occurrence.
+    """
+
+    def __init__(self, strip_punctuation: bool = True, fold_case: bool = True,
+                 stopwords: Optional[Iterable[str]] = STOPWORDS, min_length: int = 1,
+                 stem: Optional[Callable[[str], str] | str] = None):
+        """
+        Parameters:
+            strip_punctuation - Strip punctuation around tokens and drop tokens with no letters.
+            fold_case - Case-fold tokens and remove accents (Café -> cafe).
+            stopwords - Words to drop (after folding), or None to keep every word.
+            min_length - Drop tokens shorter than this.
+            stem - Function mapping a word to its stem, "s" for s_stem, "porter"
+                   for nltk's Porter stemmer, or None for no stemming.
+        """
+        if stem == "s":
+            stem = s_stem
+        elif stem == "porter":
+            stem = porter_stem()
+        self.strip_punctuation = strip_punctuation
+        self.fold_case = fold_case
+        self.stopwords = frozenset(stopwords or ())
+        self.min_length = min_length
+        self.stem = stem
+        self._cache: dict[str, Optional[str]] = {}
+
+    def normalize(self, token: str) -> Optional[str]:
+        """Return the normalized form of `token`, or None if it is dropped."""
+        try:
+            return self._cache[token]
+        except KeyError:
+            pass
+        term = token
+        if self.strip_punctuation:
+            term = _EDGE_PUNCTUATION.sub("", term)
+            if not any(char.isalpha() for char in term):
+                term = ""
+        if self.fold_case:
+            term = term.casefold()
+            if not term.isascii():
+                term = "".join(char for char in unicodedata.normalize("NFKD", term)
+                               if not unicodedata.combining(char))
+        if len(term) < max(self.min_length, 1) or term in self.stopwords:
+            term = None
+        elif self.stem is not None:
+            term = self.stem(term)
+        if len(self._cache) >= _CACHE_SIZE:
+            self._cache.clear()
+        self._cache[token] = term
+        return term
+
+    def __call__(self, words: Iterable[str]) -> list[str]:
+        """Return the normalized tokens of `words`, in order (repeats kept)."""
+        normalize = self.normalize
+        return [term for term in map(normalize, words) if term is not None]
+
+    def count(self, words: Iterable[str]) -> Counter:
+        """Return the page's distinct normalized terms mapped to how often each occurs."""
+        raw = Counter(words)  # normalize each distinct token once
+        counts = Counter()
+        normalize = self.normalize
+        for token, count in raw.items():
+            term = normalize(token)
+            if term is not None:
+                counts[term] += count
+        return counts
@@ -1,4 +1,8 @@
-from typing import Any, Iterable
+import functools
+import heapq
+import itertools
+from array import array
+from typing import Any, Callable, Iterable, NamedTuple, Optional
 from collections.abc import MutableMapping
 
 
@@ -15,18 +19,166 @@ def character_to_key(char: str) -> int:
     if not char or len(char) != 1:
         return 26
 
-    if char.isalpha():
+    if char.isascii() and char.isalpha():  # other letters (é, ß, Greek) fall in slot 26 too
         return ord(char.lower()) - ord('a')
     return 26
 
+
+# Character each character_to_key slot stands for when rebuilding keys
+SLOT_CHARACTERS = 'abcdefghijklmnopqrstuvwxyz_'
+
+
+# Slot of each normalized key character
+_SLOT_OF = {char: idx for idx, char in enumerate(SLOT_CHARACTERS)}
+
+# Bitmask of every slot, i.e. what '?' matches
+_ANY_SLOT = (1 << 27) - 1
+
+
+class _StateInfo(NamedTuple):
+    """What the trie walk needs to know about one automaton state."""
+    moves: dict             # normalized character -> next state, dead transitions left out
+    accepts: bool           # a key ending here matches
+    matches_everything: bool  # every continuation matches (a final '*' was reached)
+    slots: Optional[list]   # the few slots `moves` allows, or None to scan every edge
+
+
+class _WildcardAutomaton:
+    """
+    A wildcard pattern compiled to a DFA over character slots.
+
+    The pattern is a list of tokens: None for '*' (any run of characters,
+    including none) or a bitmask of the slots one character may take ('?',
+    a [class] or a literal). A DFA state is a bitmask of the token positions
+    the match could be at (position len(tokens) = matched). States are built
+    lazily and memoized with all their transitions, so matching a character
+    is a dict lookup however many '*'s the pattern has, and each trie node is
+    visited at most once.
+    """
+
+    def __init__(self, tokens: list[Optional[int]]):
+        self.tokens = tokens
+        self.start = self._closure(1)
+        self._info = {}
+        self.known_info = self._info.get  # info() for states already built, else None
+
+    # Helper function
+    def _positions(self, state: int) -> Iterable[int]:
+        """Yield the token positions (set bits) of a state below the matched position."""
+        state &= (1 << len(self.tokens)) - 1
+        while state:
+            low = state & -state
+            yield low.bit_length() - 1
+            state ^= low
+
+    # Helper function
+    def _closure(self, state: int) -> int:
+        """Add the positions reachable from `state` by letting a '*' match nothing."""
+        for pos in list(self._positions(state)):
+            if self.tokens[pos] is None:  # never two '*' in a row, so one hop is enough
+                state |= 1 << (pos + 1)
+        return state
+
+    # Helper function
+    def _step(self, state: int, slot: int) -> int:
+        """Return the state after reading a character in `slot` (0 = no match possible)."""
+        next_state = 0
+        for pos in self._positions(state):
+            token = self.tokens[pos]
+            if token is None:
+                next_state |= 1 << pos
+            elif token >> slot & 1:
+                next_state |= 1 << (pos + 1)
+        return self._closure(next_state)
+
+    def info(self, state: int) -> _StateInfo:
+        """Return the (memoized) _StateInfo of a state."""
+        info = self._info.get(state)
+        if info is None:
+            moves = {}
+            for slot, char in enumerate(SLOT_CHARACTERS):
+                next_state = self._step(state, slot)
+                if next_state:
+                    moves[char] = next_state
+            last = len(self.tokens) - 1
+            everything = last >= 0 and self.tokens[last] is None and bool(state >> last & 1)
+            slots = [_SLOT_OF[char] for char in moves] if len(moves) <= 3 else None
+            info = self._info[state] = _StateInfo(moves, bool(state >> len(self.tokens) & 1),
+                                                  everything, slots)
+        return info
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_pattern(pattern: str) -> _WildcardAutomaton:
+    """
+    Compile a wildcard pattern (see Trie.wildcard_search) to an automaton.
+    Compiled patterns are cached, along with the transitions they have built.
+    """
+    tokens = []
+    pos = 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        pos += 1
+        if char == '*':
+            if not tokens or tokens[-1] is not None:  # '**' is the same as '*'
+                tokens.append(None)
+        elif char == '?':
+            tokens.append(_ANY_SLOT)
+        elif char == '[' and pattern.find(']', pos + 1 + (pattern[pos:pos + 1] in ('!', '^'))) != -1:
+            negate = pattern[pos:pos + 1] in ('!', '^')
+            start = pos + negate
+            end = pattern.index(']', start + 1)  # a ']' right after '[' is a member
+            members = pattern[start:end]
+            pos = end + 1
+            mask, idx = 0, 0
+            while idx < len(members):
+                if idx + 2 < len(members) and members[idx + 1] == '-':
+                    first, last = sorted((members[idx].lower(), members[idx + 2].lower()))
+                    for code in range(ord(first), ord(last) + 1):
+                        mask |= 1 << character_to_key(chr(code))
+                    idx += 3
+                else:
+                    mask |= 1 << character_to_key(members[idx])
+                    idx += 1
+            tokens.append(_ANY_SLOT & ~mask if negate else mask)
+        else:
+            tokens.append(1 << character_to_key(char))
+    return _WildcardAutomaton(tokens)
+
+
+def normalize_key(key: str) -> str:
+    """
+    Return the key as the trie sees it: every character replaced by the
+    letter (or '_' for slot 26) that character_to_key maps it to.
+    """
+    if key.isascii() and key.isalpha() and key.islower():
+        return key  # common case, already normalized
+    return ''.join(SLOT_CHARACTERS[idx] for idx in map(character_to_key, key))
+
+
+def value_score(value: Any) -> int:
+    """
+    Ranking score of a stored value for top_completions: its size (e.g. the
+    number of URLs a word appeared on), or 0 for values without a length.
+    """
+    try:
+        return len(value)
+    except TypeError:
+        return 0
+
 class TrieNode:
     """
     Represents a node with children (dict) and optional value.
+
+    `count` and `best` cache the number of entries in the node's subtree and
+    the highest value_score among them (-1 when the subtree is empty).
     """
     def __init__(self):
         self.children = {}
         self.is_terminal = False
         self.value = None
+        self.count = 0
+        self.best = -1
 
 class Trie(MutableMapping):
     """
@@ -42,6 +194,7 @@ class Trie(MutableMapping):
         """Initializes the Trie with an empty root node and size counter."""
         self.root = TrieNode()
         self.size = 0
+        self.generation = 0  # bumped by every change, so caches of results can tell they are stale
 
     # Helper function
     def _ensure_string_key(self, key: Any) -> None:
@@ -55,26 +208,36 @@ class Trie(MutableMapping):
             raise KeyError(f"Key must be a string: {key}")
 
     # Helper function
-    def _traverse(self, key: str) -> TrieNode:
+    def _traverse(self, key: str, path: Optional[list] = None) -> TrieNode:
         """Traverse the Trie for a given key. 
-        Returns the last node if key exists."""
+        Returns the last node if key exists.
+        Visited nodes (root first) are appended to `path` if given."""
         node = self.root
+        if path is not None:
+            path.append(node)
         for char in key:
             idx = character_to_key(char)
             if idx not in node.children:
                 raise KeyError(f"Key '{key}' not found.")
             node = node.children[idx]
+            if path is not None:
+                path.append(node)
         return node
 
     # Helper function
-    def _insert(self, key: str) -> TrieNode:
-        """Traverse the Trie and insert nodes as needed for the key."""
+    def _insert(self, key: str, path: Optional[list] = None) -> TrieNode:
+        """Traverse the Trie and insert nodes as needed for the key.
+        Visited nodes (root first) are appended to `path` if given."""
         node = self.root
+        if path is not None:
+            path.append(node)
         for char in key:
             idx = character_to_key(char)
             if idx not in node.children:
                 node.children[idx] = TrieNode()
             node = node.children[idx]
+            if path is not None:
+                path.append(node)
         return node
 
 
@@ -101,11 +264,16 @@ class Trie(MutableMapping):
         If the key is not a string, raise `ValueError(key)`
         """
         self._ensure_string_key(key)
-        node = self._insert(key)
-        if not node.is_terminal:
+        self.generation += 1
+        path = []
+        node = self._insert(key, path)
+        old_score = value_score(node.value) if node.is_terminal else -1
+        added = not node.is_terminal
+        if added:
             self.size += 1
         node.is_terminal = True
         node.value = value
+        self._refresh_stats(path, int(added), value_score(value), old_score)
 
 
     def __delitem__(self, key: str) -> None:
@@ -115,11 +283,15 @@ class Trie(MutableMapping):
         If the key is not a string, raise `ValueError(key)`
         """
         self._ensure_string_key(key)
-        node = self._traverse(key)
+        path = []
+        node = self._traverse(key, path)
         if node.is_terminal:
+            old_score = value_score(node.value)
             node.is_terminal = False
             node.value = None
             self.size -= 1
+            self.generation += 1
+            self._refresh_stats(path, -1, -1, old_score)
         else:
             raise KeyError(f"Key '{key}' not found.")
 
@@ -131,6 +303,207 @@ class Trie(MutableMapping):
         return self.size
 
 
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        """
+        Return the value for `key`, first storing `default` for it if missing.
+
+        Costs a single traversal either way (MutableMapping.setdefault does a
+        lookup and then an insert): a new key is stored on the node the
+        traversal ended at, and the cached stats are updated along its path.
+        """
+        self._ensure_string_key(key)
+        path = []
+        node = self._insert(key, path)
+        is_terminal, value = self._entry(node)
+        if is_terminal:
+            return value
+        self.generation += 1
+        self._store(node, default)
+        self._refresh_stats(path, 1, value_score(default), -1)
+        return default
+
+
+    # Helper function
+    def _entry(self, node: TrieNode) -> tuple[bool, Any]:
+        """Return (is_terminal, value) for a node."""
+        return node.is_terminal, node.value
+
+    # Helper function
+    def _edges(self, node: TrieNode) -> list[tuple[str, TrieNode]]:
+        """Return (label, child) for every child of a node in alphabetical order."""
+        return [(SLOT_CHARACTERS[idx], child) for idx, child in sorted(node.children.items())]
+
+    # Helper function
+    def _edge(self, node: TrieNode, idx: int) -> Optional[tuple[str, TrieNode]]:
+        """Return (label, child) for the child in slot `idx`, or None."""
+        child = node.children.get(idx)
+        return None if child is None else (SLOT_CHARACTERS[idx], child)
+
+    # Helper function
+    def _walk(self, node: Any, prefix: str,
+              pattern: Optional[str] = None) -> Iterable[tuple[str, Any]]:
+        """
+        Explicit-stack traversal engine behind iteration and wildcard search.
+
+        Yields (key, value) pairs below `node` in alphabetical order, limited
+        to keys matching `pattern` when one is given. Keys are assembled in a
+        single shared character buffer that is cut back to each node's depth,
+        so there is no per-level string copying and no recursion limit.
+        """
+        buffer = list(prefix)
+        if pattern is None:
+            yield from self._walk_all(node, buffer)
+            return
+        yield from self._walk_pattern(node, buffer, _compile_pattern(pattern))
+
+    # Helper function
+    def _walk_pattern(self, node: Any, buffer: list[str],
+                      automaton: _WildcardAutomaton) -> Iterable[tuple[str, Any]]:
+        """
+        Pattern-filtered variant of _walk_all: entries below `node` whose keys
+        the automaton accepts, in order.
+
+        Each open level keeps its edge iterator and the moves of its automaton
+        state; edges the state cannot continue on are never followed, and a
+        subtree where everything matches is handed to _walk_all.
+        """
+        entry, all_edges, info = self._entry, self._edges, automaton.info
+        known_info = automaton.known_info
+
+        def edges(node: Any, slots: list) -> list[tuple[str, Any]]:
+            """Edges of `node` in the given slots, looked up directly."""
+            found = (self._edge(node, idx) for idx in slots)
+            return [edge for edge in found if edge is not None]
+
+        state = info(automaton.start)
+        if state.matches_everything:
+            yield from self._walk_all(node, buffer)
+            return
+        if state.accepts:
+            is_terminal, value = entry(node)
+            if is_terminal:
+                yield ''.join(buffer), value
+        if not state.moves:
+            return
+
+        slots = state.slots
+        stack = [(iter(all_edges(node) if slots is None else edges(node, slots)), state.moves)]
+        push, pop = stack.append, stack.pop
+        while stack:
+            edge_iter, moves = stack[-1]
+            for label, child in edge_iter:
+                next_state = moves.get(label)
+                if next_state is None:
+                    if len(label) == 1:
+                        continue
+                    next_state = moves.get(label[0])
+                    for char in label[1:]:  # compressed edge, feed every character
+                        if next_state is None:
+                            break
+                        next_state = info(next_state).moves.get(char)
+                    if next_state is None:
+                        continue
+
+                state = known_info(next_state) or info(next_state)
+                buffer.append(label)
+                if state.matches_everything:  # e.g. below 'ab' for 'ab*'
+                    yield from self._walk_all(child, buffer)
+                    buffer.pop()
+                    continue
+                if state.accepts:
+                    is_terminal, value = entry(child)
+                    if is_terminal:
+                        yield ''.join(buffer), value
+                if state.moves:
+                    slots = state.slots
+                    push((iter(all_edges(child) if slots is None else edges(child, slots)), state.moves))
+                    break
+                buffer.pop()  # nothing below can match, step straight back up
+            else:
+                pop()
+                if stack:
+                    buffer.pop()
+
+    # Helper function
+    def _walk_all(self, node: Any, buffer: list[str]) -> Iterable[tuple[str, Any]]:
+        """
+        Unfiltered variant of _walk: every entry below `node`, in order.
+
+        Keeps a stack of child iterators (one per open level) and pushes or
+        pops one edge label on the shared buffer per step down or up.
+        """
+        entry, edges = self._entry, self._edges
+        is_terminal, value = entry(node)
+        if is_terminal:
+            yield ''.join(buffer), value
+
+        stack = [iter(edges(node))]
+        push, pop = stack.append, stack.pop
+        while stack:
+            for label, child in stack[-1]:
+                buffer.append(label)
+                is_terminal, value = entry(child)
+                if is_terminal:
+                    yield ''.join(buffer), value
+                child_edges = edges(child)
+                if child_edges:
+                    push(iter(child_edges))
+                    break
+                buffer.pop()  # leaf, step straight back up
+            else:
+                pop()
+                if stack:
+                    buffer.pop()
+
+    # Helper function
+    def _walk_fuzzy(self, word: str, max_distance: int) -> Iterable[tuple[str, Any, int]]:
+        """
+        Yield (key, value, distance) for keys within `max_distance` edits of
+        `word`, in alphabetical order.
+
+        Each open level of the stack carries the Levenshtein row of `word`
+        against the key so far; a child's row is computed from its parent's,
+        one column per character of `word`. Only the band of columns within
+        `max_distance` of the diagonal can stay in bounds, so the rest are
+        capped at max_distance + 1 and a subtree is dropped once its whole row
+        is over the bound.
+        """
+        entry, edges = self._entry, self._edges
+        width, cap = len(word), max_distance + 1
+        row = [min(col, cap) for col in range(width + 1)]
+        is_terminal, value = entry(self.root)
+        if is_terminal and row[-1] <= max_distance:
+            yield '', value, row[-1]
+
+        buffer = []
+        stack = [(iter(edges(self.root)), row, 0)]
+        push, pop = stack.append, stack.pop
+        while stack:
+            children, row, depth = stack[-1]
+            for label, child in children:
+                child_row, child_depth = row, depth
+                for char in label:  # compressed edges advance one row per character
+                    child_depth += 1
+                    previous, child_row = child_row, [cap] * (width + 1)
+                    child_row[0] = min(child_depth, cap)
+                    for col in range(max(1, child_depth - max_distance),
+                                     min(width, child_depth + max_distance) + 1):
+                        child_row[col] = min(previous[col - 1] + (word[col - 1] != char),
+                                             previous[col] + 1, child_row[col - 1] + 1, cap)
+                    if min(child_row) > max_distance:
+                        break
+                else:
+                    buffer.append(label)
+                    is_terminal, value = entry(child)
+                    if is_terminal and child_row[-1] <= max_distance:
+                        yield ''.join(buffer), value, child_row[-1]
+                    push((iter(edges(child)), child_row, child_depth))
+                    break
+            else:
+                pop()
+                if stack:
+                    buffer.pop()
+
     # Helper function
     def _iter_search(self, node: TrieNode, prefix: str) -> Iterable[Any]:
         """
@@ -138,12 +511,7 @@ class Trie(MutableMapping):
 
         Yields Key-value pairs from terminal nodes 
         """
-        if node.is_terminal:
-            yield prefix, node.value
-
-        for idx, child in sorted(node.children.items()):
-            next_char = chr(idx + ord('a')) if idx < 26 else '_'
-            yield from self._iter_search(child, prefix + next_char)
+        yield from self._walk(node, prefix)
 
 
     def _wild_card_match(self, node: TrieNode, prefix: str, pattern: str) -> Iterable[Any]:
@@ -152,25 +520,191 @@ class Trie(MutableMapping):
 
         Yields Key-value pairs matching the pattern 
         """
-        # If the node is terminal and the pattern is fully matched or None, yield it
-        if len(pattern) == 0:
-            if node.is_terminal:
-                yield prefix, node.value
+        yield from self._walk(node, prefix, pattern)
+
+
+    # Helper function
+    def _get_stats(self, node: TrieNode) -> tuple[int, int]:
+        """Return the cached (subtree entry count, best score) of a node."""
+        return node.count, node.best
+
+    # Helper function
+    def _set_stats(self, node: TrieNode, count: int, best: int) -> None:
+        """Store the cached (subtree entry count, best score) of a node."""
+        node.count = count
+        node.best = best
+
+    # Helper function
+    def _compute_best(self, node: Any) -> int:
+        """Recompute a node's best score from its own entry and its children."""
+        is_terminal, value = self._entry(node)
+        best = value_score(value) if is_terminal else -1
+        for _, child in self._edges(node):
+            best = max(best, self._get_stats(child)[1])
+        return best
+
+    # Helper function
+    def _refresh_stats(self, path: list, count_delta: int, score: int, old_score: int) -> None:
+        """
+        Update the cached stats of every node on `path` (root first) after the
+        entry at its last node changed from `old_score` to `score` (-1 = absent).
+
+        A score that grew only needs a max() per node. One that shrank is
+        recomputed bottom-up until a node's best score stops changing.
+        """
+        settled = False
+        for node in reversed(path):
+            count, best = self._get_stats(node)
+            if score >= old_score:
+                best = max(best, score)
+            elif not settled:
+                new_best = self._compute_best(node)
+                settled = new_best == best
+                best = new_best
+            self._set_stats(node, count + count_delta, best)
+
+    # Helper function
+    def _recompute_stats(self, node: Any) -> None:
+        """Recompute a node's cached stats from its own entry and its children's stats."""
+        is_terminal, value = self._entry(node)
+        count = int(is_terminal)
+        best = value_score(value) if is_terminal else -1
+        for _, child in self._edges(node):
+            child_count, child_best = self._get_stats(child)
+            count += child_count
+            best = max(best, child_best)
+        self._set_stats(node, count, best)
+
+    def rebuild_stats(self) -> None:
+        """
+        Recompute every node's cached subtree count and best score.
+
+        Needed after values were changed in place (e.g. URLs added to a stored
+        set), which the trie cannot see. One pass at the end of a bulk build is
+        much cheaper than re-assigning every value as it changes.
+        """
+        order, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(child for _, child in self._edges(node))
+        for node in reversed(order):  # children before their parents
+            self._recompute_stats(node)
+
+    # Helper function
+    def _child(self, node: TrieNode, idx: int) -> TrieNode:
+        """Return the child in slot `idx`, creating it if needed."""
+        child = node.children.get(idx)
+        if child is None:
+            child = node.children[idx] = TrieNode()
+        return child
+
+    # Helper function
+    def _store(self, node: TrieNode, value: Any) -> None:
+        """Make `node` an entry holding `value` (stats are left to the caller)."""
+        if not node.is_terminal:
+            self.size += 1
+        node.is_terminal = True
+        node.value = value
+
+    def merge(self, other: "Trie", combine: Optional[Callable[[Any, Any], Any]] = None) -> None:
+        """
+        Add every entry of `other` (any Trie variant) to this trie.
+
+        Both tries are walked side by side, so each node of `other` is visited
+        once instead of every key being looked up from the root. For keys in
+        both tries the value becomes combine(this value, other value); without
+        `combine` the other trie's value wins, as with dict.update.
+        """
+        self.generation += 1
+        visited = []
+        stack = [(self.root, other.root)]
+        while stack:
+            node, other_node = stack.pop()
+            visited.append(node)
+            is_terminal, value = other._entry(other_node)
+            if is_terminal:
+                has_value, mine = self._entry(node)
+                self._store(node, combine(mine, value) if has_value and combine else value)
+
+            for label, other_child in other._edges(other_node):
+                child = self._child(node, character_to_key(label[0]))
+                for char in label[1:]:  # compressed edge in `other`
+                    visited.append(child)
+                    child = self._child(child, character_to_key(char))
+                stack.append((child, other_child))
+
+        for node in reversed(visited):  # children before their parents
+            self._recompute_stats(node)
+
+    # Helper function
+    def _locate(self, prefix: str) -> Optional[tuple[Any, str]]:
+        """
+        Return (node, key) for the node whose subtree holds exactly the keys
+        starting with `prefix`, where `key` is that node's normalized key.
+        Returns None if no key starts with `prefix`.
+        """
+        try:
+            node = self._traverse(prefix)
+        except KeyError:
+            return None
+        return node, normalize_key(prefix)
+
+    def prefix_count(self, prefix: str) -> int:
+        """
+        Return how many keys start with `prefix`, from the cached subtree counts.
+        """
+        self._ensure_string_key(prefix)
+        found = self._locate(prefix)
+        return 0 if found is None else self._get_stats(found[0])[0]
+
+    def prefix_items(self, prefix: str, limit: Optional[int] = None) -> Iterable[tuple[str, Any]]:
+        """
+        Return an iterable of (key, value) pairs for keys starting with `prefix`,
+        in alphabetical order, stopping after `limit` pairs if given.
+        """
+        self._ensure_string_key(prefix)
+        found = self._locate(prefix)
+        if found is None:
             return
+        node, key = found
+        items = self._walk(node, key)
+        yield from items if limit is None else itertools.islice(items, limit)
 
-        # Get the current character and remaining pattern
-        char, remaining_pattern = pattern[0], pattern[1:]
+    def top_completions(self, prefix: str, k: int = 10) -> list[tuple[str, Any]]:
+        """
+        Return up to `k` (key, value) pairs for keys starting with `prefix`,
+        highest value_score first (ties broken by key).
 
-        if char == '*':  # Match exactly one character
-            for idx, child in sorted(node.children.items()):
-                next_char = chr(idx + ord('a')) if idx < 26 else '_'
-                yield from self._wild_card_match(child, prefix + next_char, remaining_pattern)
+        Best-first search over the cached per-node best scores: a subtree is
+        only opened once it could hold the next result, so the cost grows with
+        `k` and key length rather than with the number of matching keys.
+        """
+        self._ensure_string_key(prefix)
+        found = self._locate(prefix)
+        if found is None or k <= 0:
+            return []
 
-        else:  # Match specific character
-            idx = character_to_key(char)
-            if idx in node.children:
-                yield from self._wild_card_match(node.children[idx],
-                                                 prefix + char, remaining_pattern)
+        node, key = found
+        tiebreak = itertools.count()
+        # (-score, key, 0 for an entry / 1 for a subtree, tiebreak, value or node)
+        heap = [(-self._get_stats(node)[1], key, 1, next(tiebreak), node)]
+        results = []
+        while heap and len(results) < k:
+            neg_score, key, is_subtree, _, item = heapq.heappop(heap)
+            if not is_subtree:
+                results.append((key, item))
+                continue
+            if neg_score > 0:  # empty subtree
+                continue
+            is_terminal, value = self._entry(item)
+            if is_terminal:
+                heapq.heappush(heap, (-value_score(value), key, 0, next(tiebreak), value))
+            for label, child in self._edges(item):
+                best = self._get_stats(child)[1]
+                if best >= 0:
+                    heapq.heappush(heap, (-best, key + label, 1, next(tiebreak), child))
+        return results
 
 
     def __iter__(self) -> Iterable[tuple[str, Any]]:
@@ -182,13 +716,371 @@ class Trie(MutableMapping):
 
     def wildcard_search(self, key: str) -> Iterable[tuple[str, Any]]:
         """
-        Search for keys that match a wildcard pattern where a '?' can represent any character.
+        Search for keys that match a wildcard pattern where a '?' can represent any character,
+        a '*' any run of characters (including none) and [abc] any one of the listed
+        characters ([a-c] for a range, [!abc] for any other character).
 
         For example:
             - c?t would match 'cat', 'cut', 'cot', etc.
             - ?? would match any two-letter string.
+            - c*t would match 'cat', 'cart', 'coconut', etc.
+            - [bc]at would match 'bat' and 'cat'.
 
-        Returns: Iterable of (key, value) pairs meeting the given condition.
+        The pattern is compiled to an automaton that is walked against the
+        trie, so a branch is dropped as soon as no match can continue it.
+
+        Returns: Iterable of (key, value) pairs meeting the given condition,
+        in alphabetical order with keys as stored (normalized).
         """
         self._ensure_string_key(key)  # Ensure valid string input
         yield from self._wild_card_match(self.root, prefix='', pattern=key)
+
+
+    def fuzzy_search(self, word: str, max_distance: int = 2) -> Iterable[tuple[str, Any, int]]:
+        """
+        Search for keys within `max_distance` edits (insertions, deletions or
+        substitutions of one character) of `word`, e.g. for typo-tolerant lookups.
+
+        The trie is walked once, pruning every branch whose prefix is already
+        too far from `word`, so the cost depends on the bound and the length of
+        `word` rather than on the number of keys.
+
+        Returns: Iterable of (key, value, edit distance) triples in alphabetical
+        order with keys as stored (normalized).
+        """
+        self._ensure_string_key(word)
+        if max_distance < 0:
+            raise ValueError("max_distance must be non-negative")
+        yield from self._walk_fuzzy(normalize_key(word), max_distance)
+
+
+# Number of child slots per node (see character_to_key)
+ALPHABET_SIZE = 27
+
+_EMPTY_ROW = array('i', [0] * ALPHABET_SIZE)
+
+
+class CompactTrie(Trie):
+    """
+    Memory-compact Trie that stores nodes in flat arrays instead of objects.
+
+    Every node is an integer id. Its children live in one shared `array('i')`
+    of 27 slots per node (indexed by character_to_key), where 0 means "no child"
+    (the root is node 0 and never anybody's child). Terminal flags live in a
+    `bytearray`, values in a plain list and a per-node bitmask of occupied
+    slots in an `array('I')` (so leaves and sparse nodes are scanned without
+    touching all 27 slots). Subtree counts and best scores (see TrieNode) are
+    two more arrays. A node costs ~140 bytes instead of a TrieNode object
+    plus its own `children` dict.
+
+    Same MutableMapping API and wildcard_search behaviour as Trie.
+    """
+
+    def __init__(self):
+        """Initializes the CompactTrie with only the root node (id 0)."""
+        self.root = 0
+        self.size = 0
+        self.generation = 0
+        self._children = array('i', _EMPTY_ROW)
+        self._terminal = bytearray(1)
+        self._values = [None]
+        self._masks = array('I', [0])
+        self._counts = array('I', [0])
+        self._best = array('q', [-1])
+
+    # Helper function
+    def _new_node(self) -> int:
+        """Append an empty node to the arrays and return its id."""
+        self._children.extend(_EMPTY_ROW)
+        self._terminal.append(0)
+        self._values.append(None)
+        self._masks.append(0)
+        self._counts.append(0)
+        self._best.append(-1)
+        return len(self._values) - 1
+
+    # Helper function
+    def _traverse(self, key: str, path: Optional[list] = None) -> int:
+        """Traverse the Trie for a given key.
+        Returns the id of the last node if key exists.
+        Visited nodes (root first) are appended to `path` if given."""
+        children = self._children
+        node = self.root
+        if path is not None:
+            path.append(node)
+        for char in key:
+            node = children[node * ALPHABET_SIZE + character_to_key(char)]
+            if not node:
+                raise KeyError(f"Key '{key}' not found.")
+            if path is not None:
+                path.append(node)
+        return node
+
+    # Helper function
+    def _insert(self, key: str, path: Optional[list] = None) -> int:
+        """Traverse the Trie and insert nodes as needed for the key.
+        Visited nodes (root first) are appended to `path` if given."""
+        node = self.root
+        if path is not None:
+            path.append(node)
+        for char in key:
+            idx = character_to_key(char)
+            slot = node * ALPHABET_SIZE + idx
+            child = self._children[slot]
+            if not child:
+                child = self._new_node()
+                self._children[slot] = child
+                self._masks[node] |= 1 << idx
+            node = child
+            if path is not None:
+                path.append(node)
+        return node
+
+    def __getitem__(self, key: str) -> Any:
+        self._ensure_string_key(key)
+        node = self._traverse(key)
+        if self._terminal[node]:
+            return self._values[node]
+        raise KeyError(f"Key '{key}' not found.")
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._ensure_string_key(key)
+        self.generation += 1
+        path = []
+        node = self._insert(key, path)
+        added = not self._terminal[node]
+        old_score = -1 if added else value_score(self._values[node])
+        if added:
+            self.size += 1
+        self._terminal[node] = 1
+        self._values[node] = value
+        self._refresh_stats(path, int(added), value_score(value), old_score)
+
+    def __delitem__(self, key: str) -> None:
+        self._ensure_string_key(key)
+        path = []
+        node = self._traverse(key, path)
+        if self._terminal[node]:
+            old_score = value_score(self._values[node])
+            self._terminal[node] = 0
+            self._values[node] = None
+            self.size -= 1
+            self.generation += 1
+            self._refresh_stats(path, -1, -1, old_score)
+        else:
+            raise KeyError(f"Key '{key}' not found.")
+
+    # Helper function
+    def _entry(self, node: int) -> tuple[bool, Any]:
+        """Return (is_terminal, value) for a node."""
+        return bool(self._terminal[node]), self._values[node]
+
+    # Helper function
+    def _get_stats(self, node: int) -> tuple[int, int]:
+        """Return the cached (subtree entry count, best score) of a node."""
+        return self._counts[node], self._best[node]
+
+    # Helper function
+    def _child(self, node: int, idx: int) -> int:
+        """Return the child in slot `idx`, creating it if needed."""
+        slot = node * ALPHABET_SIZE + idx
+        child = self._children[slot]
+        if not child:
+            child = self._new_node()
+            self._children[slot] = child
+            self._masks[node] |= 1 << idx
+        return child
+
+    # Helper function
+    def _store(self, node: int, value: Any) -> None:
+        """Make `node` an entry holding `value` (stats are left to the caller)."""
+        if not self._terminal[node]:
+            self.size += 1
+        self._terminal[node] = 1
+        self._values[node] = value
+
+    # Helper function
+    def _set_stats(self, node: int, count: int, best: int) -> None:
+        """Store the cached (subtree entry count, best score) of a node."""
+        self._counts[node] = count
+        self._best[node] = best
+
+    # Helper function
+    def _edges(self, node: int) -> list[tuple[str, int]]:
+        """Return (label, child) for every child of a node in alphabetical order."""
+        mask = self._masks[node]
+        edges = []
+        base = node * ALPHABET_SIZE
+        while mask:
+            low = mask & -mask
+            idx = low.bit_length() - 1
+            edges.append((SLOT_CHARACTERS[idx], self._children[base + idx]))
+            mask ^= low
+        return edges
+
+    # Helper function
+    def _edge(self, node: int, idx: int) -> Optional[tuple[str, int]]:
+        """Return (label, child) for the child in slot `idx`, or None."""
+        child = self._children[node * ALPHABET_SIZE + idx]
+        return (SLOT_CHARACTERS[idx], child) if child else None
+
+
+class RadixNode(TrieNode):
+    """
+    Represents a node in a path-compressed trie: the edge leading into
+    it is labelled with a (normalized) string instead of one character.
+    """
+    def __init__(self, label: str = ''):
+        super().__init__()
+        self.label = label
+
+
+class RadixTrie(Trie):
+    """
+    Path-compressed (radix / Patricia) variant of Trie.
+
+    Chains of single-child nodes are merged into one node whose edge carries
+    the whole run of characters as `label`, so a lookup or scan costs one hop
+    per branching point instead of one per character. Children are still
+    keyed by the character_to_key slot of the first label character, which
+    keeps iteration alphabetical and wildcard matching identical to Trie.
+    """
+
+    def __init__(self):
+        """Initializes the RadixTrie with an empty root node and size counter."""
+        self.root = RadixNode()
+        self.size = 0
+        self.generation = 0
+
+    # Helper function
+    def _traverse(self, key: str, path: Optional[list] = None) -> RadixNode:
+        """Traverse the Trie for a given key.
+        Returns the last node if key exists.
+        Visited nodes (root first) are appended to `path` if given."""
+        normalized = normalize_key(key)
+        node, pos = self.root, 0
+        if path is not None:
+            path.append(node)
+        while pos < len(normalized):
+            child = node.children.get(character_to_key(normalized[pos]))
+            if child is None or not normalized.startswith(child.label, pos):
+                raise KeyError(f"Key '{key}' not found.")
+            pos += len(child.label)
+            node = child
+            if path is not None:
+                path.append(node)
+        return node
+
+    # Helper function
+    def _insert(self, key: str, path: Optional[list] = None) -> RadixNode:
+        """Traverse the Trie and insert (or split) nodes as needed for the key.
+        Visited nodes (root first) are appended to `path` if given."""
+        key = normalize_key(key)
+        node, pos = self.root, 0
+        if path is not None:
+            path.append(node)
+        while pos < len(key):
+            idx = character_to_key(key[pos])
+            child = node.children.get(idx)
+            if child is None:
+                child = node.children[idx] = RadixNode(key[pos:])
+                if path is not None:
+                    path.append(child)
+                return child
+
+            label = child.label
+            common = 0
+            while (common < len(label) and pos + common < len(key)
+                   and label[common] == key[pos + common]):
+                common += 1
+
+            if common < len(label):
+                # Split the edge: node -> middle(label[:common]) -> child(rest)
+                middle = node.children[idx] = RadixNode(label[:common])
+                middle.count, middle.best = child.count, child.best
+                child.label = label[common:]
+                middle.children[character_to_key(child.label[0])] = child
+                child = middle
+
+            pos += common
+            node = child
+            if path is not None:
+                path.append(node)
+        return node
+
+    def __delitem__(self, key: str) -> None:
+        """
+        Remove data associated with `key` from the trie, pruning the
+        emptied leaf and re-merging single-child chains it leaves behind.
+        """
+        self._ensure_string_key(key)
+        path = []
+        node = self._traverse(key, path)
+        if not node.is_terminal:
+            raise KeyError(f"Key '{key}' not found.")
+        old_score = value_score(node.value)
+        node.is_terminal = False
+        node.value = None
+        self.size -= 1
+        self.generation += 1
+        self._refresh_stats(path, -1, -1, old_score)
+
+        if len(path) > 1 and not node.children:
+            parent = path[-2]
+            del parent.children[character_to_key(node.label[0])]
+            node = parent
+            path.pop()
+        if len(path) > 1:
+            self._merge_with_child(path[-2], node)
+
+    def merge(self, other: Trie, combine: Optional[Callable[[Any, Any], Any]] = None) -> None:
+        """
+        Add every entry of `other` to this trie (see Trie.merge).
+
+        Inserting into a radix trie may split edges, so entries are added one
+        key at a time rather than by walking both tries side by side.
+        """
+        for key, value in other:
+            if combine is not None and key in self:
+                value = combine(self[key], value)
+            self[key] = value
+
+    # Helper function
+    def _merge_with_child(self, parent: RadixNode, node: RadixNode) -> None:
+        """Collapse a non-terminal node with exactly one child into that child."""
+        if node.is_terminal or len(node.children) != 1:
+            return
+        (child,) = node.children.values()
+        child.label = node.label + child.label
+        parent.children[character_to_key(child.label[0])] = child
+
+    # Helper function
+    def _locate(self, prefix: str) -> Optional[tuple[RadixNode, str]]:
+        """
+        Return (node, key) for the node whose subtree holds exactly the keys
+        starting with `prefix`. The prefix may end part-way along an edge, in
+        which case `key` runs on to the end of that edge's label.
+        """
+        normalized = normalize_key(prefix)
+        node, pos = self.root, 0
+        while pos < len(normalized):
+            child = node.children.get(character_to_key(normalized[pos]))
+            if child is None:
+                return None
+            remaining = normalized[pos:pos + len(child.label)]
+            if not child.label.startswith(remaining):
+                return None
+            pos += len(child.label)
+            node = child
+        return node, normalized[:pos - len(node.label)] + node.label
+
+    # Helper function
+    def _edges(self, node: RadixNode) -> list[tuple[str, RadixNode]]:
+        """Return (label, child) for every child of a node in alphabetical order."""
+        return [(child.label, child) for _, child in sorted(node.children.items())]
+
+    # Helper function
+    def _edge(self, node: RadixNode, idx: int) -> Optional[tuple[str, RadixNode]]:
+        """Return (label, child) for the child whose label starts in slot `idx`, or None."""
+        child = node.children.get(idx)
+        return None if child is None else (child.label, child)
@@ -1,69 +1,145 @@
+import os
+
 from rich.console import Console
 from rich.table import Table
-from rich.prompt import Prompt
+from rich.prompt import Confirm, Prompt
 from crawler import build_index
+from search import SearchEngine
+from storage import MappedIndex, save_index
+from tokenizer import Tokenizer
+
+# Where the crawled index is saved between runs
+INDEX_PATH = "search_index.bin"
+
+
+# How many ranked results to show per query
+MAX_RESULTS = 20
 
+# Normalization applied to crawled words and to queries alike
+TOKENIZER = Tokenizer(stem="s")
 
-def display_results(word: str, urls: set):
+# How many ranked results the search interface keeps for repeated queries
+QUERY_CACHE_SIZE = 256
+
+
+def display_results(query: str, results: list):
     """
-    Display search results for a word in a table format using `rich`.
+    Display search results for a query in a table format using `rich`.
 
     Parameters:
-        word - The searched word.
-        urls - The set of URLs where the word was found.
+        query - The searched query.
+        results - List of (URL, relevance score) pairs, most relevant first.
     """
     console = Console()
 
     # Create a table with two columns
-    table = Table(title=f"Search Results for '{word}'")
-    table.add_column("Word", justify="right", style="cyan", no_wrap=True)
+    table = Table(title=f"Search Results for '{query}'")
+    table.add_column("Score", justify="right", style="cyan", no_wrap=True)
     table.add_column("URL(s)", style="magenta")
 
     # Add rows to the table
-    for url in urls:
-        table.add_row(word, url)
+    for url, score in results:
+        table.add_row(f"{score:.2f}", url)
 
     # Print the table
     console.print(table)
 
 
+def display_completions(query: str, completions: list):
+    """
+    Display indexed words the user may have meant instead of the query.
+
+    Parameters:
+        query - The searched word.
+        completions - List of (word, urls) pairs, best suggestion first.
+    """
+    console = Console()
+
+    table = Table(title=f"Did you mean... (instead of '{query}')")
+    table.add_column("Word", justify="right", style="cyan", no_wrap=True)
+    table.add_column("Pages", style="magenta")
+
+    for word, urls in completions:
+        table.add_row(word, str(len(urls)))
+
+    console.print(table)
+
+
+def display_cache_stats(cache):
+    """
+    Display the hits and misses of the search interface's query cache.
+
+    Parameters:
+        cache - The SearchEngine's QueryCache.
+    """
+    console = Console()
+    lookups = cache.hits + cache.misses
+    hit_rate = cache.hits / lookups if lookups else 0.0
+    console.print(f"[bold cyan]Query cache:[/bold cyan] {cache.hits} hits, {cache.misses} misses "
+                  f"({hit_rate:.0%} hit rate), {len(cache)}/{cache.max_size} results cached")
+
+
 def search_interface(trie):
     """
     Launch an interactive search interface.
 
+    Queries may combine words with OR and NOT / -word (see parse_query);
+    results are ranked by BM25 relevance. Repeated queries are answered from
+    a cache; 'stats' shows its hits and misses.
+
     Parameters:
         trie - The Trie containing the indexed data.
     """
     console = Console()
     console.print("[bold blue]Search Interface[/bold blue]\n", style="bold")
+    engine = SearchEngine(trie, tokenizer=TOKENIZER, cache_size=QUERY_CACHE_SIZE)
 
     while True:
         # Prompt the user for input
-        query = Prompt.ask("[bold magenta]Enter a word to search (or 'exit' to quit)[/bold magenta]").strip()
+        query = Prompt.ask("[bold magenta]Enter words to search, with OR / NOT "
+                           "(or 'stats' for cache stats, 'exit' to quit)[/bold magenta]").strip()
         if query.lower() == "exit":
+            display_cache_stats(engine.cache)
             console.print("[bold yellow]Exiting search...[/bold yellow]")
             break
-
-        # Search for the word in the Trie
-        try:
-            urls = trie[query]
-            display_results(query, urls)
-        except KeyError:
+        if query.lower() == "stats":
+            display_cache_stats(engine.cache)
+            continue
+
+        # Search the index
+        results = engine.search(query, limit=MAX_RESULTS)
+        if results:
+            display_results(query, results)
+        else:
             console.print(f"[bold red]No results found for:[/bold red] {query}")
+            # Suggest close spellings and completions for each required word that is not indexed
+            for term in engine.parse(query).terms:
+                if term in trie:
+                    continue
+                suggestions = engine.suggest(term, k=5)
+                if suggestions:
+                    display_completions(term, suggestions)
 
 
 def main():
     """
     Main function to handle the full interface.
 
-    1. Crawl the site.
-    2. Build the search index (Trie).
+    1. Open the saved index, if there is one and the user wants it.
+    2. Otherwise crawl the site, build the search index (Trie) and save it.
     3. Launch the search interface.
     """
     console = Console()
 
-    # Prompt for input URL and depth
     console.print("[bold blue]Welcome to the Web Crawler and Search Interface![/bold blue]")
+    if os.path.exists(INDEX_PATH) and Confirm.ask(
+            f"[bold green]Load the saved index from {INDEX_PATH}?[/bold green]"):
+        with MappedIndex(INDEX_PATH) as index:
+            console.print(f"[bold green]Loaded {len(index)} words.[/bold green]")
+            search_interface(index)
+        return
+
+    # Prompt for input URL and depth
     site_url = Prompt.ask("[bold green]Enter the URL to start crawling[/bold green]")
     max_depth = Prompt.ask("[bold green]Enter the maximum depth for crawling[/bold green]")
 
@@ -77,8 +153,10 @@ def main():
     # Build the Trie index
     console.print(f"[bold yellow]Crawling {site_url} with depth {max_depth}...[/bold yellow]")
 
-    trie = build_index(site_url, max_depth)
+    trie = build_index(site_url, max_depth, tokenizer=TOKENIZER)
     console.print("[bold green]Crawling complete![/bold green]")
+    save_index(trie, INDEX_PATH)
+    console.print(f"[bold green]Index saved to {INDEX_PATH}.[/bold green]")
 
     # Launch the search interface
     search_interface(trie)
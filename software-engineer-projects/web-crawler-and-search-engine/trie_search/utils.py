@@ -1,39 +1,391 @@
+import asyncio
+import importlib.util
+import re
+import time
+from collections import deque
+from typing import Any, Iterable, NamedTuple, Optional
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
 import httpx
+import lxml.etree
 import lxml.html
 
 ALLOWED_DOMAINS = ("https://example.com", "https://scrapple.fly.dev/parks")
 
+# httpx only speaks HTTP/2 when the optional `h2` package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 
 class FetchException(Exception):
     pass
 
 
+# Canonical URLs fetched this run by direct callers of the fetch functions.
+# The crawlers pass check_seen=False and dedup with their own (injectable)
+# visited set instead, so a crawl never grows this one.
 _seen_already = set()
 
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_PERCENT_ESCAPE = re.compile(r"%[0-9a-fA-F]{2}")
+
+
+class RequestTiming(NamedTuple):
+    """Where the time of one request went, in seconds."""
+    url: str
+    connect: float   # TCP connect (0 when a kept-alive connection was reused)
+    tls: float       # TLS handshake (0 when reused or plain http)
+    transfer: float  # sending the request through receiving the whole body
+
+
+class FetchStats:
+    """
+    FetchStats object used to represent the traffic sent through an `HttpPool`
+
+    - requests: number of HTTP requests sent (retries included)
+    - retries: number of those that were retries
+    - connections: number of new connections opened (the rest reused one)
+    - connect_time / tls_time / transfer_time: total seconds spent in each phase
+    - recent: RequestTiming for the most recent requests
+    """
+
+    def __init__(self, keep_recent: int = 1000):
+        self.requests = 0
+        self.retries = 0
+        self.connections = 0
+        self.connect_time = 0.0
+        self.tls_time = 0.0
+        self.transfer_time = 0.0
+        self.recent = deque(maxlen=keep_recent)
+
+    def record(self, timing: RequestTiming) -> None:
+        """Add one request's timing to the counters."""
+        self.requests += 1
+        self.connections += timing.connect > 0
+        self.connect_time += timing.connect
+        self.tls_time += timing.tls
+        self.transfer_time += timing.transfer
+        self.recent.append(timing)
+
+    def __repr__(self):
+        return (f"FetchStats(requests={self.requests}, retries={self.retries}, "
+                f"connections={self.connections}, connect_time={self.connect_time:.3f}, "
+                f"tls_time={self.tls_time:.3f}, transfer_time={self.transfer_time:.3f})")
+
+
+def _span(marks: dict[str, float], suffix: str, start: str, end: str) -> float:
+    """Seconds between the first `<x>.<suffix><start>` and `<x>.<suffix><end>` trace events."""
+    started = next((t for event, t in marks.items() if event.endswith(suffix + start)), None)
+    completed = next((t for event, t in marks.items() if event.endswith(suffix + end)), None)
+    if started is None or completed is None:
+        return 0.0
+    return completed - started
+
+
+def _timing(url: str, marks: dict[str, float]) -> RequestTiming:
+    """Turn the trace events of one request into a RequestTiming."""
+    return RequestTiming(
+        url,
+        connect=_span(marks, "connect_tcp", ".started", ".complete"),
+        tls=_span(marks, "start_tls", ".started", ".complete"),
+        transfer=_span(marks, "", "send_request_headers.started",
+                       "receive_response_body.complete"),
+    )
+
 
-def fetch_html(url: str) -> str:
+class HttpPool:
+    """
+    Keep-alive HTTP client settings shared by every fetch.
+
+    Holds one long-lived `httpx.Client` so sequential fetches reuse TCP/TLS
+    connections instead of handshaking per page, and hands out
+    `httpx.AsyncClient`s with the same settings for asyncio crawls (an async
+    client is tied to the event loop it is used on). Redirects are followed,
+    also through clients passed in by the caller. Failed requests
+    (transport errors and 5xx responses) are retried with exponential backoff,
+    and every request's timing is recorded in `stats`.
+    """
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 timeout: float = 10.0, retries: int = 2, backoff: float = 0.25,
+                 http2: bool = HTTP2_AVAILABLE, transport: Optional[Any] = None):
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+        self.timeout = httpx.Timeout(timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.http2 = http2
+        self.transport = transport  # e.g. httpx.MockTransport, used by both client kinds
+        self.stats = FetchStats()
+        self._client = None
+
+    @property
+    def client(self) -> httpx.Client:
+        """The shared keep-alive client, created on first use."""
+        if self._client is None:
+            self._client = httpx.Client(limits=self.limits, timeout=self.timeout,
+                                        http2=self.http2, transport=self.transport,
+                                        follow_redirects=True)
+        return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Return a new async client with this pool's limits, timeout and HTTP version."""
+        return httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2,
+                                 transport=self.transport, follow_redirects=True)
+
+    def close(self) -> None:
+        """Close the shared client and its connections."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    # Helper function
+    def _should_retry(self, attempt: int, response: Optional[httpx.Response]) -> bool:
+        """Whether an attempt that failed (no response) or got `response` is retried."""
+        if attempt >= self.retries:
+            return False
+        return response is None or response.status_code >= 500
+
+    def get(self, url: str, client: Optional[httpx.Client] = None,
+            headers: Optional[dict[str, str]] = None) -> httpx.Response:
+        """
+        GET `url` through the shared client (or `client`), retrying with backoff.
+        The last response is returned whatever its status; the fetch_html
+        functions turn error statuses into FetchException.
+        """
+        client = client or self.client
+        for attempt in range(self.retries + 1):
+            marks = {}
+
+            def trace(event, info):
+                marks.setdefault(event, time.perf_counter())
+
+            try:
+                response = client.get(url, headers=headers, follow_redirects=True,
+                                      extensions={"trace": trace})
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+                response = None
+            self.stats.record(_timing(url, marks))
+            if not self._should_retry(attempt, response):
+                return response
+            self.stats.retries += 1
+            time.sleep(self.backoff * 2 ** attempt)
+
+    async def get_async(self, url: str, client: httpx.AsyncClient) -> httpx.Response:
+        """Async version of `get`, sent through `client`."""
+        for attempt in range(self.retries + 1):
+            marks = {}
+
+            async def trace(event, info):
+                marks.setdefault(event, time.perf_counter())
+
+            try:
+                response = await client.get(url, follow_redirects=True,
+                                            extensions={"trace": trace})
+            except httpx.TransportError:
+                if not self._should_retry(attempt, None):
+                    raise
+                response = None
+            self.stats.record(_timing(url, marks))
+            if not self._should_retry(attempt, response):
+                return response
+            self.stats.retries += 1
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+
+# Pool used by fetch_html and fetch_html_async; replace it to change settings
+http_pool = HttpPool()
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Return the canonical form of a URL, so trivially different spellings of
+    the same page are crawled once: the scheme and host are lower-cased, a
+    default port, the fragment and a trailing slash (other than the root's)
+    are dropped, an empty path becomes '/', query parameters are sorted and
+    percent-escapes are upper-cased.
+
+    For example:
+        HTTPS://Example.com:443/parks/?b=2&a=1#top -> https://example.com/parks?a=1&b=2
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.rpartition("@")[2].lower()  # credentials are not part of the page
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port == _DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path.rstrip("/") or "/"
+    query = "&".join(sorted(param for param in parts.query.split("&") if param))
+    canonical = urlunsplit((scheme, netloc, path, query, ""))
+    return _PERCENT_ESCAPE.sub(lambda match: match.group().upper(), canonical)
+
+
+def allowed_url(url: str) -> bool:
+    """Whether `url` (in canonical form) is https on an allowed domain."""
+    return canonicalize_url(url).startswith(ALLOWED_DOMAINS)
+
+
+def _check_url(url: str, check_seen: bool = True) -> None:
+    """
+    Raise FetchException unless `url` may be fetched: it (in canonical form)
+    must be https on an allowed domain and, if `check_seen`, must not have
+    been seen already this run.
+    """
+    canonical = canonicalize_url(url)
+    if check_seen:
+        if canonical in _seen_already:
+            raise FetchException(
+                f"URL {url} already seen this run, exiting to avoid infinite loops."
+            )
+        _seen_already.add(canonical)
+    if not canonical.startswith("https://"):
+        raise FetchException(f"URL {url} must start with https://")
+    elif not canonical.startswith(ALLOWED_DOMAINS):
+        raise FetchException(f"URL {url} does not start with an allowed domain")
+
+
+# Helper function
+def _check_status(url: str, response: httpx.Response, not_modified: bool = False) -> None:
+    """
+    Raise FetchException unless `response` is a success (or, if `not_modified`,
+    a 304), so error pages are never taken for the page's content, or unless
+    the redirects it followed stayed on the allowed domains.
+    """
+    if not (response.is_success or (not_modified and response.status_code == 304)):
+        raise FetchException(f"URL {url} answered {response.status_code}")
+    if response.history and not allowed_url(str(response.url)):
+        raise FetchException(f"URL {url} redirects to {response.url}, outside the allowed domains")
+
+
+def clear_seen() -> None:
+    """
+    Forget which URLs were fetched through the fetch functions' own seen
+    check, so they may be fetched again.
+    """
+    _seen_already.clear()
+
+
+class FetchedPage(NamedTuple):
+    """Result of fetch_page."""
+    html: str
+    url: str                      # where the page was served from, after any redirects
+
+
+def fetch_page(url: str, check_seen: bool = True) -> FetchedPage:
+    """
+    Fetch HTML from a given URL, following redirects.
+
+    Parameters:
+        url -
+        check_seen - Refuse URLs already fetched this run; callers that
+                     track visited URLs themselves pass False.
+
+    Returns:
+        FetchedPage with the page HTML and the URL it was served from, which
+        its relative links resolve against. FetchException is raised if the
+        request fails or the server answers with an error status.
+    """
+    _check_url(url, check_seen)
+    try:
+        response = http_pool.get(url)
+    except Exception as e:
+        raise FetchException(str(e))
+    _check_status(url, response)
+    return FetchedPage(response.text, str(response.url))
+
+
+def fetch_html(url: str, check_seen: bool = True) -> str:
     """
     Fetch HTML from a given URL.
 
     Parameters:
         url -
+        check_seen - Refuse URLs already fetched this run (see fetch_page).
 
     Returns:
-        String containing HTML from the page.
+        String containing HTML from the page. FetchException is raised if
+        the request fails or the server answers with an error status.
     """
-    if url in _seen_already:
-        raise FetchException(
-            f"URL {url} already seen this run, exiting to avoid infinite loops."
-        )
-    _seen_already.add(url)
-    if not url.startswith("https://"):
-        raise FetchException(f"URL {url} must start with https://")
-    elif not url.startswith(ALLOWED_DOMAINS):
-        raise FetchException(f"URL {url} does not start with an allowed domain")
+    return fetch_page(url, check_seen).html
+
+
+class ConditionalFetch(NamedTuple):
+    """Result of fetch_html_conditional."""
+    html: Optional[str]           # None when the server answered 304 Not Modified
+    etag: Optional[str]
+    last_modified: Optional[str]
+    url: str                      # where the page was served from, after any redirects
+
+
+def fetch_html_conditional(url: str, etag: Optional[str] = None,
+                           last_modified: Optional[str] = None,
+                           check_seen: bool = True) -> ConditionalFetch:
+    """
+    Fetch HTML from a given URL unless it is unchanged since an earlier fetch.
+
+    Parameters:
+        url -
+        etag - ETag header from the earlier fetch, if any.
+        last_modified - Last-Modified header from the earlier fetch, if any.
+        check_seen - Refuse URLs already fetched this run (see fetch_html).
+
+    Returns:
+        ConditionalFetch with the page HTML (or None if not modified) and the
+        validators to send next time. FetchException is raised if the request
+        fails or the server answers with anything but a success or a 304.
+    """
+    _check_url(url, check_seen)
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    try:
+        response = http_pool.get(url, headers=headers)
+    except Exception as e:
+        raise FetchException(str(e))
+    _check_status(url, response, not_modified=True)
+    etag = response.headers.get("ETag", etag)
+    last_modified = response.headers.get("Last-Modified", last_modified)
+    if response.status_code == 304:
+        return ConditionalFetch(None, etag, last_modified, str(response.url))
+    return ConditionalFetch(response.text, etag, last_modified, str(response.url))
+
+
+async def fetch_page_async(url: str, client: httpx.AsyncClient,
+                           check_seen: bool = True) -> FetchedPage:
+    """
+    Async version of fetch_page, sent through `client` (see
+    `HttpPool.async_client`).
+    """
+    _check_url(url, check_seen)
     try:
-        return httpx.get(url).text
+        response = await http_pool.get_async(url, client)
     except Exception as e:
         raise FetchException(str(e))
+    _check_status(url, response)
+    return FetchedPage(response.text, str(response.url))
+
+
+async def fetch_html_async(url: str, client: httpx.AsyncClient,
+                           check_seen: bool = True) -> str:
+    """
+    Fetch HTML from a given URL without blocking the event loop.
+
+    Parameters:
+        url -
+        client - Shared `httpx.AsyncClient` to send the request with
+                 (see `HttpPool.async_client`).
+        check_seen - Refuse URLs already fetched this run (see fetch_page).
+
+    Returns:
+        String containing HTML from the page.
+    """
+    return (await fetch_page_async(url, client, check_seen)).html
 
 
 def get_links(html: str, source_url: str) -> list[str]:
@@ -63,3 +415,83 @@ def get_text(html: str) -> str:
         Text extracted from the page.
     """
     return lxml.html.fromstring(html).text_content()
+
+
+def extract_page(html: str, source_url: str) -> tuple[list[str], list[str]]:
+    """
+    Get the words and the URLs on a given page from a single parse.
+
+    Same results as `get_text(html).split()` and `get_links(html, source_url)`,
+    which each parse the page again.
+
+    Parameters:
+        html - Page HTML.
+        source_url - URL of source page.
+
+    Returns:
+        Tuple of (words that appeared on page, URLs that appeared on page).
+    """
+    doc = lxml.html.fromstring(html)
+    words = doc.text_content().split()
+    # Resolve hrefs directly rather than via make_links_absolute, which
+    # rewrites every link attribute in the tree; a <base href> applies
+    # the way make_links_absolute would apply it.
+    base_url = source_url
+    for base_href in doc.xpath("//base/@href"):
+        base_url = urljoin(source_url, base_href.strip())
+    return words, [urljoin(base_url, href.strip()) for href in doc.xpath("//a/@href")]
+
+
+class _ExtractTarget:
+    """
+    lxml parser target that collects words and absolute links as parse
+    events arrive, without building a document tree.
+    """
+
+    def __init__(self, source_url: str):
+        self.base_url = source_url
+        self.words = []
+        self.links = []
+        self._partial = ""  # word cut off at the end of the last text chunk
+
+    def start(self, tag, attrib):
+        if tag == "a" and "href" in attrib:
+            self.links.append(attrib["href"])
+        elif tag == "base" and "href" in attrib:
+            self.base_url = urljoin(self.base_url, attrib["href"].strip())
+
+    def end(self, tag):
+        pass
+
+    def data(self, text):
+        text = self._partial + text
+        words = text.split()
+        self._partial = words.pop() if words and not text[-1].isspace() else ""
+        self.words.extend(words)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        if self._partial:
+            self.words.append(self._partial)
+        return self.words, [urljoin(self.base_url, link.strip()) for link in self.links]
+
+
+def extract_page_incremental(chunks: Iterable[str], source_url: str) -> tuple[list[str], list[str]]:
+    """
+    Streaming version of extract_page: the page is fed to the parser chunk by
+    chunk (e.g. from `httpx.Response.iter_text()`) and words and links are
+    collected from parse events, so no DOM for the page is ever held in memory.
+
+    Parameters:
+        chunks - Page HTML, in pieces.
+        source_url - URL of source page.
+
+    Returns:
+        Tuple of (words that appeared on page, URLs that appeared on page).
+    """
+    parser = lxml.etree.HTMLParser(target=_ExtractTarget(source_url))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
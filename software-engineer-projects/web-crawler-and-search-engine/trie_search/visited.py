@@ -0,0 +1,156 @@
+import hashlib
+import math
+from typing import Protocol
+
+
+class VisitedSet(Protocol):
+    """
+    What the crawlers need from a set of visited URLs. A plain `set` is the
+    exact backend; the Bloom filters below trade a small, configurable rate
+    of false "already visited" answers (pages that are then skipped) for
+    memory that does not grow with the length of the URLs.
+    """
+
+    def __contains__(self, url: str) -> bool: ...
+
+    def add(self, url: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+# Helper function
+def _hashes(url: str) -> tuple[int, int]:
+    """Two independent 64-bit hashes of a URL, combined for every probe (double hashing)."""
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of URLs: a bit array and `num_hashes` probes per
+    URL, sized so that after `capacity` URLs a URL never added is reported
+    present with probability `error_rate`. Past `capacity` that rate climbs
+    quickly; use ScalableBloomFilter when the number of URLs is unknown.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        Parameters:
+            capacity - Number of URLs the filter is sized for.
+            error_rate - False positive rate once `capacity` URLs are added.
+        """
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0   # URLs added (a URL reported present is not counted twice)
+
+    def __len__(self) -> int:
+        return self.count
+
+    # Helper function
+    def _positions(self, hashes: tuple[int, int]) -> list[int]:
+        """Bit positions probed for a URL with the given `_hashes`."""
+        first, step = hashes
+        return [(first + i * step) % self.num_bits for i in range(self.num_hashes)]
+
+    # Helper function
+    def _contains(self, hashes: tuple[int, int]) -> bool:
+        """Whether every bit of a URL with the given `_hashes` is set."""
+        bits, num_bits = self.bits, self.num_bits
+        first, step = hashes
+        for i in range(self.num_hashes):  # most absent URLs miss on the first probe or two
+            pos = (first + i * step) % num_bits
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False
+        return True
+
+    # Helper function
+    def _add(self, hashes: tuple[int, int]) -> bool:
+        """Set a URL's bits; return whether any was newly set (the URL was new)."""
+        bits = self.bits
+        added = False
+        for pos in self._positions(hashes):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                added = True
+        self.count += added
+        return added
+
+    def __contains__(self, url: str) -> bool:
+        return self._contains(_hashes(url))
+
+    def add(self, url: str) -> None:
+        """Add `url` to the filter."""
+        self._add(_hashes(url))
+
+    def clear(self) -> None:
+        """Remove every URL."""
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+    def nbytes(self) -> int:
+        """Bytes used by the bit array."""
+        return len(self.bits)
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows with the number of URLs (Almeida et al.,
+    "Scalable Bloom Filters"): a chain of BloomFilters, each `growth` times
+    larger than the last with a `tightening` times smaller error rate, a new
+    one being started when the newest is full. The overall false positive
+    rate stays below `error_rate` however many URLs are added, and memory
+    grows by a little over 1.44 * log2(1 / error_rate) bits per URL (about
+    2 bytes at 0.1%), independent of URL length.
+    """
+
+    def __init__(self, initial_capacity: int = 100_000, error_rate: float = 0.001,
+                 growth: int = 2, tightening: float = 0.5):
+        """
+        Parameters:
+            initial_capacity - Capacity of the first filter in the chain.
+            error_rate - Bound on the false positive rate of the whole chain.
+            growth - Capacity ratio between consecutive filters.
+            tightening - Error rate ratio between consecutive filters (below 1).
+        """
+        if not 0 < tightening < 1:
+            raise ValueError("tightening must be between 0 and 1")
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: list[BloomFilter] = []
+        self.clear()
+
+    def __len__(self) -> int:
+        return sum(len(bloom) for bloom in self.filters)
+
+    def __contains__(self, url: str) -> bool:
+        hashes = _hashes(url)
+        return any(bloom._contains(hashes) for bloom in reversed(self.filters))
+
+    def add(self, url: str) -> None:
+        """Add `url`, starting a larger filter first if the newest one is full."""
+        hashes = _hashes(url)
+        if any(bloom._contains(hashes) for bloom in reversed(self.filters)):
+            return
+        newest = self.filters[-1]
+        if newest.count >= newest.capacity:
+            newest = BloomFilter(newest.capacity * self.growth, newest.error_rate * self.tightening)
+            self.filters.append(newest)
+        newest._add(hashes)
+
+    def clear(self) -> None:
+        """Remove every URL and go back to a single filter."""
+        # The first filter gets error_rate * (1 - tightening), so the chain's
+        # rates sum (geometrically) to at most error_rate
+        self.filters = [BloomFilter(self.initial_capacity, self.error_rate * (1 - self.tightening))]
+
+    def nbytes(self) -> int:
+        """Bytes used by the bit arrays."""
+        return sum(bloom.nbytes() for bloom in self.filters)